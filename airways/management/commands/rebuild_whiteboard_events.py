@@ -0,0 +1,50 @@
+"""
+Rebuild or verify the materialized whiteboard event table
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from airways.whiteboard_store import rebuild_all, check_consistency, sync_sources
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the whiteboard event table from flights, components and maintenance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Compare the stored events with the source data instead of rebuilding'
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='With --check, resync every source found out of step'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Run after deploying the WhiteboardEvent table, and with --check
+        from cron to catch rows missed by a failed post-commit sync
+        """
+        if not options['check']:
+            total = rebuild_all()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} whiteboard events'))
+            return
+
+        report = check_consistency()
+        out_of_step = report['sources']
+        self.stdout.write(
+            f'Missing: {report["missing"]}\n'
+            f'Stale: {report["stale"]}\n'
+            f'Orphaned: {report["orphaned"]}\n'
+            f'Sources affected: {len(out_of_step)}'
+        )
+
+        if not out_of_step:
+            self.stdout.write(self.style.SUCCESS('Whiteboard events are consistent'))
+            return
+
+        if options['fix']:
+            sync_sources(out_of_step)
+            self.stdout.write(self.style.SUCCESS(f'Resynced {len(out_of_step)} sources'))
+            return
+
+        raise CommandError('Whiteboard events are out of step; rerun with --fix or without --check')
@@ -0,0 +1,128 @@
+"""
+Report how many attached components are critical, warning or healthy on hours
+
+Every component level is classified in the database with one conditional
+aggregate query, using the thresholds in whiteboard_config. --top lists the
+components with the fewest hours left, merged from one ordered stream per
+level.
+"""
+import csv
+import heapq
+import json
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from airways.whiteboard_config import MAINTENANCE_HOURS_CRITICAL, MAINTENANCE_HOURS_WARNING
+from maintenance.health import health_buckets
+from maintenance.models import COMPONENT_LEVELS
+
+# Component values listed by --top
+WORST_FIELDS = ('pk', 'component_name', 'serial_number', 'maintenance_hours')
+
+
+def hours_status(hours):
+    if hours < MAINTENANCE_HOURS_CRITICAL:
+        return 'critical'
+    if hours < MAINTENANCE_HOURS_WARNING:
+        return 'warning'
+    return 'healthy'
+
+
+def attached_components(Model):
+    return Model.objects.filter(component_status='Attached')
+
+
+def level_summary():
+    """{model name: {'total', 'critical', 'warning', 'healthy'}}, one query per level"""
+    summary = {}
+    for Model in COMPONENT_LEVELS:
+        counts = attached_components(Model).aggregate(**health_buckets())
+        counts['healthy'] = counts['total'] - counts['critical'] - counts['warning']
+        summary[Model.__name__] = counts
+    return summary
+
+
+def worst_components(limit):
+    """The `limit` components with the fewest hours left across every level, lowest first"""
+    def stream(Model):
+        rows = attached_components(Model).order_by('maintenance_hours', 'pk').values(
+            *WORST_FIELDS, Model.aircraft_field)[:limit]
+        for row in rows.iterator():
+            row['aircraft_id'] = row.pop(Model.aircraft_field)
+            row['model'] = Model.__name__
+            row['status'] = hours_status(row['maintenance_hours'])
+            yield row
+
+    merged = heapq.merge(*[stream(Model) for Model in COMPONENT_LEVELS], key=lambda row: row['maintenance_hours'])
+    return islice(merged, limit)
+
+
+class Command(BaseCommand):
+    help = 'Calculate maintenance hours status for all components'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=('text', 'json', 'csv'), default='text',
+            help='Output format; json and csv are meant for monitoring'
+        )
+        parser.add_argument(
+            '--top', type=int, default=0,
+            help='Also list the N components with the fewest hours left'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Read-only; run from monitoring as often as needed
+        """
+        summary = level_summary()
+        worst = worst_components(options['top']) if options['top'] > 0 else []
+        output_format = options['format']
+
+        if output_format == 'json':
+            totals = {
+                key: sum(counts[key] for counts in summary.values())
+                for key in ('total', 'critical', 'warning', 'healthy')
+            }
+            self.stdout.write(json.dumps(
+                {'thresholds': {'critical': MAINTENANCE_HOURS_CRITICAL, 'warning': MAINTENANCE_HOURS_WARNING},
+                 'summary': totals, 'levels': summary, 'worst': list(worst)},
+                cls=DjangoJSONEncoder,
+            ))
+        elif output_format == 'csv':
+            self.write_csv(summary, worst, options['top'] > 0)
+        else:
+            self.write_text(summary, worst)
+
+    def write_csv(self, summary, worst, listing):
+        writer = csv.writer(self.stdout)
+        if listing:
+            writer.writerow(('model', 'id', 'component_name', 'serial_number', 'aircraft_id', 'maintenance_hours',
+                             'status'))
+            for row in worst:
+                writer.writerow((row['model'], row['pk'], row['component_name'], row['serial_number'],
+                                 row['aircraft_id'], row['maintenance_hours'], row['status']))
+            return
+        writer.writerow(('model', 'total', 'critical', 'warning', 'healthy'))
+        for model_name, counts in summary.items():
+            writer.writerow((model_name, counts['total'], counts['critical'], counts['warning'], counts['healthy']))
+
+    def write_text(self, summary, worst):
+        for row in worst:
+            line = f"{row['component_name']} ({row['model']} #{row['pk']}) - {row['maintenance_hours']} hours remaining"
+            if row['status'] == 'critical':
+                self.stdout.write(self.style.ERROR(f'CRITICAL: {line}'))
+            elif row['status'] == 'warning':
+                self.stdout.write(self.style.WARNING(f'WARNING: {line}'))
+            else:
+                self.stdout.write(f'HEALTHY: {line}')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:\n'
+                f'Critical: {sum(counts["critical"] for counts in summary.values())}\n'
+                f'Warning: {sum(counts["warning"] for counts in summary.values())}\n'
+                f'Healthy: {sum(counts["healthy"] for counts in summary.values())}'
+            )
+        )
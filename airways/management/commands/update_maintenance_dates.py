@@ -1,146 +1,189 @@
 """
-Enhanced maintenance models for whiteboard calendar
-Add these methods to your existing Component model or create management commands
+Recompute the recommended next maintenance date of operational components
+
+Dates come from maintenance.forecast: each aircraft's utilization is
+derived from its tech logs once per run, then components are read and
+projected a chunk at a time. Each chunk's changes are written with one
+bulk_update inside its own transaction; components_updated is sent for the
+rows written so the whiteboard, health snapshots and component trees follow.
+With --workers the id range of every component model is split into slices
+run by a pool of processes.
 """
-from django.core.management.base import BaseCommand
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time
+from itertools import islice
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+
+from airways.models import CommandRun
+from maintenance.forecast import FORECAST_FIELDS, due_dates, forecast, utilization
 from maintenance.models import (
     AircraftMainComponent, AircraftSubComponent,
-    AircraftSub2Component, AircraftSub3Component
+    AircraftSub2Component, AircraftSub3Component, ComponentUsageEntry
+)
+from maintenance.signals import components_updated
+
+COMPONENT_MODELS = (
+    AircraftMainComponent,
+    AircraftSubComponent,
+    AircraftSub2Component,
+    AircraftSub3Component,
 )
 
+# Components read and written per transaction
+CHUNK_SIZE = 1000
+
+# CommandRun recording the last full, non dry-run; --since last starts from it
+RUN_RECORD = 'update_maintenance_dates'
+
+
+def operational_components(Model, since=None):
+    """Components of `Model` whose date is maintained; with `since`, only those changed after it"""
+    components = Model.objects.filter(component_status='Attached', maintenance_status='Operational')
+    if since is not None:
+        # Flight hours reach maintenance_hours through the usage ledger rollup, which leaves updated_date alone
+        usage = ComponentUsageEntry.objects.filter(
+            content_type=ContentType.objects.get_for_model(Model),
+            object_id=OuterRef('pk'),
+            recorded_at__gte=since,
+        )
+        components = components.filter(Q(updated_date__gte=since) | Q(record_date__gte=since) | Exists(usage))
+    return components
+
+
+def _write_chunk(Model, changed):
+    with transaction.atomic():
+        Model.objects.bulk_update(changed, ['next_maintenance_date'])
+        components_updated.send(sender=Model, pks=[component.pk for component in changed])
+
+
+def update_range(model_name, first_pk, last_pk, now, rates, since=None, dry_run=False):
+    """
+    Update the components of one model with first_pk <= pk <= last_pk,
+    forecasting a chunk of components at a time. Returns (rows updated, diff lines).
+    """
+    Model = apps.get_model('maintenance', model_name)
+    rows = (
+        operational_components(Model, since).filter(pk__gte=first_pk, pk__lte=last_pk).order_by('pk')
+        .values_list('pk', 'serial_number', 'next_maintenance_date', Model.aircraft_field, *FORECAST_FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    updated = 0
+    diff = []
+    while chunk := list(islice(rows, CHUNK_SIZE)):
+        recommended = due_dates(forecast([row[3:] for row in chunk], rates, now)['recommended'], now)
+        changed = []
+        for (pk, serial_number, current_date, *_), next_date in zip(chunk, recommended):
+            if not next_date or next_date == current_date:
+                continue
+            if dry_run:
+                diff.append(f'{model_name} #{pk} {serial_number}: {current_date} -> {next_date}')
+            else:
+                changed.append(Model(pk=pk, next_maintenance_date=next_date))
+            updated += 1
+        if changed:
+            _write_chunk(Model, changed)
+    return updated, diff
+
+
+def _run_range(args):
+    return update_range(*args)
+
+
+def work_ranges(since, slices):
+    """(model name, first pk, last pk) for every model, each id range split into `slices`"""
+    ranges = []
+    for Model in COMPONENT_MODELS:
+        bounds = operational_components(Model, since).aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            continue
+        step = (bounds['last'] - bounds['first']) // slices + 1
+        for first_pk in range(bounds['first'], bounds['last'] + 1, step):
+            ranges.append((Model.__name__, first_pk, min(first_pk + step - 1, bounds['last'])))
+    return ranges
+
 
 class Command(BaseCommand):
     help = 'Update next maintenance dates for all components based on their calendar and hours'
 
-    def handle(self, *args, **kwargs):
-        """
-        Calculate and update next_maintenance_date for all components
-        This should run as a daily cron job
-        """
-        component_models = [
-            AircraftMainComponent,
-            AircraftSubComponent,
-            AircraftSub2Component,
-            AircraftSub3Component,
-        ]
-        
-        total_updated = 0
-        
-        for Model in component_models:
-            components = Model.objects.filter(
-                component_status='Attached',
-                maintenance_status='Operational'
-            )
-            
-            for component in components:
-                next_date = self.calculate_next_maintenance_date(component)
-                if next_date and next_date != component.next_maintenance_date:
-                    component.next_maintenance_date = next_date
-                    component.save(update_fields=['next_maintenance_date'])
-                    total_updated += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'Successfully updated {total_updated} component next maintenance dates')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes to spread the component id ranges over'
+        )
+        parser.add_argument(
+            '--since',
+            help='Only components changed after this date/time, or "last" for the previous full run'
         )
-    
-    def calculate_next_maintenance_date(self, component):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Print the dates that would change without writing them'
+        )
+
+    def handle(self, *args, **options):
         """
-        Calculate the next recommended maintenance date based on:
-        1. Calendar maintenance (item_calender)
-        2. Hours-based maintenance (min_maintenance_hours)
-        3. Cycle-based maintenance (max_item_cycle)
-        
-        Returns the earliest date when maintenance is recommended
+        Calculate and update next_maintenance_date for all components
+        This should run as a daily cron job; the recommended dates move with
+        the clock, so keep the nightly run full and use --since for runs
+        during the day
         """
-        potential_dates = []
-        
-        # 1. Calendar-based maintenance
-        if component.item_calender and component.item_calender_months:
-            # If calendar maintenance is approaching (within 30 days), recommend it
-            if component.item_calender:
-                days_until_due = (component.item_calender - timezone.now()).days
-                if 0 <= days_until_due <= 90:
-                    # Recommend 30 days before due date
-                    potential_dates.append(
-                        component.item_calender - timedelta(days=30)
-                    )
-        
-        # 2. Hours-based maintenance
-        if component.min_maintenance_hours:
-            # Estimate when hours will run out based on average usage
-            current_hours = component.maintenance_hours
-            min_hours = component.min_maintenance_hours
-            
-            if current_hours <= min_hours + 50:  # Within 50 hours of minimum
-                # Estimate 2 weeks ahead (conservative estimate)
-                potential_dates.append(
-                    timezone.now() + timedelta(days=14)
-                )
-        
-        # 3. Cycle-based maintenance
-        if component.max_item_cycle and component.item_cycle:
-            cycles_remaining = component.max_item_cycle - component.item_cycle
-            if cycles_remaining <= 10:  # Within 10 cycles
-                # Estimate based on average cycle rate
-                potential_dates.append(
-                    timezone.now() + timedelta(days=7)
-                )
-        
-        # Return the earliest potential date
-        if potential_dates:
-            return min(potential_dates)
-        
-        return None
-
-
-class UpdateComponentHoursCommand(BaseCommand):
-    """
-    Helper command to calculate maintenance hours remaining for components
-    """
-    help = 'Calculate maintenance hours status for all components'
-    
-    def handle(self, *args, **kwargs):
-        component_models = [
-            AircraftMainComponent,
-            AircraftSubComponent,
-            AircraftSub2Component,
-            AircraftSub3Component,
-        ]
-        
-        critical_components = 0
-        warning_components = 0
-        healthy_components = 0
-        
-        for Model in component_models:
-            components = Model.objects.filter(component_status='Attached')
-            
-            for component in components:
-                hours = component.maintenance_hours
-                
-                if hours < 10:
-                    critical_components += 1
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f'CRITICAL: {component.component_name} - {hours} hours remaining'
-                        )
-                    )
-                elif hours < 50:
-                    warning_components += 1
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'WARNING: {component.component_name} - {hours} hours remaining'
-                        )
-                    )
-                else:
-                    healthy_components += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'\nSummary:\n'
-                f'Critical: {critical_components}\n'
-                f'Warning: {warning_components}\n'
-                f'Healthy: {healthy_components}'
-            )
-        )
\ No newline at end of file
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers must be at least 1')
+        since = self.parse_since(options['since'])
+        dry_run = options['dry_run']
+        now = timezone.now()
+
+        if since is not None:
+            self.stdout.write(f'Only components changed since {since}')
+        rates = utilization(now)
+        ranges = work_ranges(since, workers)
+        tasks = [(model_name, first_pk, last_pk, now, rates, since, dry_run) for model_name, first_pk, last_pk in ranges]
+
+        if workers > 1 and len(tasks) > 1:
+            # Forked workers must open their own connections rather than share ours
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(_run_range, tasks))
+        else:
+            results = [update_range(*task) for task in tasks]
+
+        total_updated = sum(updated for updated, diff in results)
+        if dry_run:
+            for updated, diff in results:
+                for line in diff:
+                    self.stdout.write(line)
+            self.stdout.write(self.style.SUCCESS(f'{total_updated} component next maintenance dates would change'))
+            return
+
+        message = f'Successfully updated {total_updated} component next maintenance dates'
+        if since is None:
+            CommandRun.objects.update_or_create(command=RUN_RECORD, defaults={
+                'started_at': now, 'finished_at': timezone.now(), 'result': {'updated': total_updated},
+            })
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def parse_since(self, value):
+        if not value:
+            return None
+        if value == 'last':
+            last_run = CommandRun.objects.filter(command=RUN_RECORD).values_list('started_at', flat=True).first()
+            if last_run is None:
+                self.stdout.write(self.style.WARNING('No previous full run recorded; updating every component'))
+            return last_run
+        since = parse_datetime(value)
+        if since is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError(f'Invalid --since value {value!r}; use YYYY-MM-DD[ HH:MM] or "last"')
+            since = datetime.combine(day, time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
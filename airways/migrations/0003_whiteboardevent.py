@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airways', '0002_whiteboardchange'),
+        ('maintenance', '0005_componentmaintenance_actual_end_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhiteboardEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=100)),
+                ('event_id', models.CharField(max_length=100)),
+                ('event_type', models.CharField(max_length=30)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, max_length=30)),
+                ('payload', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('aircraft', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='maintenance.aircraft')),
+            ],
+            options={
+                'ordering': ['start', 'id'],
+                'indexes': [models.Index(fields=['start', 'end', 'aircraft', 'event_type'], name='whiteboard_event_range_idx')],
+            },
+        ),
+    ]
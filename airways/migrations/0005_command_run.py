@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:27
+
+from django.db import migrations, models
+
+
+def move_run_records(apps, schema_editor):
+    # Full runs used to be recorded as Completed BackgroundJob rows
+    BackgroundJob = apps.get_model('maintenance', 'BackgroundJob')
+    CommandRun = apps.get_model('airways', 'CommandRun')
+    records = BackgroundJob.objects.filter(name='command:update_maintenance_dates')
+    last = records.filter(status='Completed').order_by('-started_at').first()
+    if last is not None and last.started_at is not None:
+        CommandRun.objects.create(
+            command='update_maintenance_dates', started_at=last.started_at,
+            finished_at=last.finished_at or last.started_at, result={'updated': (last.result or {}).get('updated')},
+        )
+    records.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airways', '0004_cache_table'),
+        ('maintenance', '0013_background_job_singleton'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command', models.CharField(max_length=100, unique=True)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('result', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+        migrations.RunPython(move_run_records, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Resource(models.Model):
@@ -10,3 +11,62 @@ class Event(models.Model):
     title = models.CharField(max_length=100)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+
+
+class WhiteboardChange(models.Model):
+    """
+    Journal of whiteboard sources (flights, components, maintenance records)
+    touched by a write. The primary key doubles as the version token handed to
+    whiteboard clients for incremental refreshes.
+    """
+    source = models.CharField(max_length=100)
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.id}: {self.source}'
+
+
+class WhiteboardEvent(models.Model):
+    """
+    Denormalized whiteboard calendar event. Rows are rebuilt per source
+    (flight, component, maintenance record) whenever that source is written,
+    so the calendar endpoint reads them with a single range scan.
+    """
+    source = models.CharField(max_length=100, db_index=True)
+    event_id = models.CharField(max_length=100)
+    event_type = models.CharField(max_length=30)
+    aircraft = models.ForeignKey('maintenance.Aircraft', on_delete=models.CASCADE, blank=True, null=True,
+                                 related_name='+')
+    start = models.DateTimeField()
+    end = models.DateTimeField(blank=True, null=True)
+    # Flight status for flight and crew events, used by the status filter
+    status = models.CharField(max_length=30, blank=True)
+    # The event exactly as served to FullCalendar
+    payload = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['start', 'id']
+        indexes = [
+            models.Index(fields=['start', 'end', 'aircraft', 'event_type'], name='whiteboard_event_range_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event_id} ({self.source})'
+
+
+class CommandRun(models.Model):
+    """
+    The last full run of a management command that can resume from it
+    (update_maintenance_dates --since last); one row per command
+    """
+    command = models.CharField(max_length=100, unique=True)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    result = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f'{self.command} ({self.started_at:%Y-%m-%d %H:%M})'
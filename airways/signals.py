@@ -0,0 +1,104 @@
+"""
+Keep the materialized whiteboard events in step with the models they display
+"""
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from accounts.models import CustomUser
+from flight_dispatch.models import Flight
+from maintenance.models import (
+    Aircraft, AircraftMainComponent, AircraftSubComponent,
+    AircraftSub2Component, AircraftSub3Component, Airport, ComponentMaintenance
+)
+from maintenance.signals import components_updated, maintenance_updated
+from .whiteboard_changes import flight_source, component_source, maintenance_source
+from .whiteboard_store import mark_changed
+
+COMPONENT_MODELS = (
+    AircraftMainComponent,
+    AircraftSubComponent,
+    AircraftSub2Component,
+    AircraftSub3Component,
+)
+
+# Fields of related models copied into the stored event payloads
+CREW_DISPLAY_FIELDS = {'first_name', 'last_name'}
+AIRCRAFT_DISPLAY_FIELDS = {'abbreviation'}
+AIRPORT_DISPLAY_FIELDS = {'name'}
+
+
+def _display_fields_saved(created, update_fields, fields):
+    """Whether a save of an existing row may have changed one of `fields`"""
+    return not created and (update_fields is None or not fields.isdisjoint(update_fields))
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+def flight_changed(sender, instance, **kwargs):
+    mark_changed(flight_source(instance.pk))
+
+
+@receiver(m2m_changed, sender=Flight.cabin_crew.through)
+@receiver(m2m_changed, sender=Flight.flight_crew.through)
+def flight_crew_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        mark_changed(flight_source(instance.pk))
+    elif pk_set:
+        # Crew member side of the relation: every listed flight changed
+        mark_changed(*[flight_source(pk) for pk in pk_set])
+
+
+def component_changed(sender, instance, **kwargs):
+    mark_changed(component_source(sender.__name__, instance.pk))
+
+
+for model in COMPONENT_MODELS:
+    post_save.connect(component_changed, sender=model, dispatch_uid=f'whiteboard_{model.__name__}_saved')
+    post_delete.connect(component_changed, sender=model, dispatch_uid=f'whiteboard_{model.__name__}_deleted')
+
+
+@receiver(components_updated)
+def components_bulk_updated(sender, pks, **kwargs):
+    mark_changed(*[component_source(sender.__name__, pk) for pk in pks])
+
+
+@receiver(post_save, sender=ComponentMaintenance)
+@receiver(post_delete, sender=ComponentMaintenance)
+def maintenance_changed(sender, instance, **kwargs):
+    mark_changed(maintenance_source(instance.pk))
+
+
+@receiver(maintenance_updated)
+def maintenance_bulk_updated(sender, pks, **kwargs):
+    mark_changed(*[maintenance_source(pk) for pk in pks])
+
+
+@receiver(post_save, sender=CustomUser)
+def crew_member_changed(sender, instance, created, update_fields=None, **kwargs):
+    if not _display_fields_saved(created, update_fields, CREW_DISPLAY_FIELDS):
+        return
+    flights = Flight.objects.filter(Q(cabin_crew=instance) | Q(flight_crew=instance)).values_list('pk', flat=True)
+    mark_changed(*[flight_source(pk) for pk in flights.distinct()])
+
+
+@receiver(post_save, sender=Aircraft)
+def aircraft_changed(sender, instance, created, update_fields=None, **kwargs):
+    if not _display_fields_saved(created, update_fields, AIRCRAFT_DISPLAY_FIELDS):
+        return
+    sources = [flight_source(pk) for pk in Flight.objects.filter(aircraft=instance).values_list('pk', flat=True)]
+    # Syncing a component also resyncs its maintenance records
+    for model in COMPONENT_MODELS:
+        pks = model.objects.filter(**{model.aircraft_field: instance}).values_list('pk', flat=True)
+        sources.extend(component_source(model.__name__, pk) for pk in pks)
+    mark_changed(*sources)
+
+
+@receiver(post_save, sender=Airport)
+def airport_changed(sender, instance, created, update_fields=None, **kwargs):
+    if not _display_fields_saved(created, update_fields, AIRPORT_DISPLAY_FIELDS):
+        return
+    flights = Flight.objects.filter(Q(origin=instance) | Q(destination=instance)).values_list('pk', flat=True)
+    mark_changed(*[flight_source(pk) for pk in flights])
@@ -0,0 +1,328 @@
+import asyncio
+import gzip
+import json
+from concurrent.futures import Future
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from accounts.models import CustomUser
+from flight_dispatch.models import Flight
+from maintenance.models import (
+    AircraftMainComponent, AircraftSub2Component, AircraftSub3Component, AircraftSubComponent, Airport, BackgroundJob,
+)
+from entebbe.http import json_response
+from maintenance.tests import make_aircraft, make_component
+
+from . import whiteboard_store
+from .models import CommandRun, WhiteboardChange, WhiteboardEvent
+from .whiteboard_cache import invalidate_events
+from .whiteboard_changes import current_version, record_changes
+from .whiteboard_config import PUSH_QUEUE_SIZE
+from .whiteboard_formats import encode_columnar
+from .whiteboard_push import Broker, InProcessBroker
+from .whiteboard_store import decode_cursor, mark_changed, query_sections
+
+
+class MarkChangedTests(TestCase):
+    def test_rolled_back_source_is_synced_by_a_later_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    mark_changed('flight:999')
+                    raise RuntimeError
+            mark_changed('flight:999')
+
+        self.assertEqual(WhiteboardChange.objects.filter(source='flight:999').count(), 1)
+
+    def test_sources_are_synced_once_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_changed('flight:1')
+            mark_changed('flight:1', 'flight:2')
+
+        self.assertEqual(
+            sorted(WhiteboardChange.objects.values_list('source', flat=True)), ['flight:1', 'flight:2'])
+
+
+class CursorPagingTests(TestCase):
+    start = datetime(2025, 3, 1, 8, tzinfo=dt_timezone.utc)
+    params = {
+        'start': '2025-03-01', 'end': '2025-03-02',
+        'show_flights': True, 'show_crew': False, 'show_maintenance_due': False,
+        'show_maintenance_recommended': False, 'show_maintenance_scheduled': False,
+        'aircraft_filter': '', 'status_filter': '',
+    }
+
+    def add_event(self, source):
+        WhiteboardEvent.objects.create(
+            source=source, event_id=source, event_type='flight', start=self.start, payload={'id': source})
+
+    def test_rebuilt_source_is_not_repeated_on_the_next_page(self):
+        for number in range(1, 5):
+            self.add_event(f'flight:{number}')
+        first = query_sections(self.params, limit=2)
+
+        # A sync deletes and re-inserts a source's rows, giving them new ids
+        WhiteboardEvent.objects.filter(source='flight:1').delete()
+        self.add_event('flight:1')
+        invalidate_events([(None, self.start)])
+        second = query_sections(self.params, decode_cursor(first['next_cursor']), limit=2)
+
+        pages = [event['id'] for event in first['events'] + second['events']]
+        self.assertEqual(pages, ['flight:1', 'flight:2', 'flight:3', 'flight:4'])
+        self.assertIsNone(second['next_cursor'])
+
+
+class FailingCrewExecutor:
+    """Runs sections inline; the crew section fails"""
+
+    def submit(self, fn, event_types, *args):
+        future = Future()
+        if 'crew_cabin' in event_types:
+            future.set_exception(RuntimeError('crew section failed'))
+        else:
+            future.set_result(fn(event_types, *args, close_connections=False))
+        return future
+
+
+class DegradedSectionTests(TestCase):
+    params = dict(CursorPagingTests.params, show_crew=True)
+
+    @mock.patch.object(whiteboard_store, 'SECTION_WORKERS', 2)
+    @mock.patch.object(whiteboard_store, '_section_executor', FailingCrewExecutor)
+    def test_degraded_response_keeps_the_current_version(self):
+        record_changes(['flight:1'])
+        result = query_sections(self.params)
+
+        self.assertEqual(result['degraded'], ['crew'])
+        self.assertEqual(result['version'], current_version())
+        self.assertNotEqual(result['version'], 0)
+
+
+class DisplayFieldResyncTests(TestCase):
+    """Names copied into stored payloads follow renames of the related rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Build the stored events the tests rename
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.crew = CustomUser.objects.create(
+                username='crew', email='crew@example.com', staff_status='Active', first_name='Ann', last_name='Lee')
+            cls.aircraft = make_aircraft('5X-AAA')
+            airport = dict(icao='HUEN', country_name='Uganda', country_iso_alpha3='UGA', country_iso_alpha2='UG',
+                           city_name='Entebbe', latitude=0, longitude=0, timezone='UTC', time_shift='0', pcn='',
+                           tower_hours='24', slug='airport')
+            cls.origin = Airport.objects.create(name='Entebbe', iata='EBB', **airport)
+            destination = Airport.objects.create(name='Nairobi', iata='NBO', **airport)
+            cls.flight = Flight.objects.create(
+                flight_number='UR100', origin=cls.origin, destination=destination, aircraft=cls.aircraft,
+                departure_time=CursorPagingTests.start, arrival_time=CursorPagingTests.start, flight_leg_reference='x',
+                added_by=cls.crew)
+            cls.flight.cabin_crew.add(cls.crew)
+            cls.component = make_component(AircraftMainComponent, 'Engine 1', aircraft_attached=cls.aircraft,
+                                           next_maintenance_date=CursorPagingTests.start)
+
+    def setUp(self):
+        self.version = current_version()
+
+    def payload(self, event_type):
+        return WhiteboardEvent.objects.get(event_type=event_type).payload['extendedProps']
+
+    def test_renamed_crew_member_is_resynced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crew.last_name = 'Okello'
+            self.crew.save()
+
+        self.assertEqual(self.payload('crew_cabin')['crew_name'], 'Ann Okello')
+        self.assertEqual(self.payload('flight')['cabin_crew'], 'Ann Okello')
+
+    def test_login_does_not_resync_flights(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crew.save(update_fields=['last_login'])
+
+        self.assertFalse(WhiteboardChange.objects.filter(id__gt=self.version).exists())
+
+    def test_renamed_aircraft_is_resynced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aircraft.abbreviation = 'NEW'
+            self.aircraft.save()
+
+        self.assertEqual(self.payload('flight')['aircraft'], 'NEW')
+        self.assertEqual(self.payload('maintenance_recommended')['aircraft'], 'NEW')
+
+    def test_renamed_airport_is_resynced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.origin.name = 'Entebbe International'
+            self.origin.save()
+
+        self.assertEqual(self.payload('flight')['origin'], 'Entebbe International')
+
+
+class InProcessBrokerTests(SimpleTestCase):
+    def test_message_published_from_sync_code_reaches_every_subscriber(self):
+        async def scenario():
+            broker = InProcessBroker()
+            first, second = broker.subscribe(), broker.subscribe()
+            await asyncio.to_thread(broker.publish, {'version': 1})
+            return await first.get(1), await second.get(1)
+
+        self.assertEqual(asyncio.run(scenario()), ({'version': 1}, {'version': 1}))
+
+    def test_closed_subscription_receives_nothing(self):
+        async def scenario():
+            broker = InProcessBroker()
+            subscription = broker.subscribe()
+            subscription.close()
+            await asyncio.to_thread(broker.publish, {'version': 1})
+            return broker.subscriber_count, await subscription.get(0.05)
+
+        self.assertEqual(asyncio.run(scenario()), (0, None))
+
+    def test_full_queue_drops_the_oldest_messages(self):
+        async def scenario():
+            broker = InProcessBroker()
+            subscription = broker.subscribe()
+            for version in range(1, PUSH_QUEUE_SIZE + 3):
+                broker.publish({'version': version})
+            await asyncio.sleep(0)
+            return subscription.queue.qsize(), await subscription.get(1)
+
+        self.assertEqual(asyncio.run(scenario()), (PUSH_QUEUE_SIZE, {'version': 3}))
+
+    def test_broker_must_implement_unsubscribe(self):
+        class PublishOnly(Broker):
+            def publish(self, message):
+                pass
+
+            def subscribe(self):
+                pass
+
+        with self.assertRaises(TypeError):
+            PublishOnly()
+
+
+def decode_columnar(block):
+    """Python counterpart of decodeColumnar in the calendar template"""
+    events = [{} for _ in range(block['count'])]
+    for field, values in block['columns'].items():
+        encoding = block['encodings'][field]
+        *parents, key = field.split('.')
+        for event, value in zip(events, values):
+            if value is None:
+                continue
+            if encoding == 'dict':
+                value = block['strings'][value]
+            target = event
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[key] = value
+    return events
+
+
+class ColumnarEncodingTests(SimpleTestCase):
+    def test_compressed_response_rebuilds_the_events(self):
+        kampala = dt_timezone(timedelta(hours=3))
+        start = datetime(2025, 3, 1, 8, 0, tzinfo=kampala)
+        events = []
+        for number in range(40):
+            event = {
+                'id': f'flight-{number}',
+                'title': f'UR{number:03d}',
+                'start': start + timedelta(hours=number),
+                'end': (start + timedelta(hours=number + 1)).isoformat(),
+                'color': '#28a745' if number % 2 else '#dc3545',
+                'extendedProps': {'type': 'flight', 'aircraft': '5X-AAA', 'crew': None if number % 3 else 'J. Okello'},
+            }
+            if number == 7:
+                event['end'] = None
+                del event['color']
+            events.append(event)
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = json_response(request, encode_columnar(events))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        block = json.loads(gzip.decompress(response.content))
+
+        expected = []
+        for event in events:
+            event = {**event, 'extendedProps': {
+                key: value for key, value in event['extendedProps'].items() if value is not None}}
+            event['start'] = int(event['start'].timestamp())
+            if event['end'] is None:
+                del event['end']
+            else:
+                event['end'] = int(datetime.fromisoformat(event['end']).timestamp())
+            expected.append(event)
+        self.assertEqual(decode_columnar(block), expected)
+        self.assertEqual(block['encodings']['extendedProps.crew'], 'dict')
+        utc_start = datetime(2025, 3, 1, 5, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(block['columns']['start'][0], int(utc_start.timestamp()))
+
+
+class UpdateMaintenanceDatesTests(TestCase):
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('update_maintenance_dates', *args, stdout=out)
+        return out.getvalue()
+
+    def test_full_runs_keep_one_watermark_for_since_last(self):
+        self.assertIn('No previous full run recorded', self.run_command('--since', 'last'))
+        self.run_command()
+        first = CommandRun.objects.get(command='update_maintenance_dates').started_at
+        self.run_command('--since', 'last')
+        self.run_command()
+
+        run = CommandRun.objects.get(command='update_maintenance_dates')
+        self.assertGreater(run.started_at, first)
+        self.assertIn(f'since {run.started_at}', self.run_command('--since', 'last'))
+        self.assertFalse(BackgroundJob.objects.exists())
+
+
+class UpdateComponentHoursTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        hours = {'Engine 1': 40, 'Engine 2': 200, 'Gearbox': 5, 'Starter': 1, 'Pump': '9.99', 'Valve': 40, 'Seal': 60}
+        with cls.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.create(username='engineer', email='engineer@example.com', staff_status='Active')
+            aircraft = make_aircraft('5X-AAA')
+            main = make_component(AircraftMainComponent, 'Engine 1', aircraft_attached=aircraft)
+            make_component(AircraftMainComponent, 'Engine 2', aircraft_attached=make_aircraft('5X-BBB'))
+            sub = make_component(AircraftSubComponent, 'Gearbox', parent_component=main)
+            make_component(AircraftSubComponent, 'Starter', parent_component=main, component_status='Detached')
+            sub2 = make_component(AircraftSub2Component, 'Pump', parent_sub_component=sub)
+            make_component(AircraftSub2Component, 'Valve', parent_sub_component=sub)
+            make_component(AircraftSub3Component, 'Seal', parent_sub2_component=sub2)
+            for Model in (AircraftMainComponent, AircraftSubComponent, AircraftSub2Component, AircraftSub3Component):
+                for component in Model.objects.all():
+                    Model.objects.filter(pk=component.pk).update(maintenance_hours=hours[component.component_name])
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('update_component_hours', '--format', 'json', *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_levels_count_attached_components_per_bucket(self):
+        report = self.run_command()
+
+        self.assertEqual(report['levels'], {
+            'AircraftMainComponent': {'total': 2, 'critical': 0, 'warning': 1, 'healthy': 1},
+            'AircraftSubComponent': {'total': 1, 'critical': 1, 'warning': 0, 'healthy': 0},
+            'AircraftSub2Component': {'total': 2, 'critical': 1, 'warning': 1, 'healthy': 0},
+            'AircraftSub3Component': {'total': 1, 'critical': 0, 'warning': 0, 'healthy': 1},
+        })
+        self.assertEqual(report['summary'], {'total': 6, 'critical': 2, 'warning': 2, 'healthy': 2})
+        self.assertEqual(report['worst'], [])
+
+    def test_top_merges_the_levels_lowest_hours_first(self):
+        worst = self.run_command('--top', '5')['worst']
+
+        self.assertEqual(
+            [(row['component_name'], row['model'], row['status']) for row in worst],
+            [('Gearbox', 'AircraftSubComponent', 'critical'), ('Pump', 'AircraftSub2Component', 'critical'),
+             ('Engine 1', 'AircraftMainComponent', 'warning'), ('Valve', 'AircraftSub2Component', 'warning'),
+             ('Seal', 'AircraftSub3Component', 'healthy')],
+        )
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views, whiteboard_views
+from . import views, whiteboard_views, whiteboard_push
 
 urlpatterns = [
     path('dashboard/',views.eaw_home, name='ops_dash'),
@@ -8,6 +8,7 @@ urlpatterns = [
     # Whiteboard Calendar
     path('whiteboard/', whiteboard_views.whiteboard_calendar_view, name='whiteboard_calendar'),
     path('whiteboard/data/', whiteboard_views.whiteboard_calendar_data, name='whiteboard_calendar_data'),
+    path('whiteboard/stream/', whiteboard_push.whiteboard_stream, name='whiteboard_stream'),
     path('whiteboard/flight/<int:flight_id>/', whiteboard_views.get_flight_details, name='whiteboard_flight_details'),
     path('whiteboard/component/<str:component_type>/<int:component_id>/', whiteboard_views.get_component_details, name='whiteboard_component_details'),
     path('whiteboard/schedule-maintenance/', whiteboard_views.quick_schedule_maintenance, name='quick_schedule_maintenance'),
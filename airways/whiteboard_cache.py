@@ -0,0 +1,101 @@
+"""
+Whiteboard cache scopes
+
+Whiteboard entries are invalidated through generation counters
+(entebbe.generations). Scopes are (aircraft, month) pairs, with '*' standing
+for the unfiltered board. Events are cached in (aircraft, day, event type)
+buckets keyed by the generation of their month. Each sync of the whiteboard store
+bumps the scopes of the rows it removed and wrote, so scheduling one
+maintenance slot only drops the buckets of that aircraft and month.
+"""
+from datetime import date, datetime, timedelta, time as dt_time, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from entebbe.generations import bump, get_generations
+
+# Aircraft part of the scope for windows not filtered by aircraft
+ALL_AIRCRAFT = '*'
+
+# Bumped by a full rebuild; every whiteboard entry depends on it
+WHITEBOARD = 'whiteboard'
+
+# Whiteboard statistics depend on any change the store syncs
+STATS = 'whiteboard:stats'
+
+
+def _utc(value):
+    """Parse an ISO date/datetime string (or take a datetime) as an aware UTC datetime"""
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            parsed = datetime.combine(parsed_date, dt_time.min) if parsed_date else None
+        value = parsed
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, dt_time.min)
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(dt_timezone.utc)
+
+
+def month_scope(aircraft_id, when):
+    return f'{WHITEBOARD}:{aircraft_id or ALL_AIRCRAFT}:{when:%Y-%m}'
+
+
+def window_bounds(params):
+    """(start, end) of a whiteboard window in UTC, or None when the dates cannot be parsed"""
+    try:
+        start, end = _utc(params['start']), _utc(params['end'])
+    except ValueError:
+        return None
+    if start is None or end is None or end < start:
+        return None
+    return start, end
+
+
+def day_range(start, end):
+    """UTC days from `start` to `end` inclusive"""
+    day, last = start.date(), end.date()
+    days = []
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def day_start(day):
+    return datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+
+
+def bucket_keys(aircraft, days, event_types):
+    """
+    Cache key of every (day, event type) bucket of `aircraft` ('*' for the
+    whole board), under the generation of the month each day falls in
+    """
+    months = {day: month_scope(aircraft, day) for day in days}
+    generations = get_generations([WHITEBOARD, *set(months.values())])
+    return {
+        (day, event_type): f'whiteboard_events:{aircraft}:{day:%Y-%m-%d}:{event_type}:'
+                           f'{generations[WHITEBOARD]}:{generations[months[day]]}'
+        for day in days
+        for event_type in event_types
+    }
+
+
+def invalidate_events(events):
+    """Bump the scopes of whiteboard events given as (aircraft_id, start) pairs"""
+    scopes = {STATS}
+    for aircraft_id, start in events:
+        month = _utc(start)
+        scopes.add(month_scope(ALL_AIRCRAFT, month))
+        if aircraft_id:
+            scopes.add(month_scope(aircraft_id, month))
+    bump(*scopes)
+
+
+def invalidate_all():
+    bump(WHITEBOARD, STATS)
@@ -0,0 +1,119 @@
+"""
+Whiteboard change journal
+
+Every write that can alter what the whiteboard shows records the *source* it
+touched (a flight, a component or a maintenance record). The journal id is the
+version token clients hold, so a refresh only needs the events of the sources
+recorded after that version. Rows are written by whiteboard_store once the
+events for those sources have been rebuilt.
+
+Journal writers take a transaction-level lock before inserting, so ids are
+handed out in commit order. Otherwise a transaction could commit id 11 while
+id 10 was still uncommitted, and a client holding version 11 would never see
+the sources of id 10.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WhiteboardChange
+from .whiteboard_config import CHANGE_JOURNAL_RETENTION_HOURS
+
+# Source kinds
+FLIGHT = 'flight'
+COMPONENT = 'component'
+MAINTENANCE = 'maintenance'
+
+# Prune old journal rows once every N writes
+PRUNE_EVERY = 500
+
+# PostgreSQL advisory lock key serializing journal writes
+JOURNAL_LOCK_KEY = 0x77626a6c
+
+
+def flight_source(flight_id):
+    return f'{FLIGHT}:{flight_id}'
+
+
+def component_source(model_name, component_id):
+    return f'{COMPONENT}:{model_name}:{component_id}'
+
+
+def maintenance_source(maintenance_id):
+    return f'{MAINTENANCE}:{maintenance_id}'
+
+
+def parse_sources(sources):
+    """
+    Group source strings by kind:
+    {'flight': {ids}, 'component': {model_name: {ids}}, 'maintenance': {ids}}
+    """
+    grouped = {FLIGHT: set(), COMPONENT: {}, MAINTENANCE: set()}
+    for source in sources:
+        parts = source.split(':')
+        try:
+            if parts[0] == COMPONENT:
+                grouped[COMPONENT].setdefault(parts[1], set()).add(int(parts[2]))
+            elif parts[0] in (FLIGHT, MAINTENANCE):
+                grouped[parts[0]].add(int(parts[1]))
+        except (IndexError, ValueError):
+            continue
+    return grouped
+
+
+def current_version():
+    """Latest journal id, 0 when nothing has been recorded yet"""
+    return WhiteboardChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def changed_sources(since):
+    """
+    Sources touched after version `since`.
+    Returns None when the journal no longer covers that version (pruned or
+    unknown token) and the client has to reload everything.
+    """
+    oldest = WhiteboardChange.objects.order_by('id').values_list('id', flat=True).first()
+    latest = current_version()
+    if since > latest or (oldest is not None and since < oldest - 1):
+        return None
+
+    return set(
+        WhiteboardChange.objects.filter(id__gt=since).values_list('source', flat=True).distinct()
+    )
+
+
+def _lock_journal():
+    """
+    Hold the journal until the current transaction ends. SQLite already
+    allows only one writer at a time.
+    """
+    connection = transaction.get_connection()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [JOURNAL_LOCK_KEY])
+
+
+def record_changes(sources):
+    """
+    Write journal rows for `sources` and return the new version. Call inside
+    a transaction, as late as possible: the journal stays locked until it
+    commits.
+    """
+    _lock_journal()
+    changes = WhiteboardChange.objects.bulk_create(
+        [WhiteboardChange(source=source) for source in sources]
+    )
+    version = current_version()
+    if changes and any(change.id and change.id % PRUNE_EVERY == 0 for change in changes):
+        prune_journal(keep_after=version)
+    return version
+
+
+def prune_journal(keep_after=None):
+    """Drop journal rows older than the retention window, always keeping the latest one"""
+    cutoff = timezone.now() - timedelta(hours=CHANGE_JOURNAL_RETENTION_HOURS)
+    stale = WhiteboardChange.objects.filter(changed_at__lt=cutoff)
+    if keep_after:
+        stale = stale.filter(id__lt=keep_after)
+    return stale.delete()[0]
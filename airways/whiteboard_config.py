@@ -70,12 +70,38 @@ DEFAULT_FILTERS = {
 # How long to cache calendar data (in seconds)
 CACHE_DURATION = 120  # 2 minutes
 
+# How long to keep per-day event buckets (in seconds)
+# Writes invalidate them through generation counters; this only bounds memory.
+# On a process-local cache (locmem) buckets keep entebbe.generations.LOCAL_CACHE_TIMEOUT instead
+BUCKET_CACHE_DURATION = 3600  # 1 hour
+
+# Whiteboard sections (flights, crew, maintenance due/recommended/scheduled) are built in parallel
+SECTION_WORKERS = 5            # Threads shared by all requests in a process; 1 builds them one after another
+SECTION_TIMEOUT_SECONDS = 5    # Sections slower than this are left out and the client reloads them later
+
+# How long to cache whiteboard statistics (in seconds)
+# Whiteboard writes invalidate them at once; this bounds drift from the clock and crew changes
+STATS_CACHE_DURATION = 60
+
 # Auto-refresh interval (in milliseconds)
 AUTO_REFRESH_INTERVAL = 300000  # 5 minutes (300,000 ms)
 
+# How long to keep the change journal behind incremental refreshes (in hours)
+# Clients holding an older version token get a full reload instead
+CHANGE_JOURNAL_RETENTION_HOURS = 24
+
+# Server push (whiteboard/stream/)
+PUSH_KEEPALIVE_SECONDS = 25  # Send a comment line when idle so proxies keep the stream open
+PUSH_RETRY_MS = 5000         # How soon browsers reconnect after the stream drops
+PUSH_QUEUE_SIZE = 100        # Pending messages per open screen before the oldest are dropped
+
 # Maximum events to show at once (prevent overload)
+# Larger windows are paged with the cursor in X-Whiteboard-Next-Cursor
 MAX_EVENTS_PER_REQUEST = 1000
 
+# Days of cache buckets a section reads at a time while filling a page
+BUCKET_DAYS_PER_BATCH = 7
+
 # Query optimization: How many days to look ahead for maintenance
 MAINTENANCE_LOOKAHEAD_DAYS = 90  # 3 months
 
@@ -0,0 +1,82 @@
+"""
+Whiteboard response encodings
+
+`format=columnar` turns a list of calendar events into one array per field.
+Strings that repeat (crew names, airports, aircraft, statuses, colours) are
+stored once in a shared string table and referenced by index, and event
+start/end times are sent as integer epoch seconds. The calendar template
+decodes it back into FullCalendar events (decodeColumnar).
+
+Responses are sent with entebbe.http.json_response, which compresses them.
+"""
+from datetime import datetime
+
+COLUMNAR = 'columnar'
+
+# Fields sent as epoch seconds
+EPOCH_FIELDS = ('start', 'end')
+
+# Dictionary-encode a string column when at most this share of its values are distinct
+DICTIONARY_MAX_DISTINCT_RATIO = 0.5
+
+
+def _flatten(event, prefix=''):
+    for key, value in event.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            yield from _flatten(value, f'{path}.')
+        else:
+            yield path, value
+
+
+def _epoch(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp())
+
+
+def encode_columnar(events):
+    """
+    Columnar form of `events`:
+    {'format', 'count', 'strings', 'columns': {field: [...]}, 'encodings': {field: 'dict'|'epoch'|'plain'}}
+    Nested keys are joined with '.'; a null marks a field the event does not have.
+    """
+    rows = [dict(_flatten(event)) for event in events]
+    fields = []
+    for row in rows:
+        for field in row:
+            if field not in fields:
+                fields.append(field)
+
+    strings = []
+    string_index = {}
+    columns = {}
+    encodings = {}
+    for field in fields:
+        values = [row.get(field) for row in rows]
+        present = [value for value in values if value is not None]
+
+        if field in EPOCH_FIELDS:
+            encodings[field] = 'epoch'
+            columns[field] = [None if value is None else _epoch(value) for value in values]
+        elif present and all(isinstance(value, str) for value in present) \
+                and len(set(present)) <= len(present) * DICTIONARY_MAX_DISTINCT_RATIO:
+            encodings[field] = 'dict'
+            encoded = []
+            for value in values:
+                if value is not None and value not in string_index:
+                    string_index[value] = len(strings)
+                    strings.append(value)
+                encoded.append(None if value is None else string_index[value])
+            columns[field] = encoded
+        else:
+            encodings[field] = 'plain'
+            columns[field] = values
+
+    return {
+        'format': COLUMNAR,
+        'count': len(rows),
+        'strings': strings,
+        'columns': columns,
+        'encodings': encodings,
+    }
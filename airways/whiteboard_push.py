@@ -0,0 +1,174 @@
+"""
+Whiteboard server push
+
+Once the store has rebuilt and journalled a set of sources, the new version is
+published to a broker. Every open whiteboard holds a Server-Sent Events stream
+(`whiteboard/stream/`) and pulls the delta for that version as soon as it is
+told about it, instead of waiting for the polling interval.
+
+Streams hold their request open for as long as the screen is, so push is off
+unless `settings.WHITEBOARD_PUSH` is set, which only ASGI deployments should
+do; without it screens keep polling. The default broker fans out inside the
+current process, which covers a single ASGI worker and tests. Deployments
+running several processes point `settings.WHITEBOARD_PUSH_BROKER` at a Broker
+subclass backed by a shared service (Redis pub/sub, Postgres LISTEN/NOTIFY,
+...).
+"""
+import asyncio
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from .whiteboard_config import PUSH_KEEPALIVE_SECONDS, PUSH_QUEUE_SIZE, PUSH_RETRY_MS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER = 'airways.whiteboard_push.InProcessBroker'
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Broker(ABC):
+    """Interface for push backends"""
+
+    @abstractmethod
+    def publish(self, message):
+        """Deliver `message` (a JSON-serialisable dict) to every subscriber. Called from sync code."""
+
+    @abstractmethod
+    def subscribe(self):
+        """Return a Subscription for the calling event loop"""
+
+    @abstractmethod
+    def unsubscribe(self, subscription):
+        """Stop delivering to `subscription`; called when its stream closes"""
+
+
+class Subscription:
+    """One open stream's queue of messages"""
+
+    def __init__(self, broker, maxsize=PUSH_QUEUE_SIZE):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message):
+        """Queue a message; runs on the subscriber's loop"""
+        if self.queue.full():
+            # Messages only announce a newer version, so the oldest can go
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout):
+        """Next message, or None when nothing arrived within `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(Broker):
+    """Fan out to the streams open in this process"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Event loop already closed; the stream is going away
+                self.unsubscribe(subscription)
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'WHITEBOARD_PUSH_BROKER', DEFAULT_BROKER)
+                _broker = import_string(path)()
+    return _broker
+
+
+def set_broker(broker):
+    """Swap the broker, e.g. for tests. Returns the previous one."""
+    global _broker
+    previous, _broker = _broker, broker
+    return previous
+
+
+def push_enabled():
+    return getattr(settings, 'WHITEBOARD_PUSH', False)
+
+
+def publish_change(version, sources=(), reset=False):
+    """Announce a new whiteboard version. Failures never reach the writer."""
+    try:
+        get_broker().publish({'version': version, 'sources': list(sources), 'reset': reset})
+    except Exception:
+        logger.exception('Whiteboard push failed for version %s', version)
+
+
+def format_event(message):
+    """Encode a message as an SSE `change` event"""
+    return f"id: {message['version']}\nevent: change\ndata: {json.dumps(message)}\n\n"
+
+
+async def whiteboard_stream(request):
+    """
+    Server-Sent Events stream of whiteboard versions.
+    Must be served through entebbe.asgi; under WSGI it would pin a worker,
+    so it only exists with settings.WHITEBOARD_PUSH.
+    """
+    if not push_enabled():
+        raise Http404('Whiteboard push is disabled')
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+
+    async def events():
+        subscription = get_broker().subscribe()
+        try:
+            yield f'retry: {PUSH_RETRY_MS}\n\n'
+            while True:
+                message = await subscription.get(PUSH_KEEPALIVE_SECONDS)
+                if message is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_event(message)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
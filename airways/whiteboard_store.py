@@ -0,0 +1,670 @@
+"""
+Materialized whiteboard events
+
+Events are built once per source (a flight with its crew, a component, a
+maintenance record) and stored in WhiteboardEvent. Writes queue their source
+through mark_changed(); once the transaction commits, the rows for those
+sources are rebuilt and journalled together, so a client is never handed a
+version newer than the rows it was served.
+"""
+import binascii
+import heapq
+import json
+import logging
+import threading
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import partial
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from entebbe.commit_hooks import defer_until_commit
+from entebbe.generations import cache_timeout
+from flight_dispatch.models import Flight
+from maintenance.models import (
+    AircraftMainComponent, AircraftSubComponent,
+    AircraftSub2Component, AircraftSub3Component, ComponentMaintenance
+)
+from .models import WhiteboardEvent, WhiteboardChange
+from .whiteboard_cache import (
+    ALL_AIRCRAFT, bucket_keys, day_range, day_start, invalidate_all, invalidate_events, window_bounds
+)
+from .whiteboard_config import (
+    BUCKET_CACHE_DURATION, BUCKET_DAYS_PER_BATCH, MAX_EVENTS_PER_REQUEST, SECTION_TIMEOUT_SECONDS, SECTION_WORKERS
+)
+from .whiteboard_push import publish_change
+from .whiteboard_changes import (
+    FLIGHT, COMPONENT, MAINTENANCE, current_version, parse_sources, record_changes,
+    flight_source, component_source, maintenance_source
+)
+
+logger = logging.getLogger(__name__)
+
+# Color schemes for better organization
+FLIGHT_STATUS_COLORS = {
+    'Scheduled': '#007bff',
+    'Dispatching': '#17a2b8',
+    'OnTrip': '#20c997',
+    'Completed': '#28a745',
+    'Cancelled': '#6c757d',
+    'Delayed': '#ffc107',
+    'Arrived': '#28a745',
+    'Dispatched': '#0056b3',
+}
+
+EVENT_TYPE_COLORS = {
+    'flight': '#007bff',
+    'crew_cabin': '#28a745',
+    'crew_flight': '#198754',
+    'maintenance_due': '#dc3545',
+    'maintenance_recommended': '#fd7e14',
+    'maintenance_scheduled': '#6f42c1',
+}
+
+# Stored event types behind each whiteboard filter
+SECTION_EVENT_TYPES = {
+    'show_flights': ('flight', 'flight_return'),
+    'show_crew': ('crew_cabin', 'crew_flight'),
+    'show_maintenance_due': ('maintenance_due',),
+    'show_maintenance_recommended': ('maintenance_recommended',),
+    'show_maintenance_scheduled': ('maintenance_scheduled',),
+}
+
+# Event types the flight status filter applies to
+FLIGHT_EVENT_TYPES = ('flight', 'flight_return', 'crew_cabin', 'crew_flight')
+
+# Component date fields shown on the whiteboard: (field, event type, title prefix)
+COMPONENT_DATE_EVENTS = (
+    ('item_calender', 'maintenance_due', '🔴 DUE'),
+    ('next_maintenance_date', 'maintenance_recommended', '🟠 REC'),
+)
+
+COMPONENT_MODELS = {
+    'AircraftMainComponent': AircraftMainComponent,
+    'AircraftSubComponent': AircraftSubComponent,
+    'AircraftSub2Component': AircraftSub2Component,
+    'AircraftSub3Component': AircraftSub3Component,
+}
+
+# Rows read per query while building events
+CHUNK_SIZE = 500
+
+# Shared pool for building whiteboard sections (see query_sections)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Event builders
+# ---------------------------------------------------------------------------
+
+def _row(source, event_type, payload, start, end=None, aircraft_id=None, status=''):
+    return WhiteboardEvent(
+        source=source,
+        event_id=payload['id'],
+        event_type=event_type,
+        aircraft_id=aircraft_id,
+        start=start,
+        end=end,
+        status=status or '',
+        payload=payload,
+    )
+
+
+def flight_queryset():
+    crew = CustomUser.objects.only('id', 'first_name', 'last_name', 'employee_id')
+    return Flight.objects.select_related(
+        'aircraft', 'origin', 'destination'
+    ).prefetch_related(
+        Prefetch('cabin_crew', queryset=crew),
+        Prefetch('flight_crew', queryset=crew)
+    ).only(
+        'id', 'flight_number', 'departure_time', 'arrival_time',
+        'return_departure_time', 'return_arrival_time', 'flight_status',
+        'trip_type', 'aircraft__abbreviation', 'origin__name',
+        'destination__name'
+    )
+
+
+def flight_events(flight):
+    """Flight, return leg and crew events for one flight"""
+    source = flight_source(flight.id)
+    color = FLIGHT_STATUS_COLORS.get(flight.flight_status, '#007bff')
+    columns = {'aircraft_id': flight.aircraft_id, 'status': flight.flight_status}
+    cabin_crew = list(flight.cabin_crew.all())
+    flight_crew = list(flight.flight_crew.all())
+
+    # Main flight event
+    yield _row(source, 'flight', {
+        'id': f'f{flight.id}',
+        'title': f'✈️ {flight.flight_number}',
+        'start': flight.departure_time.isoformat(),
+        'end': flight.arrival_time.isoformat(),
+        'color': color,
+        'extendedProps': {
+            'type': 'flight',
+            'source': source,
+            'flight_id': flight.id,
+            'flight_number': flight.flight_number,
+            'origin': flight.origin.name,
+            'destination': flight.destination.name,
+            'aircraft': flight.aircraft.abbreviation,
+            'status': flight.flight_status,
+            'cabin_crew': ", ".join(f'{c.first_name} {c.last_name}' for c in cabin_crew),
+            'flight_crew': ", ".join(f'{c.first_name} {c.last_name}' for c in flight_crew),
+        }
+    }, flight.departure_time, flight.arrival_time, **columns)
+
+    # Return flight
+    if flight.trip_type == 'round-trip' and flight.return_departure_time:
+        yield _row(source, 'flight_return', {
+            'id': f'fr{flight.id}',
+            'title': f'↩️ {flight.flight_number}',
+            'start': flight.return_departure_time.isoformat(),
+            'end': flight.return_arrival_time.isoformat(),
+            'color': color,
+            'extendedProps': {
+                'type': 'flight_return',
+                'source': source,
+                'flight_id': flight.id,
+                'flight_number': flight.flight_number,
+                'origin': flight.destination.name,
+                'destination': flight.origin.name,
+                'aircraft': flight.aircraft.abbreviation,
+                'status': flight.flight_status,
+            }
+        }, flight.return_departure_time, flight.return_arrival_time, **columns)
+
+    # Crew schedules
+    for crew_list, prefix, event_type, icon, crew_type in (
+            (cabin_crew, 'cc', 'crew_cabin', '👤', 'Cabin Crew'),
+            (flight_crew, 'fc', 'crew_flight', '✈️', 'Flight Crew')):
+        for crew in crew_list:
+            yield _row(source, event_type, {
+                'id': f'{prefix}{crew.id}f{flight.id}',
+                'title': f'{icon} {crew.first_name} {crew.last_name}',
+                'start': flight.departure_time.isoformat(),
+                'end': flight.arrival_time.isoformat(),
+                'color': EVENT_TYPE_COLORS[event_type],
+                'extendedProps': {
+                    'type': 'crew_schedule',
+                    'source': source,
+                    'crew_id': crew.id,
+                    'crew_name': f'{crew.first_name} {crew.last_name}',
+                    'crew_type': crew_type,
+                    'flight_number': flight.flight_number,
+                    'flight_id': flight.id,
+                }
+            }, flight.departure_time, flight.arrival_time, **columns)
+
+
+def component_queryset(model_name):
+    model = COMPONENT_MODELS[model_name]
+    return model.objects.select_related(model.aircraft_field)
+
+
+def component_aircraft(component):
+    """Root aircraft of a component at any level (denormalized on the row)"""
+    return component.root_aircraft
+
+
+def component_events(component):
+    """Calendar-due and recommended maintenance events for one component"""
+    if component.component_status != 'Attached':
+        return
+
+    model_name = type(component).__name__
+    source = component_source(model_name, component.id)
+    aircraft = component_aircraft(component)
+
+    for field, event_type, title_prefix in COMPONENT_DATE_EVENTS:
+        date_value = getattr(component, field)
+        if date_value is None:
+            continue
+
+        yield _row(source, event_type, {
+            'id': f'{event_type}{model_name[:4]}{component.id}',
+            'title': f'{title_prefix}: {component.component_name[:25]}',
+            'start': date_value.isoformat(),
+            'allDay': True,
+            'color': EVENT_TYPE_COLORS[event_type],
+            'extendedProps': {
+                'type': event_type,
+                'source': source,
+                'component_id': component.id,
+                'component_name': component.component_name,
+                'component_type': model_name,
+                'aircraft': str(aircraft) if aircraft else 'N/A',
+                'aircraft_id': aircraft.id if aircraft else None,
+                'serial_number': component.serial_number,
+                'maintenance_hours': float(component.maintenance_hours),
+                field: date_value.strftime('%Y-%m-%d'),
+            }
+        }, date_value, aircraft_id=aircraft.id if aircraft else None)
+
+
+def maintenance_queryset():
+    # Components are attached per chunk by ComponentMaintenance.resolve_components
+    return ComponentMaintenance.objects.only(
+        'id', 'start_date', 'end_date', 'maintenance_type',
+        'main_type_schedule', 'remarks', 'object_id', 'content_type'
+    )
+
+
+def maintenance_events(maint):
+    """Scheduled maintenance event for one maintenance record"""
+    component = maint.component_to_maintain
+    if not component:
+        return
+
+    aircraft = component_aircraft(component)
+    source = maintenance_source(maint.id)
+
+    yield _row(source, 'maintenance_scheduled', {
+        'id': f'm{maint.id}',
+        'title': f'🛠️ {maint.maintenance_type}: {component.component_name[:20]}',
+        'start': maint.start_date.isoformat(),
+        'end': maint.end_date.isoformat(),
+        'color': EVENT_TYPE_COLORS['maintenance_scheduled'],
+        'extendedProps': {
+            'type': 'maintenance_scheduled',
+            'source': source,
+            'maintenance_id': maint.id,
+            'component_name': component.component_name,
+            'aircraft': str(aircraft) if aircraft else 'N/A',
+            'maintenance_type': maint.maintenance_type,
+            'status': maint.main_type_schedule,
+            'remarks': maint.remarks,
+        }
+    }, maint.start_date, maint.end_date, aircraft_id=aircraft.id if aircraft else None)
+
+
+def build_rows(grouped=None):
+    """
+    Yield WhiteboardEvent rows for the sources in `grouped` (as returned by
+    parse_sources), or for every source when `grouped` is None.
+    """
+    flights = flight_queryset()
+    maintenances = maintenance_queryset()
+    if grouped is not None:
+        flights = flights.filter(id__in=grouped[FLIGHT]) if grouped[FLIGHT] else flights.none()
+        maintenances = maintenances.filter(id__in=grouped[MAINTENANCE]) if grouped[MAINTENANCE] else maintenances.none()
+
+    for flight in flights.iterator(chunk_size=CHUNK_SIZE):
+        yield from flight_events(flight)
+
+    for model_name in COMPONENT_MODELS:
+        components = component_queryset(model_name).filter(component_status='Attached').filter(
+            Q(item_calender__isnull=False) | Q(next_maintenance_date__isnull=False)
+        )
+        if grouped is not None:
+            ids = grouped[COMPONENT].get(model_name)
+            if not ids:
+                continue
+            components = components.filter(id__in=ids)
+        for component in components.iterator(chunk_size=CHUNK_SIZE):
+            yield from component_events(component)
+
+    records = maintenances.iterator(chunk_size=CHUNK_SIZE)
+    while chunk := list(islice(records, CHUNK_SIZE)):
+        for maint in ComponentMaintenance.resolve_components(chunk):
+            yield from maintenance_events(maint)
+
+
+# ---------------------------------------------------------------------------
+# Keeping the store current
+# ---------------------------------------------------------------------------
+
+def mark_changed(*sources):
+    """
+    Queue sources for rebuilding. The work runs once the surrounding
+    transaction commits, so a flight saved and then given its crew in the same
+    request is rebuilt and journalled once.
+    """
+    if sources:
+        defer_until_commit('whiteboard_sources', sources, _flush)
+
+
+def _flush(sources):
+    try:
+        sync_sources(sources)
+    except Exception:
+        # The request itself has already committed; `rebuild_whiteboard_events --check --fix` repairs the store
+        logger.exception('Whiteboard sync failed for %s', sorted(sources))
+
+
+def sync_sources(sources):
+    """Rebuild the rows for `sources`, journal them and return the new version"""
+    grouped = parse_sources(sources)
+    sources = set(sources)
+
+    # Scheduled maintenance events carry their component's name and aircraft
+    for model_name, ids in grouped[COMPONENT].items():
+        Model = COMPONENT_MODELS.get(model_name)
+        if not Model:
+            continue
+        content_type = ContentType.objects.get_for_model(Model)
+        maintenance_ids = ComponentMaintenance.objects.filter(
+            content_type=content_type, object_id__in=ids
+        ).values_list('id', flat=True)
+        grouped[MAINTENANCE].update(maintenance_ids)
+        sources.update(maintenance_source(pk) for pk in maintenance_ids)
+
+    # (aircraft_id, start) of every row removed or written, for cache invalidation
+    touched = []
+    with transaction.atomic():
+        stale = WhiteboardEvent.objects.filter(source__in=sources)
+        touched.extend(stale.values_list('aircraft_id', 'start'))
+        stale.delete()
+        _insert(_track(build_rows(grouped), touched))
+        version = record_changes(sorted(sources))
+    transaction.on_commit(partial(invalidate_events, touched))
+    transaction.on_commit(partial(publish_change, version, sorted(sources)))
+    return version
+
+
+def rebuild_all():
+    """
+    Rebuild the whole table from the source models. The change journal is
+    cleared as well, which sends every open whiteboard a full reload.
+    """
+    with transaction.atomic():
+        WhiteboardEvent.objects.all().delete()
+        WhiteboardChange.objects.all().delete()
+        total = _insert(build_rows())
+    transaction.on_commit(invalidate_all)
+    transaction.on_commit(partial(publish_change, 0, reset=True))
+    return total
+
+
+def _track(rows, touched):
+    for row in rows:
+        touched.append((row.aircraft_id, row.start))
+        yield row
+
+
+def _insert(rows):
+    """bulk_create `rows` chunk by chunk without materializing the whole iterable"""
+    rows = iter(rows)
+    total = 0
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return total
+        WhiteboardEvent.objects.bulk_create(chunk)
+        total += len(chunk)
+
+
+def _signature(event_type, aircraft_id, start, end, status, payload):
+    return event_type, aircraft_id, start, end, status, payload
+
+
+def check_consistency():
+    """
+    Compare the stored rows with a fresh build of every source.
+    Returns counts of missing, stale and orphaned rows and the sources affected.
+    """
+    expected = {
+        (row.source, row.event_id): _signature(
+            row.event_type, row.aircraft_id, row.start, row.end, row.status, row.payload
+        )
+        for row in build_rows()
+    }
+
+    report = {'missing': 0, 'stale': 0, 'orphaned': 0, 'sources': set()}
+    stored = WhiteboardEvent.objects.values_list(
+        'source', 'event_id', 'event_type', 'aircraft_id', 'start', 'end', 'status', 'payload'
+    )
+    for source, event_id, *columns in stored.iterator(chunk_size=CHUNK_SIZE):
+        signature = expected.pop((source, event_id), None)
+        if signature is None:
+            report['orphaned'] += 1
+            report['sources'].add(source)
+        elif signature != _signature(*columns):
+            report['stale'] += 1
+            report['sources'].add(source)
+
+    report['missing'] = len(expected)
+    report['sources'].update(source for source, _ in expected)
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def selected_event_types(params):
+    """Stored event types enabled by the show_* flags in `params`"""
+    return [
+        event_type
+        for flag, types in SECTION_EVENT_TYPES.items() if params[flag]
+        for event_type in types
+    ]
+
+
+def query_events(params, sources=None, limit=None):
+    """
+    Events for the window and filters in `params` as one indexed range scan.
+    `sources` restricts the result to events originating from those sources;
+    `limit` caps the number of events read.
+    """
+    rows = WhiteboardEvent.objects.filter(
+        start__gte=params['start'],
+        start__lte=params['end'],
+        event_type__in=selected_event_types(params),
+    )
+    if params['aircraft_filter']:
+        rows = rows.filter(aircraft_id=params['aircraft_filter'])
+    if params['status_filter']:
+        rows = rows.filter(Q(status=params['status_filter']) | ~Q(event_type__in=FLIGHT_EVENT_TYPES))
+    if sources is not None:
+        rows = rows.filter(source__in=sources)
+
+    payloads = rows.values_list('payload', flat=True)
+    return list(payloads[:limit] if limit is not None else payloads)
+
+
+def encode_cursor(start, key):
+    """
+    Opaque cursor pointing just after the event at `start` with `key`, its
+    (source, event id). Unlike the row id, that key survives the source being
+    rebuilt between two page requests.
+    """
+    return urlsafe_b64encode(json.dumps([start.isoformat(), *key]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(start, (source, event id)) from a cursor; raises ValueError when it is malformed"""
+    try:
+        start, source, event_id = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+        start = datetime.fromisoformat(start)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+    if timezone.is_naive(start) or not isinstance(source, str) or not isinstance(event_id, str):
+        raise ValueError('Invalid cursor')
+    return start, (source, event_id)
+
+
+def query_sections(params, cursor=None, limit=MAX_EVENTS_PER_REQUEST):
+    """
+    The window in `params` assembled section by section (flights, crew and
+    the three maintenance kinds). Sections run concurrently on a bounded
+    thread pool, each reading its (aircraft, day, event type) cache buckets
+    and only querying days with a missing bucket.
+
+    At most `limit` events ordered by (start, source, event id) are
+    returned, starting after `cursor` (see decode_cursor); `next_cursor` is
+    set when more follow. Sections stop reading days once they have enough
+    events, so a request never builds much more than one page.
+
+    A section that fails or is still running after SECTION_TIMEOUT_SECONDS
+    is left out of the response and named in `degraded`. The version still
+    covers the sections returned; a client given a degraded page reloads the
+    window in full rather than relying on deltas for the missing sections.
+
+    Returns {'version', 'events', 'next_cursor', 'timings', 'degraded'},
+    timings in milliseconds per section, or None when the window dates
+    cannot be parsed.
+    """
+    bounds = window_bounds(params)
+    if bounds is None:
+        return None
+
+    # Read the version before building so changes made meanwhile are resent
+    version = current_version()
+    sections = {
+        flag.removeprefix('show_'): event_types
+        for flag, event_types in SECTION_EVENT_TYPES.items() if params[flag]
+    }
+    # One extra event tells whether another page follows
+    section_args = (params, bounds, cursor, limit + 1, version)
+
+    if len(sections) > 1 and SECTION_WORKERS > 1:
+        futures = {
+            name: _section_executor().submit(_timed_section, event_types, *section_args)
+            for name, event_types in sections.items()
+        }
+        deadline = time.monotonic() + SECTION_TIMEOUT_SECONDS
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                logger.warning('Whiteboard section %s timed out', name)
+            except Exception:
+                logger.exception('Whiteboard section %s failed', name)
+    else:
+        results = {
+            name: _timed_section(event_types, *section_args, close_connections=False)
+            for name, event_types in sections.items()
+        }
+
+    degraded = [name for name in sections if name not in results]
+    timings = {name: elapsed for name, (_, _, elapsed) in results.items()}
+    entries = list(islice(heapq.merge(
+        *(section_entries for _, section_entries, _ in results.values()),
+        key=lambda entry: (entry[0], entry[1])
+    ), limit + 1))
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(entries[-1][0], entries[-1][1])
+
+    version = min([version] + [section_version for section_version, _, _ in results.values()])
+    return {
+        'version': version,
+        'events': [entry[4] for entry in entries],
+        'next_cursor': next_cursor,
+        'timings': timings,
+        'degraded': degraded,
+    }
+
+
+def _section_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SECTION_WORKERS, thread_name_prefix='whiteboard')
+    return _executor
+
+
+def _timed_section(event_types, params, bounds, cursor, limit, version, close_connections=True):
+    started = time.perf_counter()
+    try:
+        section_version, entries = _section_entries(event_types, params, bounds, cursor, limit, version)
+    finally:
+        if close_connections:
+            # Pool threads are outside the request cycle that usually does this
+            close_old_connections()
+    return section_version, entries, (time.perf_counter() - started) * 1000
+
+
+def _section_entries(event_types, params, bounds, cursor, limit, version):
+    """
+    The first `limit` entries (start, (source, event id), event_type, status,
+    payload) of `event_types` in the window after `cursor`, sorted, from
+    cache buckets so overlapping day, week and month windows share their
+    work. Days are read
+    in batches in date order until enough entries are found; within a batch
+    only days with a missing bucket are queried, one range scan per run of
+    consecutive days.
+
+    Also returns the oldest version any bucket used was built at, so a delta
+    requested from it covers everything the buckets may lack.
+    """
+    start, end = bounds
+    if cursor:
+        start = max(start, cursor[0])
+    aircraft = params['aircraft_filter'] or ALL_AIRCRAFT
+    status = params['status_filter']
+
+    def wanted(entry):
+        return (
+            start <= entry[0] <= end
+            and (not cursor or (entry[0], entry[1]) > cursor)
+            and (not status or entry[3] == status or entry[2] not in FLIGHT_EVENT_TYPES)
+        )
+
+    days = day_range(start, end)
+    entries = []
+    for offset in range(0, len(days), BUCKET_DAYS_PER_BATCH):
+        keys = bucket_keys(aircraft, days[offset:offset + BUCKET_DAYS_PER_BATCH], event_types)
+        found = cache.get_many(list(keys.values()))
+        buckets = {slot: found[key] for slot, key in keys.items() if key in found}
+
+        missing = [slot for slot in keys if slot not in buckets]
+        for run in _day_runs(sorted({day for day, _ in missing})):
+            run_types = {event_type for day, event_type in missing if day in run}
+            built = _build_buckets(aircraft, run, run_types, version)
+            cache.set_many({keys[slot]: bucket for slot, bucket in built.items()}, cache_timeout(BUCKET_CACHE_DURATION))
+            buckets.update(built)
+
+        for built_version, bucket in buckets.values():
+            version = min(version, built_version)
+            entries.extend(entry for entry in bucket if wanted(entry))
+        # Batches are in date order, so later ones only hold later events
+        if len(entries) >= limit:
+            break
+
+    entries.sort(key=lambda entry: (entry[0], entry[1]))
+    return version, entries[:limit]
+
+
+def _day_runs(days):
+    """Split sorted days into runs of consecutive days"""
+    runs = []
+    for day in days:
+        if runs and day - runs[-1][-1] == timedelta(days=1):
+            runs[-1].append(day)
+        else:
+            runs.append([day])
+    return runs
+
+
+def _build_buckets(aircraft, days, event_types, version):
+    """Read the buckets for `days` x `event_types` with one range scan"""
+    buckets = {(day, event_type): (version, []) for day in days for event_type in event_types}
+    rows = WhiteboardEvent.objects.filter(
+        start__gte=day_start(days[0]),
+        start__lt=day_start(days[-1] + timedelta(days=1)),
+        event_type__in=event_types,
+    )
+    if aircraft != ALL_AIRCRAFT:
+        rows = rows.filter(aircraft_id=aircraft)
+
+    for start, source, event_id, event_type, status, payload in rows.values_list(
+            'start', 'source', 'event_id', 'event_type', 'status', 'payload'):
+        buckets[(start.astimezone(dt_timezone.utc).date(), event_type)][1].append(
+            (start, (source, event_id), event_type, status, payload)
+        )
+    return buckets
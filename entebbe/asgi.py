@@ -2,6 +2,9 @@
 ASGI config for entebbe project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The whiteboard push stream (airways.whiteboard_push) needs to be served
+through it, e.g. ``uvicorn entebbe.asgi:application``, with WHITEBOARD_PUSH=True
+in the environment; WSGI deployments leave it off and the whiteboard polls.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
@@ -0,0 +1,45 @@
+"""
+Work batched until the current transaction commits
+
+Signal receivers that refresh derived data (whiteboard rows, health snapshots,
+batch counts) queue what changed with defer_until_commit(). Everything queued
+under one key during a transaction is handed to its callback once, after the
+commit. The batch lives in the connection's own on_commit hook, so a rollback
+discards it together with the hook and nothing is left behind to hide later
+changes.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+class _Batch:
+    """An on_commit hook collecting the items of one key"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.items = set()
+        self.called = False
+
+    def __call__(self):
+        self.called = True
+        self.callback(self.items)
+
+
+def _hook_pending(connection, batch):
+    return not batch.called and any(hook[1] is batch for hook in connection.run_on_commit)
+
+
+def defer_until_commit(key, items, callback, using=None):
+    """
+    Call callback(items) once the current transaction commits, with the items
+    of every call for `key` in that transaction. Outside a transaction the
+    callback runs at once.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    batches = connection.__dict__.setdefault('deferred_batches', {})
+    batch = batches.get(key)
+    if batch is not None and _hook_pending(connection, batch):
+        batch.items.update(items)
+        return
+    batch = batches[key] = _Batch(callback)
+    batch.items.update(items)
+    transaction.on_commit(batch, using=using)
@@ -0,0 +1,70 @@
+"""
+Generation-counter cache invalidation
+
+Cached values are keyed by the current generation of every scope they depend
+on. Invalidating a scope is one incr of its counter: entries built under the
+old generation are never read again and expire on their own timeout. Only
+get_many/add/incr are used, so this works on every cache backend (locmem,
+file, database, memcached, redis), unlike delete_pattern. Counters kept in a
+process-local cache (locmem) never see other processes' bumps, so there
+cache_timeout() caps entries at LOCAL_CACHE_TIMEOUT.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+GENERATION_PREFIX = 'generation:'
+
+# Longest an entry may live in a process-local cache, in seconds
+LOCAL_CACHE_TIMEOUT = 120
+
+
+def _initial_generation():
+    # Start from the clock rather than 1 so a counter evicted from the cache
+    # never comes back at a value older entries were stored under
+    return int(time.time() * 1000)
+
+
+def cache_timeout(timeout):
+    """
+    `timeout` on a cache shared between processes; on a process-local cache at
+    most LOCAL_CACHE_TIMEOUT, since writes in other processes cannot invalidate it
+    """
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return min(timeout, LOCAL_CACHE_TIMEOUT)
+    return timeout
+
+
+def get_generations(scopes):
+    """Current generation of each scope, creating missing counters"""
+    keys = {scope: GENERATION_PREFIX + scope for scope in scopes}
+    found = cache.get_many(list(keys.values()))
+    generations = {}
+    for scope, key in keys.items():
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key, 0)
+        generations[scope] = found[key]
+    return generations
+
+
+def bump(*scopes):
+    """Invalidate everything cached under `scopes`"""
+    for scope in set(scopes):
+        key = GENERATION_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Nothing was ever cached under a scope without a counter
+            cache.add(key, _initial_generation(), None)
+
+
+def versioned_key(prefix, scopes, *parts):
+    """Cache key for `parts` under the current generation of `scopes`"""
+    generations = sorted(get_generations(scopes).items())
+    digest = hashlib.md5(json.dumps([generations, parts], default=str).encode()).hexdigest()
+    return f'{prefix}:{digest}'
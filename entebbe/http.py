@@ -0,0 +1,43 @@
+"""
+JSON responses shared by the API views
+
+Responses are compact JSON, compressed with brotli when the module is
+installed and the client accepts it, gzip otherwise.
+"""
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def _accepted_encodings(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    return {part.split(';')[0].strip().lower() for part in header.split(',')}
+
+
+def json_response(request, data, status=200):
+    """Compact JSON response, compressed when the client accepts it"""
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    response = HttpResponse(content_type='application/json', status=status)
+    response['Vary'] = 'Accept-Encoding'
+
+    accepted = _accepted_encodings(request)
+    if len(body) >= MIN_COMPRESS_BYTES:
+        if brotli is not None and 'br' in accepted:
+            body = brotli.compress(body)
+            response['Content-Encoding'] = 'br'
+        elif 'gzip' in accepted:
+            body = gzip.compress(body, compresslevel=6)
+            response['Content-Encoding'] = 'gzip'
+
+    response.content = body
+    return response
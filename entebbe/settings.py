@@ -89,6 +89,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'entebbe.wsgi.application'
 
+# Whiteboard server push (airways.whiteboard_push) keeps one request open per
+# whiteboard screen, so only turn it on where entebbe.asgi is served
+WHITEBOARD_PUSH = config('WHITEBOARD_PUSH', default=False, cast=bool)
+
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
@@ -103,6 +107,16 @@ DATABASES = {
     }
 }
 
+# Cache shared by every web worker, the run_jobs worker and management
+# commands, so invalidations (generation bumps) made in one process reach the
+# others. The table is created by the airways migrations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'entebbe_cache',
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -3,7 +3,8 @@ from django.contrib import admin
 # Register your models here.
 
 from .models import Aircraft, FlightTechLog, AircraftMainComponent, AircraftSub2Component, AircraftMaintenanceTechLog, \
-    AircraftSubComponent, AircraftMaintenance, AircraftSub3Component, Airport
+    AircraftSubComponent, AircraftMaintenance, AircraftSub3Component, Airport, ComponentUsageEntry, BackgroundJob, \
+    MaintenanceBatch
 
 admin.site.register(Aircraft)
 admin.site.register(AircraftMainComponent)
@@ -14,3 +15,6 @@ admin.site.register(AircraftSub2Component)
 admin.site.register(AircraftSub3Component)
 admin.site.register(AircraftMaintenanceTechLog)
 admin.site.register(Airport)
+admin.site.register(ComponentUsageEntry)
+admin.site.register(BackgroundJob)
+admin.site.register(MaintenanceBatch)
@@ -0,0 +1,50 @@
+"""
+Keep MaintenanceBatch record counts and the maintenance list facets in step
+with their ComponentMaintenance rows
+
+Saving, deleting or bulk updating a record marks its batch; once the transaction commits,
+every marked batch is recounted with one aggregate query, however many of
+its records changed, and the cached facets are invalidated. Aircraft
+maintenance schedules only invalidate the facets, for the dashboard counts.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from entebbe.commit_hooks import defer_until_commit
+from .facets import invalidate_facets
+from .models import AircraftMaintenance, ComponentMaintenance, MaintenanceBatch
+from .signals import maintenance_updated
+
+
+def mark_maintenance_changed(*batch_ids):
+    """Queue the facets, and `batch_ids` for recounting, once the surrounding transaction commits"""
+    defer_until_commit('maintenance_facets', (), _invalidate_facets)
+    batch_ids = {batch_id for batch_id in batch_ids if batch_id}
+    if batch_ids:
+        defer_until_commit('maintenance_batches', batch_ids, _refresh_batches)
+
+
+def _invalidate_facets(items):
+    invalidate_facets()
+
+
+def _refresh_batches(batch_ids):
+    for batch in MaintenanceBatch.objects.filter(pk__in=batch_ids):
+        batch.refresh_counts()
+
+
+@receiver(post_save, sender=ComponentMaintenance)
+@receiver(post_delete, sender=ComponentMaintenance)
+def maintenance_changed(sender, instance, **kwargs):
+    mark_maintenance_changed(instance.batch_id)
+
+
+@receiver(maintenance_updated)
+def maintenance_bulk_updated(sender, pks, **kwargs):
+    mark_maintenance_changed(*sender.objects.filter(pk__in=pks).values_list('batch_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=AircraftMaintenance)
+@receiver(post_delete, sender=AircraftMaintenance)
+def aircraft_maintenance_changed(sender, instance, **kwargs):
+    mark_maintenance_changed()
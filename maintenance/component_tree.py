@@ -0,0 +1,74 @@
+"""
+Component trees
+
+A tree is assembled in memory from one closure-table query per level below
+its root (an aircraft or a main component), instead of one query per node.
+Built trees are cached under the generation of their aircraft
+(entebbe.generations); maintenance.health bumps it once a component change
+commits. On a process-local cache, where bumps from other processes (e.g.
+the clone_component job) never arrive, trees expire after the short
+LOCAL_CACHE_TIMEOUT instead.
+"""
+from django.core.cache import cache
+
+from entebbe.generations import bump, cache_timeout, versioned_key
+from .models import Aircraft, ComponentClosure, COMPONENT_LEVELS
+
+TREE_CACHE_DURATION = 3600
+
+# Component fields carried by every tree node
+TREE_FIELDS = ('component_name', 'serial_number', 'part_number', 'maintenance_hours',
+               'maintenance_status', 'component_status')
+
+
+def tree_scope(aircraft_id):
+    return f'component_tree:{aircraft_id}'
+
+
+def _node(Model, values, level):
+    node = {'id': values['pk'], 'type': Model.__name__, 'level': level}
+    node.update((field, values[field]) for field in TREE_FIELDS)
+    node['children'] = []
+    return node
+
+
+def build_tree(root):
+    """Nested dict of `root` (an Aircraft or a component) and everything below it"""
+    if isinstance(root, Aircraft):
+        tree = {
+            'id': root.pk, 'type': 'Aircraft', 'level': -1,
+            'registration_number': root.registration_number, 'abbreviation': root.abbreviation,
+            'children': [],
+        }
+        levels = COMPONENT_LEVELS
+    else:
+        tree = _node(type(root), {'pk': root.pk, **{field: getattr(root, field) for field in TREE_FIELDS}},
+                     root.hierarchy_level)
+        levels = COMPONENT_LEVELS[root.hierarchy_level + 1:]
+
+    parents = {root.pk: tree}
+    for depth, Model in enumerate(levels, start=1):
+        parent_id = f'{Model.parent_field}_id'
+        nodes = {}
+        rows = ComponentClosure.subtree(Model, root, depth=depth).order_by('pk').values('pk', parent_id, *TREE_FIELDS)
+        for values in rows:
+            node = _node(Model, values, Model.hierarchy_level)
+            parents[values[parent_id]]['children'].append(node)
+            nodes[values['pk']] = node
+        parents = nodes
+    return tree
+
+
+def get_tree(root):
+    """build_tree(root), cached until a component of its aircraft changes"""
+    aircraft_id = root.pk if isinstance(root, Aircraft) else root.root_aircraft_id
+    key = versioned_key('component_tree', [tree_scope(aircraft_id)], type(root).__name__, root.pk)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_tree(root)
+        cache.set(key, tree, cache_timeout(TREE_CACHE_DURATION))
+    return tree
+
+
+def invalidate_trees(aircraft_ids):
+    bump(*[tree_scope(aircraft_id) for aircraft_id in aircraft_ids])
@@ -0,0 +1,123 @@
+"""
+Maintenance confirmation
+
+Confirming a ComponentMaintenance adds its maintenance_hours_added to the
+component, returns a component in maintenance to service and marks the record
+Operational. confirm_maintenances does that for any number of records in one
+transaction: the records are read in one query, their components in one
+query per component model, and every write is a bulk_update or bulk_create.
+Records that cannot be confirmed are left untouched and reported by id.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ComponentMaintenance, ComponentUsageEntry
+from .signals import components_updated, maintenance_updated
+
+# Result statuses in the confirm_maintenances report
+CONFIRMED = 'confirmed'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+COMPONENT_FIELDS = ('maintenance_hours', 'component_status', 'maintenance_status', 'updated_by', 'updated_date')
+
+MAINTENANCE_FIELDS = ('main_type_schedule', 'remarks', 'updated_by', 'updated_date')
+
+
+def _locked_components(records):
+    """{(content type id, object id): component}, locked, one query per component model"""
+    ids_by_type = {}
+    for record in records:
+        ids_by_type.setdefault(record.content_type_id, set()).add(record.object_id)
+    components = {}
+    for content_type_id, ids in ids_by_type.items():
+        Model = ContentType.objects.get_for_id(content_type_id).model_class()
+        for pk, component in Model.objects.select_for_update().in_bulk(ids).items():
+            components[(content_type_id, pk)] = component
+    return components
+
+
+def _return_to_service(component):
+    """Take the component out of maintenance; raises ValidationError if it clashes with an attached one"""
+    returning = component.component_status == 'Maintenance'
+    if returning:
+        component.component_status = 'Attached'
+    if component.maintenance_status == 'Maintenance':
+        component.maintenance_status = 'Operational'
+    if returning:
+        component.clean()
+
+
+def confirm_maintenances(maintenance_ids, confirmed_by, notes='', notes_label='Confirmation Notes'):
+    """
+    Confirm the maintenances `maintenance_ids` atomically. `notes`, when
+    given, are appended to each record's remarks under `notes_label`.
+
+    Returns {maintenance id: result} in the order given. Every result has a
+    'status' (CONFIRMED, SKIPPED or FAILED) and a 'message'; confirmed ones
+    also have the 'component' and its 'hours_before' and 'hours_after'.
+    """
+    ids = list(dict.fromkeys(int(pk) for pk in maintenance_ids))
+    report = {pk: {'status': FAILED, 'message': 'Maintenance not found'} for pk in ids}
+    now = timezone.now()
+    note = f"\n\n{notes_label} ({now.strftime('%Y-%m-%d %H:%M')} by {confirmed_by.username}): {notes}" if notes else ''
+
+    with transaction.atomic():
+        records = list(ComponentMaintenance.objects.select_for_update().filter(pk__in=ids).order_by('pk'))
+        components = _locked_components(records)
+
+        records_by_component = {}
+        for record in records:
+            component = components.get((record.content_type_id, record.object_id))
+            if record.main_type_schedule == 'Operational':
+                report[record.pk] = {'status': SKIPPED, 'message': 'Already confirmed'}
+            elif component is None:
+                report[record.pk] = {'status': FAILED, 'message': 'Component no longer exists'}
+            else:
+                records_by_component.setdefault(component, []).append(record)
+
+        changed_components = {}
+        confirmed = []
+        for component, component_records in records_by_component.items():
+            hours = component.maintenance_hours
+            try:
+                _return_to_service(component)
+            except ValidationError as e:
+                for record in component_records:
+                    report[record.pk] = {'status': FAILED, 'message': ' '.join(e.messages)}
+                continue
+            for record in component_records:
+                report[record.pk] = {
+                    'status': CONFIRMED, 'message': 'Confirmed', 'component': component,
+                    'hours_before': hours, 'hours_after': hours + record.maintenance_hours_added,
+                }
+                hours += record.maintenance_hours_added
+                record.main_type_schedule = 'Operational'
+                record.remarks += note
+                record.updated_by = confirmed_by.username
+                record.updated_date = now
+                confirmed.append(record)
+            component.maintenance_hours = hours
+            component.updated_by = confirmed_by.username
+            component.updated_date = now
+            changed_components.setdefault(type(component), []).append(component)
+
+        for Model, changed in changed_components.items():
+            Model.objects.bulk_update(changed, COMPONENT_FIELDS)
+            components_updated.send(sender=Model, pks=[component.pk for component in changed])
+        if confirmed:
+            ComponentMaintenance.objects.bulk_update(confirmed, MAINTENANCE_FIELDS)
+            # The hours are already on the components, so the ledger entries are stored rolled up
+            ComponentUsageEntry.objects.bulk_create([
+                ComponentUsageEntry(
+                    content_type_id=record.content_type_id, object_id=record.object_id,
+                    hours_delta=record.maintenance_hours_added, source='Maintenance',
+                    maintenance=record, rolled_up_at=now,
+                )
+                for record in confirmed
+            ])
+            maintenance_updated.send(sender=ComponentMaintenance, pks=[record.pk for record in confirmed])
+
+    return report
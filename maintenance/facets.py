@@ -0,0 +1,105 @@
+"""
+Filter facets of the component maintenance list
+
+Batch ids are read a page at a time from the indexed
+MaintenanceBatch.reference column, newest first, with a prefix search.
+Status counts are one conditional aggregate cached under a generation that
+maintenance.batches bumps once a change to any maintenance record commits.
+They also expire after FACET_CACHE_DURATION, because the scheduled/expired
+split moves with the clock. The maintenance dashboard's counts are cached the
+same way, per aircraft and date range, with one aggregate per schedule table.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from entebbe.generations import bump, versioned_key
+from .models import AircraftMaintenance, ComponentMaintenance, MaintenanceBatch
+
+BATCH_FACET_PAGE_SIZE = 50
+
+FACET_CACHE_DURATION = 300
+
+# Cache scope of everything derived from ComponentMaintenance rows
+MAINTENANCE_FACETS = 'maintenance:facets'
+
+BATCH_PREFIX = 'MAINT-'
+
+
+def batch_ids(search='', page=1, per_page=BATCH_FACET_PAGE_SIZE):
+    """
+    (batch ids, whether more follow) for one page, newest first. `search`
+    matches the start of the id, with or without the MAINT- prefix.
+    """
+    batches = MaintenanceBatch.objects.order_by('-reference')
+    search = search.strip().upper()
+    if search:
+        if not search.startswith(BATCH_PREFIX):
+            search = BATCH_PREFIX + search
+        batches = batches.filter(reference__startswith=search)
+    start = (max(page, 1) - 1) * per_page
+    references = list(batches.values_list('reference', flat=True)[start:start + per_page + 1])
+    return references[:per_page], len(references) > per_page
+
+
+def status_counts():
+    """{'scheduled_count', 'expired_count', 'completed_count'} over every record"""
+    key = versioned_key('maintenance_facets', [MAINTENANCE_FACETS], 'status_counts')
+    counts = cache.get(key)
+    if counts is None:
+        now = timezone.now()
+        counts = ComponentMaintenance.objects.aggregate(
+            scheduled_count=Count('pk', filter=Q(start_date__gt=now, maintenance_status='Scheduled')),
+            expired_count=Count('pk', filter=Q(end_date__lt=now, maintenance_status='Scheduled')),
+            completed_count=Count('pk', filter=Q(maintenance_status='Completed')),
+        )
+        cache.set(key, counts, FACET_CACHE_DURATION)
+    return counts
+
+
+def dashboard_schedules(aircraft_id=None, date_from=None, date_to=None):
+    """(aircraft schedules, component schedules) of one aircraft and start date range"""
+    aircraft_schedules = AircraftMaintenance.objects.all()
+    component_schedules = ComponentMaintenance.objects.all()
+    if aircraft_id:
+        aircraft_schedules = aircraft_schedules.filter(aircraft_to_maintain_id=aircraft_id)
+        component_schedules = component_schedules.filter(aircraft_id=aircraft_id)
+    if date_from:
+        aircraft_schedules = aircraft_schedules.filter(start_date__gte=date_from)
+        component_schedules = component_schedules.filter(start_date__gte=date_from)
+    if date_to:
+        aircraft_schedules = aircraft_schedules.filter(start_date__lte=date_to)
+        component_schedules = component_schedules.filter(start_date__lte=date_to)
+    return aircraft_schedules, component_schedules
+
+
+def _type_counts(queryset):
+    return queryset.aggregate(
+        total=Count('pk'),
+        manual=Count('pk', filter=Q(main_type_schedule='Operational')),
+        automated=Count('pk', filter=Q(main_type_schedule='Maintenance')),
+    )
+
+
+def dashboard_counts(aircraft_id=None, date_from=None, date_to=None):
+    """Schedule totals of the maintenance dashboard, split into manual and automated"""
+    key = versioned_key('maintenance_facets', [MAINTENANCE_FACETS], 'dashboard', aircraft_id, date_from, date_to)
+    counts = cache.get(key)
+    if counts is None:
+        aircraft_schedules, component_schedules = dashboard_schedules(aircraft_id, date_from, date_to)
+        aircraft_counts = _type_counts(aircraft_schedules)
+        component_counts = _type_counts(component_schedules)
+        counts = {
+            'total_aircraft_schedules': aircraft_counts['total'],
+            'total_component_schedules': component_counts['total'],
+            'manual_aircraft': aircraft_counts['manual'],
+            'automated_aircraft': aircraft_counts['automated'],
+            'manual_component': component_counts['manual'],
+            'automated_component': component_counts['automated'],
+        }
+        cache.set(key, counts, FACET_CACHE_DURATION)
+    return counts
+
+
+def invalidate_facets():
+    bump(MAINTENANCE_FACETS)
@@ -0,0 +1,172 @@
+"""
+Usage-rate forecasting
+
+Each aircraft's daily utilization (flight hours and cycles) is averaged over
+its recent FlightTechLog history, and components are projected forward to
+the day their remaining hours fall to min_maintenance_hours and their cycles
+reach max_item_cycle. A whole batch of components is projected at once with
+NumPy arrays. The earliest of those days and the calendar rule becomes the
+recommended next_maintenance_date that the whiteboard shows.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import FlightTechLog
+
+# Days of tech log history utilization is averaged over
+UTILIZATION_WINDOW_DAYS = 90
+
+# Nothing is recommended further ahead than this
+FORECAST_HORIZON_DAYS = 365
+
+# Calendar items due within this many days are recommended CALENDAR_LEAD_DAYS early
+CALENDAR_NOTICE_DAYS = 90
+CALENDAR_LEAD_DAYS = 30
+
+# Aircraft without tech log history keep the fixed estimates: items within
+# the margin are recommended this many days ahead
+FALLBACK_HOURS_MARGIN = 50
+FALLBACK_HOURS_DAYS = 14
+FALLBACK_CYCLES_MARGIN = 10
+FALLBACK_CYCLES_DAYS = 7
+
+# Default look-ahead of the fleet forecast report
+REPORT_DAYS = 60
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Component values forecast() reads, after the aircraft id
+FORECAST_FIELDS = ('item_calender', 'item_calender_months', 'maintenance_hours', 'min_maintenance_hours',
+                   'item_cycle', 'max_item_cycle')
+
+
+def _floats(values, count):
+    return np.fromiter((np.nan if value is None else value for value in values), float, count)
+
+
+def _epochs(values, count):
+    return np.fromiter((np.nan if value is None else value.timestamp() for value in values), float, count)
+
+
+def utilization(now=None, days=UTILIZATION_WINDOW_DAYS):
+    """
+    {aircraft id: (flight hours per day, cycles per day)} over the last `days`.
+    Aircraft whose first tech log falls inside the window are averaged over
+    the days since that log instead.
+    """
+    now = now or timezone.now()
+    start = now - timedelta(days=days)
+    logs = FlightTechLog.objects.annotate(aircraft_ref=Coalesce('aircraft', 'flight_leg__aircraft'))
+    rows = list(
+        logs.filter(takeoff__gte=start, takeoff__lte=now, landing__gt=F('takeoff'))
+        .values_list('aircraft_ref', 'takeoff', 'landing')
+    )
+    if not rows:
+        return {}
+    flown_before = set(logs.filter(takeoff__lt=start).values_list('aircraft_ref', flat=True).distinct())
+
+    aircraft, takeoff, landing = zip(*rows)
+    count = len(rows)
+    takeoff = _epochs(takeoff, count)
+    hours = (_epochs(landing, count) - takeoff) / 3600
+    aircraft_ids, index = np.unique(np.array(aircraft), return_inverse=True)
+
+    hours_flown = np.bincount(index, weights=hours)
+    cycles_flown = np.bincount(index)
+    first_takeoff = np.full(len(aircraft_ids), np.inf)
+    np.minimum.at(first_takeoff, index, takeoff)
+    observed_days = np.clip((now.timestamp() - first_takeoff) / SECONDS_PER_DAY, 1, days)
+    observed_days[np.isin(aircraft_ids, list(flown_before))] = days
+
+    return {
+        int(aircraft_id): (float(hours_total / observed), float(cycles_total / observed))
+        for aircraft_id, hours_total, cycles_total, observed
+        in zip(aircraft_ids, hours_flown, cycles_flown, observed_days)
+    }
+
+
+def forecast(rows, rates, now):
+    """
+    Project components forward. `rows` are (aircraft id, *FORECAST_FIELDS)
+    tuples and `rates` comes from utilization(). Returns {'hours', 'cycles',
+    'calendar', 'recommended'}: arrays of days from `now`, NaN where nothing
+    is due within FORECAST_HORIZON_DAYS.
+    """
+    count = len(rows)
+    if not count:
+        return {key: np.empty(0) for key in ('hours', 'cycles', 'calendar', 'recommended')}
+    aircraft, calendar, calendar_months, hours, min_hours, cycles, max_cycles = zip(*rows)
+
+    # Look every row's aircraft up in the sorted rate table at once
+    hours_rate = cycles_rate = np.zeros(count)
+    if rates:
+        aircraft = _floats(aircraft, count)
+        known = sorted(rates)
+        table = np.array([rates[aircraft_id] for aircraft_id in known])
+        position = np.clip(np.searchsorted(known, aircraft), 0, len(known) - 1)
+        has_rate = np.array(known, dtype=float)[position] == aircraft
+        hours_rate = np.where(has_rate, table[position, 0], 0.0)
+        cycles_rate = np.where(has_rate, table[position, 1], 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Hours count down towards min_maintenance_hours; 0 or no minimum means no hours rule
+        min_hours = _floats(min_hours, count)
+        hours_left = _floats(hours, count) - min_hours
+        hours_days = np.where(hours_rate > 0, np.maximum(hours_left, 0) / hours_rate,
+                              np.where(hours_left <= FALLBACK_HOURS_MARGIN, FALLBACK_HOURS_DAYS, np.nan))
+        hours_days[~(min_hours > 0)] = np.nan
+
+        # Cycles count up towards max_item_cycle; the fixed estimate skips items with no cycles recorded
+        max_cycles = _floats(max_cycles, count)
+        cycles = np.nan_to_num(_floats(cycles, count))
+        cycles_left = max_cycles - cycles
+        cycles_days = np.where(cycles_rate > 0, np.maximum(cycles_left, 0) / cycles_rate,
+                               np.where((cycles_left <= FALLBACK_CYCLES_MARGIN) & (cycles > 0),
+                                        FALLBACK_CYCLES_DAYS, np.nan))
+        cycles_days[~(max_cycles > 0)] = np.nan
+
+    hours_days[hours_days > FORECAST_HORIZON_DAYS] = np.nan
+    cycles_days[cycles_days > FORECAST_HORIZON_DAYS] = np.nan
+
+    calendar_due = (_epochs(calendar, count) - now.timestamp()) / SECONDS_PER_DAY
+    with np.errstate(invalid='ignore'):
+        calendar_days = np.where(
+            (_floats(calendar_months, count) > 0)
+            & (np.floor(calendar_due) >= 0) & (np.floor(calendar_due) <= CALENDAR_NOTICE_DAYS),
+            calendar_due - CALENDAR_LEAD_DAYS, np.nan,
+        )
+
+    return {
+        'hours': hours_days,
+        'cycles': cycles_days,
+        'calendar': calendar_days,
+        'recommended': np.fmin(np.fmin(hours_days, cycles_days), calendar_days),
+    }
+
+
+def due_dates(days, now):
+    """Datetimes for an array of days from `now`; None for NaN"""
+    return [None if np.isnan(day) else now + timedelta(days=float(day)) for day in days]
+
+
+def forecast_components(queryset, rates, now):
+    """
+    [(component, {'hours', 'cycles', 'calendar', 'recommended'} as datetimes)]
+    for every component of `queryset`
+    """
+    components = list(queryset)
+    Model = queryset.model
+    forecasts = forecast(
+        [(getattr(component, f'{Model.aircraft_field}_id'), *[getattr(component, field) for field in FORECAST_FIELDS])
+         for component in components],
+        rates, now,
+    )
+    dates = {key: due_dates(days, now) for key, days in forecasts.items()}
+    return [
+        (component, {key: values[i] for key, values in dates.items()})
+        for i, component in enumerate(components)
+    ]
@@ -0,0 +1,148 @@
+"""
+Keep AircraftHealthSnapshot rows in step with the components and flights they count
+
+Saves, deletes and bulk updates mark the affected aircraft; once the
+transaction commits their snapshots are recomputed with one grouped query per
+component level, however many components changed, and the cached component
+trees of aircraft whose components changed are invalidated.
+"""
+import logging
+
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from airways.whiteboard_config import MAINTENANCE_HOURS_CRITICAL, MAINTENANCE_HOURS_WARNING
+from entebbe.commit_hooks import defer_until_commit
+from flight_dispatch.models import Flight
+from .component_tree import invalidate_trees
+from .models import Aircraft, AircraftHealthSnapshot, AircraftMainComponent, ComponentClosure, COMPONENT_LEVELS
+from .signals import components_updated
+
+logger = logging.getLogger(__name__)
+
+
+def health_buckets():
+    """Aggregates counting components in total and below the critical and warning hour thresholds"""
+    return {
+        'total': Count('pk'),
+        'critical': Count('pk', filter=Q(maintenance_hours__lt=MAINTENANCE_HOURS_CRITICAL)),
+        'warning': Count('pk', filter=Q(maintenance_hours__gte=MAINTENANCE_HOURS_CRITICAL,
+                                        maintenance_hours__lt=MAINTENANCE_HOURS_WARNING)),
+    }
+
+
+def _level_counts(queryset, aircraft_field):
+    """{aircraft id: {'total', 'critical', 'warning'}} for one component level"""
+    rows = queryset.values(aircraft_field).annotate(**health_buckets())
+    return {row[aircraft_field]: row for row in rows}
+
+
+def refresh_snapshots(aircraft_ids=None):
+    """
+    Recompute the snapshots of `aircraft_ids` (every aircraft by default) in
+    one grouped query per component level plus one for flights.
+    Returns the number of snapshots written.
+    """
+    aircraft = Aircraft.objects.all()
+    if aircraft_ids is not None:
+        aircraft = aircraft.filter(pk__in=aircraft_ids)
+    ids = list(aircraft.values_list('pk', flat=True))
+    if not ids:
+        return 0
+
+    main_components = AircraftMainComponent.objects.filter(aircraft_attached__in=ids, maintenance_status='Attached')
+    counts = {}
+    for level, Model in zip(AircraftHealthSnapshot.LEVELS, COMPONENT_LEVELS):
+        if Model is AircraftMainComponent:
+            queryset = main_components
+        else:
+            queryset = ComponentClosure.subtree(Model, main_components).filter(maintenance_status='Attached')
+        counts[level] = _level_counts(queryset, Model.aircraft_field)
+    flights = dict(
+        Flight.objects.filter(aircraft__in=ids, flight_status='Completed')
+        .values('aircraft').annotate(total=Count('pk')).values_list('aircraft', 'total')
+    )
+
+    now = timezone.now()
+    existing = AircraftHealthSnapshot.objects.in_bulk(ids)
+    snapshots = []
+    for aircraft_id in ids:
+        snapshot = existing.get(aircraft_id) or AircraftHealthSnapshot(aircraft_id=aircraft_id)
+        for level in AircraftHealthSnapshot.LEVELS:
+            row = counts[level].get(aircraft_id, {})
+            for kind in ('total', 'critical', 'warning'):
+                setattr(snapshot, f'{level}_{kind}', row.get(kind, 0))
+        snapshot.completed_flights = flights.get(aircraft_id, 0)
+        snapshot.refreshed_at = now
+        snapshots.append(snapshot)
+
+    fields = [f'{level}_{kind}' for level in AircraftHealthSnapshot.LEVELS for kind in ('total', 'critical', 'warning')]
+    AircraftHealthSnapshot.objects.bulk_update(
+        [snapshot for snapshot in snapshots if snapshot.pk in existing],
+        fields + ['completed_flights', 'refreshed_at'],
+    )
+    AircraftHealthSnapshot.objects.bulk_create(
+        [snapshot for snapshot in snapshots if snapshot.pk not in existing], ignore_conflicts=True)
+    return len(snapshots)
+
+
+def get_snapshot(aircraft):
+    """The aircraft's snapshot, computed on the spot if it has none yet"""
+    try:
+        return AircraftHealthSnapshot.objects.get(aircraft=aircraft)
+    except AircraftHealthSnapshot.DoesNotExist:
+        refresh_snapshots([aircraft.pk])
+        return AircraftHealthSnapshot.objects.get(aircraft=aircraft)
+
+
+def fleet_snapshots():
+    """Snapshot of every aircraft, computing any that are missing"""
+    missing = list(Aircraft.objects.filter(health_snapshot__isnull=True).values_list('pk', flat=True))
+    if missing:
+        refresh_snapshots(missing)
+    return AircraftHealthSnapshot.objects.select_related('aircraft').order_by('aircraft__abbreviation')
+
+
+def mark_aircraft_changed(*aircraft_ids, components=True):
+    """
+    Queue snapshots for refreshing once the surrounding transaction commits;
+    with `components`, their component trees too
+    """
+    aircraft_ids = {aircraft_id for aircraft_id in aircraft_ids if aircraft_id}
+    if not aircraft_ids:
+        return
+    if components:
+        defer_until_commit('aircraft_trees', aircraft_ids, invalidate_trees)
+    defer_until_commit('aircraft_health', aircraft_ids, _flush)
+
+
+def _flush(aircraft_ids):
+    try:
+        refresh_snapshots(aircraft_ids)
+    except Exception:
+        # The request itself has already committed; `refresh_aircraft_health` repairs the snapshots
+        logger.exception('Aircraft health refresh failed for %s', sorted(aircraft_ids))
+
+
+def component_changed(sender, instance, **kwargs):
+    # A re-parented component also leaves the aircraft it was loaded under
+    mark_aircraft_changed(instance.root_aircraft_id, getattr(instance, '_loaded_aircraft_id', None))
+
+
+for model in COMPONENT_LEVELS:
+    post_save.connect(component_changed, sender=model, dispatch_uid=f'health_{model.__name__}_saved')
+    post_delete.connect(component_changed, sender=model, dispatch_uid=f'health_{model.__name__}_deleted')
+
+
+@receiver(components_updated)
+def components_bulk_updated(sender, pks, **kwargs):
+    aircraft_field = f'{sender.aircraft_field}_id'
+    mark_aircraft_changed(*sender.objects.filter(pk__in=pks).values_list(aircraft_field, flat=True).distinct())
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+def flight_changed(sender, instance, **kwargs):
+    mark_aircraft_changed(instance.aircraft_id, components=False)
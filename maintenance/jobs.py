@@ -0,0 +1,324 @@
+"""
+Background jobs
+
+Heavy maintenance actions are queued as BackgroundJob rows and run by the
+`run_jobs` worker, so the request only records what to do. Handlers are
+registered by name with @register and called as handler(job, **payload);
+payloads must be JSON-serialisable.
+
+While a handler runs, a heartbeat thread renews the job's lock, so only jobs
+whose worker died are claimed again after LOCK_TIMEOUT_SECONDS. A failed job
+is retried with exponential backoff up to its max_attempts.
+Errors that another attempt cannot fix (JobFailed, validation and integrity
+errors, missing rows) fail the job at once. With
+`settings.MAINTENANCE_JOBS_EAGER` the job runs right after the enqueuing
+transaction commits, for development without a worker.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .confirmation import CONFIRMED, confirm_maintenances
+from .models import BackgroundJob, ComponentMaintenance, record_applied_usage, rollup_usage
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry; doubled on every further attempt
+RETRY_BACKOFF_SECONDS = 30
+
+# A Running job whose lock has not been renewed for this long is picked up again
+LOCK_TIMEOUT_SECONDS = 10 * 60
+
+# How often a running job's lock is renewed
+HEARTBEAT_SECONDS = 60
+
+# Seconds the worker sleeps when the queue is empty
+POLL_SECONDS = 2
+
+# Handlers working through many records report progress once per this many
+PROGRESS_EVERY = 20
+
+JOB_HANDLERS = {}
+
+
+class JobFailed(Exception):
+    """Raised by a handler for a failure retrying cannot fix"""
+
+
+PERMANENT_ERRORS = (JobFailed, ValidationError, IntegrityError, ObjectDoesNotExist, LookupError)
+
+
+def register(name):
+    """Register the decorated function as the handler for jobs called `name`"""
+    def decorator(handler):
+        JOB_HANDLERS[name] = handler
+        return handler
+    return decorator
+
+
+def enqueue(name, payload=None, user=None, return_url='', max_attempts=None, unique=False):
+    """
+    Queue a job and return it. It becomes visible to the worker when the
+    current transaction commits. With `unique`, a job of the same name still
+    waiting in the queue is returned instead of adding another; the
+    unique_waiting_singleton_job constraint settles concurrent requests.
+    """
+    if name not in JOB_HANDLERS:
+        raise LookupError(f'No background job called {name!r}')
+    job = BackgroundJob(
+        name=name, payload=payload or {}, return_url=return_url, singleton=unique,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    if max_attempts:
+        job.max_attempts = max_attempts
+    if unique:
+        waiting = _waiting_singleton(name)
+        if waiting is not None:
+            return waiting
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            # Another request queued it first; if a worker already took that
+            # one, the next attempt queues a fresh job
+            return _waiting_singleton(name) or enqueue(name, payload, user, return_url, max_attempts, unique)
+    else:
+        job.save()
+    if getattr(settings, 'MAINTENANCE_JOBS_EAGER', False):
+        transaction.on_commit(lambda: run_next(pk=job.pk))
+    return job
+
+
+def _waiting_singleton(name):
+    return BackgroundJob.objects.filter(name=name, singleton=True, status='Queued', attempts=0).first()
+
+
+def claim(pk=None):
+    """
+    Lock the next job due (or job `pk`) for this worker and mark it Running.
+    Returns None when there is nothing to run.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = BackgroundJob.objects.filter(
+            Q(status='Queued', run_after__lte=now)
+            | Q(status='Running', locked_at__lt=now - timedelta(seconds=LOCK_TIMEOUT_SECONDS))
+        ).order_by('run_after', 'pk')
+        if pk is not None:
+            due = due.filter(pk=pk)
+        if transaction.get_connection().features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        job = due.first()
+        if job is None:
+            return None
+        job.status = 'Running'
+        job.attempts += 1
+        job.locked_at = now
+        job.started_at = job.started_at or now
+        job.save(update_fields=['status', 'attempts', 'locked_at', 'started_at'])
+    return job
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Renews a running job's lock every HEARTBEAT_SECONDS, and writes its
+    progress as soon as the handler reports it, until stopped
+    """
+
+    def __init__(self, job):
+        super().__init__(name=f'job-heartbeat-{job.pk}', daemon=True)
+        self.job = job
+        self.woken = threading.Event()
+        self.stopped = False
+
+    def run(self):
+        try:
+            while True:
+                self.woken.wait(HEARTBEAT_SECONDS)
+                self.woken.clear()
+                if self.stopped:
+                    # run() records the final state
+                    break
+                BackgroundJob.objects.filter(pk=self.job.pk, status='Running').update(
+                    locked_at=timezone.now(), progress=self.job.progress)
+        except Exception:
+            logger.exception('Heartbeat of background job %s failed', self.job.pk)
+        finally:
+            connection.close()
+
+    def wake(self):
+        self.woken.set()
+
+    def stop(self):
+        self.stopped = True
+        self.wake()
+        self.join()
+
+
+def _call_handler(handler, job):
+    heartbeat = job.heartbeat = _Heartbeat(job)
+    heartbeat.start()
+    try:
+        return handler(job, **job.payload)
+    finally:
+        heartbeat.stop()
+        job.heartbeat = None
+
+
+def run(job):
+    """Run a claimed job and record its outcome. Returns the job."""
+    handler = JOB_HANDLERS.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No background job called {job.name!r}')
+        if job.attempts > job.max_attempts:
+            raise JobFailed('Worker stopped before the job finished')
+        result = _call_handler(handler, job)
+    except Exception as exc:
+        job.error = traceback.format_exc()
+        job.locked_at = None
+        if isinstance(exc, PERMANENT_ERRORS) or job.attempts >= job.max_attempts:
+            logger.exception('Background job %s failed', job)
+            job.status = 'Failed'
+            job.finished_at = timezone.now()
+        else:
+            logger.warning('Background job %s failed, retrying', job, exc_info=True)
+            job.status = 'Queued'
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+        job.save(update_fields=['status', 'error', 'locked_at', 'run_after', 'finished_at'])
+        return job
+
+    job.status = 'Completed'
+    job.progress = 100
+    job.result = result
+    job.error = ''
+    job.locked_at = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'result', 'error', 'locked_at', 'finished_at'])
+    return job
+
+
+def run_next(pk=None):
+    """Claim and run one job; None when the queue has nothing due"""
+    job = claim(pk)
+    return run(job) if job is not None else None
+
+
+def error_summary(job):
+    """Last line of the stored traceback"""
+    lines = job.error.strip().splitlines()
+    return lines[-1] if lines else ''
+
+
+def store_upload(upload, folder='job_uploads'):
+    """Save an uploaded file for a job to pick up; returns the stored name"""
+    return default_storage.save(f'{folder}/{upload.name}', upload)
+
+
+def _user(user_id):
+    return get_user_model().objects.get(pk=user_id)
+
+
+@register('rollup_usage')
+def rollup_usage_job(job):
+    return {'message': f'Rolled up {rollup_usage()} usage entries.'}
+
+
+@register('bulk_confirm_maintenances')
+def bulk_confirm_maintenances_job(job, maintenance_ids, user_id, confirmation_notes=''):
+    """
+    Confirm every maintenance in one transaction; records that cannot be
+    confirmed are reported and left as they are
+    """
+    user = _user(user_id)
+    report = confirm_maintenances(maintenance_ids, user, notes=confirmation_notes, notes_label='Bulk Confirmation')
+    job.report_progress(len(report), len(report))
+
+    confirmed_count = sum(1 for result in report.values() if result['status'] == CONFIRMED)
+    failed_count = len(report) - confirmed_count
+    warnings = [
+        f"Failed to confirm maintenance ID {pk}: {result['message']}"
+        for pk, result in report.items() if result['status'] != CONFIRMED
+    ]
+
+    message = f'Successfully confirmed {confirmed_count} maintenance schedule(s).'
+    if failed_count > 0:
+        message += f' {failed_count} maintenance(s) could not be confirmed.'
+    return {'message': message, 'warnings': warnings, 'confirmed': confirmed_count, 'failed': failed_count}
+
+
+@register('batch_complete_maintenance')
+def batch_complete_maintenance_job(job, batch_id, user_id, actual_end_date, hours_added, completion_remarks,
+                                   completion_report=None):
+    """Complete every record of a batch in one transaction; `completion_report` is a stored file name"""
+    user = _user(user_id)
+    maintenance_records = ComponentMaintenance.resolve_components(ComponentMaintenance.objects.filter(
+        batch__reference=batch_id, batch__kind__in=['Batch', 'Single']))
+    if not maintenance_records:
+        raise JobFailed(f'No records found for batch {batch_id}')
+
+    with transaction.atomic():
+        completed_count = 0
+        for maintenance in maintenance_records:
+            if completed_count % PROGRESS_EVERY == 0:
+                job.report_progress(completed_count, len(maintenance_records))
+            component = maintenance.component_to_maintain
+
+            if hasattr(maintenance, 'maintenance_status'):
+                maintenance.maintenance_status = 'Completed'
+                maintenance.actual_end_date = actual_end_date
+                maintenance.actual_hours_added = hours_added
+                maintenance.completion_date = timezone.now()
+                maintenance.completed_by = user
+                maintenance.completion_remarks = completion_remarks
+                if completed_count == 0 and completion_report:
+                    maintenance.completion_report = completion_report
+            else:
+                maintenance.maintenance_hours_added = hours_added
+                if not maintenance.update_comments:
+                    maintenance.update_comments = ''
+                maintenance.update_comments += f'\nBatch Completed: {timezone.now().strftime("%Y-%m-%d")} by {user.username}'
+
+            maintenance.save()
+
+            if float(hours_added) > 0:
+                component.maintenance_hours += Decimal(hours_added)
+                component.updated_by = user.username
+                component.updated_date = timezone.now()
+                component.save()
+                record_applied_usage(component, hours_added, maintenance)
+
+            completed_count += 1
+
+    return {
+        'message': f'✅ Batch completed! {completed_count} components updated. Added {hours_added} hours to each.',
+        'completed': completed_count,
+    }
+
+
+@register('clone_component')
+def clone_component_job(job, model_name, instance_id, serial_numbers):
+    ModelClass = apps.get_model('maintenance', model_name)
+    original_component = ModelClass.objects.get(pk=instance_id)
+    try:
+        with transaction.atomic():
+            for serial_number in serial_numbers:
+                cloned_component = ModelClass.objects.get(pk=original_component.pk)
+                cloned_component.pk = None  # Remove primary key to create a new instance
+                cloned_component.serial_number = serial_number
+                cloned_component.save()
+    except IntegrityError:
+        raise JobFailed('An error occurred while cloning the component. Please ensure the serial numbers are unique.')
+    return {'message': 'Components cloned successfully.', 'cloned': len(serial_numbers)}
+
@@ -0,0 +1,32 @@
+"""
+Rebuild or verify the component hierarchy closure table
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.models import ComponentClosure
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the component ancestor/descendant closure table from the component parent links'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Compare the stored rows with the component parent links instead of rebuilding'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Run with --check from cron to catch rows missed by bulk updates that
+        bypass component save and delete
+        """
+        if not options['check']:
+            total = ComponentClosure.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} closure rows'))
+            return
+
+        report = ComponentClosure.verify()
+        self.stdout.write(f'Missing: {report["missing"]}\nExtra: {report["extra"]}')
+        if report['missing'] or report['extra']:
+            raise CommandError('Component closure is out of step; rerun without --check to rebuild it')
+        self.stdout.write(self.style.SUCCESS('Component closure is consistent'))
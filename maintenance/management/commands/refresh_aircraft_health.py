@@ -0,0 +1,18 @@
+"""
+Recompute the aircraft health snapshots
+"""
+from django.core.management.base import BaseCommand
+
+from maintenance.health import refresh_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Recompute the component and flight counts of every aircraft health snapshot'
+
+    def handle(self, *args, **options):
+        """
+        Run after deploying, after changing the MAINTENANCE_HOURS_* thresholds,
+        and from cron to repair a refresh that failed after its commit
+        """
+        total = refresh_snapshots()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {total} aircraft health snapshots'))
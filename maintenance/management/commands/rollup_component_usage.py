@@ -0,0 +1,24 @@
+"""
+Apply pending component usage ledger entries to component balances
+"""
+from django.core.management.base import BaseCommand
+
+from maintenance.models import USAGE_ROLLUP_BATCH_SIZE, rollup_usage
+
+
+class Command(BaseCommand):
+    help = 'Roll pending component usage entries up into component hours and cycles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=USAGE_ROLLUP_BATCH_SIZE,
+            help='Entries applied per transaction'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Tech logs queue a rollup_usage job; run this from cron to apply
+        entries left pending while no job worker was running
+        """
+        applied = rollup_usage(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {applied} usage entries'))
@@ -0,0 +1,49 @@
+"""
+Background job worker
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from maintenance.jobs import POLL_SECONDS, run_next
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (tech log rollups, batch completion, bulk confirmation, cloning)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no job is due instead of waiting for more'
+        )
+        parser.add_argument(
+            '--max-jobs', type=int, default=0,
+            help='Exit after running this many jobs (0 for no limit)'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=POLL_SECONDS,
+            help='Seconds to wait between polls of an empty queue'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Run one or more workers under a process supervisor; jobs are claimed
+        with row locks, so workers never pick up the same job
+        """
+        ran = 0
+        try:
+            while not options['max_jobs'] or ran < options['max_jobs']:
+                close_old_connections()
+                job = run_next()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                ran += 1
+                style = self.style.SUCCESS if job.status == 'Completed' else self.style.WARNING
+                self.stdout.write(style(f'{job} after {job.attempts} attempt(s)'))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Ran {ran} job(s)')
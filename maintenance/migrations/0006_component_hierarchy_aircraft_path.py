@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+
+def backfill_hierarchy(apps, schema_editor):
+    """Fill aircraft and path level by level, each from the level above"""
+    Main = apps.get_model('maintenance', 'AircraftMainComponent')
+    levels = [
+        (apps.get_model('maintenance', 'AircraftSubComponent'), 'parent_component'),
+        (apps.get_model('maintenance', 'AircraftSub2Component'), 'parent_sub_component'),
+        (apps.get_model('maintenance', 'AircraftSub3Component'), 'parent_sub2_component'),
+    ]
+
+    parent_model = Main
+    for model, parent_field in levels:
+        parent = parent_model.objects.filter(pk=OuterRef(f'{parent_field}_id'))
+        if parent_model is Main:
+            aircraft = parent.values('aircraft_attached_id')[:1]
+            parent_path = Concat(
+                Cast(Subquery(aircraft), CharField()), Value('/'), Cast(f'{parent_field}_id', CharField()),
+                output_field=CharField(),
+            )
+        else:
+            aircraft = parent.values('aircraft_id')[:1]
+            parent_path = Subquery(parent.values('path')[:1])
+        model.objects.update(
+            aircraft_id=Subquery(aircraft),
+            path=Concat(parent_path, Value('/'), Cast('id', CharField()), output_field=CharField()),
+        )
+        parent_model = model
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0005_componentmaintenance_actual_end_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aircraftsub2component',
+            name='aircraft',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='maintenance.aircraft', verbose_name='Aircraft'),
+        ),
+        migrations.AddField(
+            model_name='aircraftsub2component',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='Hierarchy Path'),
+        ),
+        migrations.AddField(
+            model_name='aircraftsub3component',
+            name='aircraft',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='maintenance.aircraft', verbose_name='Aircraft'),
+        ),
+        migrations.AddField(
+            model_name='aircraftsub3component',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='Hierarchy Path'),
+        ),
+        migrations.AddField(
+            model_name='aircraftsubcomponent',
+            name='aircraft',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='maintenance.aircraft', verbose_name='Aircraft'),
+        ),
+        migrations.AddField(
+            model_name='aircraftsubcomponent',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='Hierarchy Path'),
+        ),
+        migrations.RunPython(backfill_hierarchy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('maintenance', '0006_component_hierarchy_aircraft_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComponentUsageEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('hours_delta', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Hours')),
+                ('cycles_delta', models.IntegerField(default=0, verbose_name='Cycles')),
+                ('source', models.CharField(choices=[('Tech Log', 'Tech Log'), ('Maintenance', 'Maintenance')], max_length=20, verbose_name='Source')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Recorded At')),
+                ('rolled_up_at', models.DateTimeField(blank=True, null=True, verbose_name='Rolled Up At')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('flight_tech_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage_entries', to='maintenance.flighttechlog')),
+                ('maintenance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage_entries', to='maintenance.componentmaintenance')),
+            ],
+            options={
+                'verbose_name': 'Component Usage Entry',
+                'verbose_name_plural': 'Component Usage Entries',
+                'ordering': ['recorded_at', 'pk'],
+                'indexes': [models.Index(fields=['content_type', 'object_id', 'recorded_at'], name='maintenance_content_62dcd1_idx'), models.Index(fields=['rolled_up_at'], name='maintenance_rolled__12ad35_idx')],
+            },
+        ),
+    ]
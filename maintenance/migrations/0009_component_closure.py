@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_closure(apps, schema_editor):
+    """One row per component and each of its ancestors (aircraft included), plus a self row"""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Closure = apps.get_model('maintenance', 'ComponentClosure')
+    levels = [
+        ('aircraftmaincomponent', 'aircraft_attached'),
+        ('aircraftsubcomponent', 'parent_component'),
+        ('aircraftsub2component', 'parent_sub_component'),
+        ('aircraftsub3component', 'parent_sub2_component'),
+    ]
+
+    def content_type_id(model_name):
+        return ContentType.objects.get_or_create(app_label='maintenance', model=model_name)[0].pk
+
+    above = {}
+    parent_type_id = content_type_id('aircraft')
+    rows = []
+    for model_name, parent_field in levels:
+        model = apps.get_model('maintenance', model_name)
+        type_id = content_type_id(model_name)
+        level = {}
+        for pk, parent_id in model.objects.values_list('pk', f'{parent_field}_id').iterator():
+            ancestry = [(type_id, pk, 0)]
+            if model_name == 'aircraftmaincomponent':
+                ancestry.append((parent_type_id, parent_id, 1))
+            else:
+                ancestry.extend((t, i, d + 1) for t, i, d in above.get((parent_type_id, parent_id), []))
+            level[(type_id, pk)] = ancestry
+            rows.extend(
+                Closure(ancestor_type_id=t, ancestor_id=i, descendant_type_id=type_id, descendant_id=pk, depth=d)
+                for t, i, d in ancestry
+            )
+        above, parent_type_id = level, type_id
+    Closure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('maintenance', '0008_background_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComponentClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancestor_id', models.PositiveIntegerField()),
+                ('descendant_id', models.PositiveIntegerField()),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('descendant_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Component Closure',
+                'verbose_name_plural': 'Component Closure',
+                'indexes': [models.Index(fields=['ancestor_type', 'ancestor_id', 'descendant_type', 'depth'], name='maintenance_ancesto_3059b4_idx'), models.Index(fields=['descendant_type', 'descendant_id'], name='maintenance_descend_3c8e66_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor_type', 'ancestor_id', 'descendant_type', 'descendant_id'), name='unique_component_closure_pair')],
+            },
+        ),
+        migrations.RunPython(backfill_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0009_component_closure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AircraftHealthSnapshot',
+            fields=[
+                ('aircraft', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health_snapshot', serialize=False, to='maintenance.aircraft')),
+                ('main_total', models.PositiveIntegerField(default=0)),
+                ('main_critical', models.PositiveIntegerField(default=0)),
+                ('main_warning', models.PositiveIntegerField(default=0)),
+                ('sub_total', models.PositiveIntegerField(default=0)),
+                ('sub_critical', models.PositiveIntegerField(default=0)),
+                ('sub_warning', models.PositiveIntegerField(default=0)),
+                ('sub2_total', models.PositiveIntegerField(default=0)),
+                ('sub2_critical', models.PositiveIntegerField(default=0)),
+                ('sub2_warning', models.PositiveIntegerField(default=0)),
+                ('sub3_total', models.PositiveIntegerField(default=0)),
+                ('sub3_critical', models.PositiveIntegerField(default=0)),
+                ('sub3_warning', models.PositiveIntegerField(default=0)),
+                ('completed_flights', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Refreshed At')),
+            ],
+            options={
+                'verbose_name': 'Aircraft Health Snapshot',
+                'verbose_name_plural': 'Aircraft Health Snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:50
+
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+BATCH_COMMENT = re.compile(r'\b(Batch|Single|Auto): (MAINT-\S+)')
+
+
+def backfill_batches(apps, schema_editor):
+    """Create a batch per id found in update_comments and point its records at it"""
+    ComponentMaintenance = apps.get_model('maintenance', 'ComponentMaintenance')
+    MaintenanceBatch = apps.get_model('maintenance', 'MaintenanceBatch')
+
+    batches = {}
+    members = {}
+    records = ComponentMaintenance.objects.filter(update_comments__contains='MAINT-').order_by('record_date', 'pk')
+    for pk, comments, record_date, added_by_id in records.values_list(
+            'pk', 'update_comments', 'record_date', 'added_by_id').iterator():
+        match = BATCH_COMMENT.search(comments)
+        if not match:
+            continue
+        kind, reference = match.groups()
+        if reference not in batches:
+            batches[reference] = MaintenanceBatch(reference=reference, kind=kind, record_date=record_date,
+                                                  added_by_id=added_by_id)
+        members.setdefault(reference, []).append(pk)
+    MaintenanceBatch.objects.bulk_create(batches.values(), batch_size=1000)
+
+    for batch in MaintenanceBatch.objects.filter(reference__in=list(batches)).iterator():
+        pks = members[batch.reference]
+        for start in range(0, len(pks), 1000):
+            ComponentMaintenance.objects.filter(pk__in=pks[start:start + 1000]).update(batch=batch)
+
+    counted = []
+    for row in ComponentMaintenance.objects.filter(batch__isnull=False).values('batch').annotate(
+        total_records=Count('pk'),
+        scheduled_records=Count('pk', filter=Q(maintenance_status='Scheduled')),
+        in_progress_records=Count('pk', filter=Q(maintenance_status='In Progress')),
+        completed_records=Count('pk', filter=Q(maintenance_status='Completed')),
+        cancelled_records=Count('pk', filter=Q(maintenance_status='Cancelled')),
+        confirmed_records=Count('pk', filter=Q(main_type_schedule='Operational')),
+    ):
+        counted.append(MaintenanceBatch(pk=row.pop('batch'), **row))
+    MaintenanceBatch.objects.bulk_update(counted, [
+        'total_records', 'scheduled_records', 'in_progress_records', 'completed_records', 'cancelled_records',
+        'confirmed_records',
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0010_aircraft_health_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=50, unique=True, verbose_name='Batch ID')),
+                ('kind', models.CharField(choices=[('Batch', 'Batch'), ('Single', 'Single'), ('Auto', 'Auto')], default='Batch', max_length=10, verbose_name='Kind')),
+                ('total_records', models.PositiveIntegerField(default=0)),
+                ('scheduled_records', models.PositiveIntegerField(default=0)),
+                ('in_progress_records', models.PositiveIntegerField(default=0)),
+                ('completed_records', models.PositiveIntegerField(default=0)),
+                ('cancelled_records', models.PositiveIntegerField(default=0)),
+                ('confirmed_records', models.PositiveIntegerField(default=0)),
+                ('record_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('added_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Maintenance Batch',
+                'verbose_name_plural': 'Maintenance Batches',
+                'ordering': ['-reference'],
+            },
+        ),
+        migrations.AddField(
+            model_name='componentmaintenance',
+            name='batch',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='records', to='maintenance.maintenancebatch', verbose_name='Batch'),
+        ),
+        migrations.RunPython(backfill_batches, migrations.RunPython.noop),
+    ]
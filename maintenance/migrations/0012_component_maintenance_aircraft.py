@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_aircraft(apps, schema_editor):
+    """Copy each record's root aircraft and level from its component, one UPDATE per level"""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    ComponentMaintenance = apps.get_model('maintenance', 'ComponentMaintenance')
+    levels = [
+        ('aircraftmaincomponent', 'aircraft_attached'),
+        ('aircraftsubcomponent', 'aircraft'),
+        ('aircraftsub2component', 'aircraft'),
+        ('aircraftsub3component', 'aircraft'),
+    ]
+    for level, (model_name, aircraft_field) in enumerate(levels):
+        content_type = ContentType.objects.filter(app_label='maintenance', model=model_name).first()
+        if content_type is None:
+            continue
+        model = apps.get_model('maintenance', model_name)
+        ComponentMaintenance.objects.filter(content_type=content_type).update(
+            aircraft_id=Subquery(model.objects.filter(pk=OuterRef('object_id')).values(f'{aircraft_field}_id')[:1]),
+            hierarchy_level=level,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('maintenance', '0011_maintenance_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='componentmaintenance',
+            name='aircraft',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='maintenance.aircraft', verbose_name='Aircraft'),
+        ),
+        migrations.AddField(
+            model_name='componentmaintenance',
+            name='hierarchy_level',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, verbose_name='Hierarchy Level'),
+        ),
+        migrations.AddIndex(
+            model_name='componentmaintenance',
+            index=models.Index(fields=['aircraft', 'start_date'], name='maintenance_aircraf_d1f656_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='componentmaintenance',
+            index=models.Index(fields=['hierarchy_level', 'start_date'], name='maintenance_hierarc_ff21a8_idx'),
+        ),
+        migrations.RunPython(backfill_aircraft, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0012_component_maintenance_aircraft'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='singleton',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Singleton'),
+        ),
+        migrations.AddConstraint(
+            model_name='backgroundjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('attempts', 0), ('singleton', True), ('status', 'Queued')), fields=('name',), name='unique_waiting_singleton_job'),
+        ),
+    ]
@@ -6,6 +6,19 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone as dj_timezone
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.signals import post_delete
+from django.db.models.functions import Coalesce, Concat, Substr
+from decimal import Decimal
+
+from .signals import components_updated, maintenance_updated
+
+# Ledger entries inserted per statement
+USAGE_BULK_BATCH_SIZE = 500
+
+# Pending ledger entries applied per rollup transaction
+USAGE_ROLLUP_BATCH_SIZE = 1000
 
 COMPONENT_STATUS = (('Attached', 'Attached'), ('Detached', 'Detached'), ('Stores', 'Stores'))
 MAINTENANCE_TYPE = (('Class_A', 'Class A'), ('Class_B', 'Class B'), ('Class_C', 'Class C'), ('Class_D', 'Class D'))
@@ -204,39 +217,443 @@ class Component(ComponentValidationMixin, models.Model):
         super(Component, self).save(*args, **kwargs)
 
 
+class ComponentHierarchyMixin:
+    """
+    Shared bookkeeping for the denormalized root aircraft and materialized
+    path ("<aircraft>/<main>/<sub>/...") of every component level.
+    `parent_field` names the FK one level up (the aircraft for main components).
+    """
+    aircraft_field = 'aircraft'
+    parent_field = None
+    hierarchy_level = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the parent the row was loaded with to detect re-parenting
+        instance._loaded_parent_id = instance.__dict__.get(f'{cls.parent_field}_id')
+        instance._loaded_aircraft_id = instance.__dict__.get(f'{cls.aircraft_field}_id')
+        return instance
+
+    @property
+    def root_aircraft(self):
+        return getattr(self, self.aircraft_field)
+
+    @property
+    def root_aircraft_id(self):
+        return getattr(self, f'{self.aircraft_field}_id')
+
+    def _parent_changed(self):
+        loaded = getattr(self, '_loaded_parent_id', None)
+        return loaded is not None and loaded != getattr(self, f'{self.parent_field}_id')
+
+    def _move_descendants(self, old_path):
+        """Rewrite aircraft and path of every descendant after this component moved"""
+        for Model in COMPONENT_LEVELS[self.hierarchy_level + 1:]:
+            descendants = Model.objects.filter(path__startswith=f'{old_path}/')
+            pks = list(descendants.values_list('pk', flat=True))
+            if not pks:
+                continue
+            Model.objects.filter(pk__in=pks).update(
+                aircraft_id=self.root_aircraft_id,
+                path=Concat(Value(self.hierarchy_path), Substr('path', len(old_path) + 1),
+                            output_field=models.CharField()),
+            )
+            components_updated.send(sender=Model, pks=pks)
+
+
 # Concrete classes for different component types
-class AircraftMainComponent(Component):
+class AircraftMainComponent(ComponentHierarchyMixin, Component):
     aircraft_attached = models.ForeignKey(Aircraft, on_delete=models.CASCADE, verbose_name='Aircraft Main Components')
 
+    aircraft_field = 'aircraft_attached'
+    parent_field = 'aircraft_attached'
+    hierarchy_level = 0
+
     class Meta:
         verbose_name = _('Aircraft Main Component')
         verbose_name_plural = _('Aircraft Main Components')
 
+    @property
+    def hierarchy_path(self):
+        return f'{self.aircraft_attached_id}/{self.pk}'
+
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        moved = not is_new and self._parent_changed()
+        old_path = f'{self._loaded_parent_id}/{self.pk}' if moved else None
+        # One transaction, so post-commit work sees the closure rows of this save
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                ComponentClosure.attach(self)
+            elif moved:
+                self._move_descendants(old_path)
+                ComponentClosure.move(self)
+                ComponentMaintenance.follow_component(self)
+        self._loaded_parent_id = self.aircraft_attached_id
+
+
+class NestedComponent(ComponentHierarchyMixin, Component):
+    """
+    A component below main-component level. Carries the id of the aircraft at
+    the root of its hierarchy and its materialized path, both kept current on
+    save (including re-parenting), so aircraft and subtree filters are
+    single-column lookups instead of a join up the hierarchy.
+    """
+    aircraft = models.ForeignKey(Aircraft, on_delete=models.CASCADE, blank=True, null=True, editable=False,
+                                 related_name='+', verbose_name=_('Aircraft'))
+    path = models.CharField(_('Hierarchy Path'), max_length=255, blank=True, editable=False, db_index=True)
 
-class AircraftSubComponent(Component):
+    class Meta:
+        abstract = True
+
+    @property
+    def hierarchy_path(self):
+        return self.path
+
+    def save(self, *args, **kwargs):
+        # One transaction, so post-commit work sees the closure rows of this save
+        with transaction.atomic():
+            self._save_in_hierarchy(*args, **kwargs)
+
+    def _save_in_hierarchy(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.parent_field not in update_fields:
+            return super().save(*args, **kwargs)
+
+        is_new = self.pk is None
+        moved = not is_new and self._parent_changed()
+        if not (is_new or moved or not self.path):
+            return super().save(*args, **kwargs)
+
+        parent = getattr(self, self.parent_field)
+        old_path = self.path
+        self.aircraft_id = parent.root_aircraft_id
+        if not is_new:
+            self.path = f'{parent.hierarchy_path}/{self.pk}'
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'aircraft', 'path'}
+        super().save(*args, **kwargs)
+
+        if is_new:
+            # The path ends with our own id, known only after the insert
+            self.path = f'{parent.hierarchy_path}/{self.pk}'
+            type(self).objects.filter(pk=self.pk).update(path=self.path)
+            ComponentClosure.attach(self)
+        elif old_path and old_path != self.path:
+            self._move_descendants(old_path)
+        if moved:
+            ComponentClosure.move(self)
+            if self.aircraft_id != getattr(self, '_loaded_aircraft_id', None):
+                ComponentMaintenance.follow_component(self)
+        self._loaded_parent_id = getattr(self, f'{self.parent_field}_id')
+
+
+class AircraftSubComponent(NestedComponent):
     parent_component = models.ForeignKey(AircraftMainComponent, on_delete=models.CASCADE)
 
+    parent_field = 'parent_component'
+    hierarchy_level = 1
+
     class Meta:
         verbose_name = _('Aircraft Sub Component')
         verbose_name_plural = _('Aircraft Sub Components')
 
 
-class AircraftSub2Component(Component):
+class AircraftSub2Component(NestedComponent):
     parent_sub_component = models.ForeignKey(AircraftSubComponent, on_delete=models.CASCADE)
 
+    parent_field = 'parent_sub_component'
+    hierarchy_level = 2
+
     class Meta:
         verbose_name = _('Aircraft Sub2 Component')
         verbose_name_plural = _('Aircraft Sub2 Components')
 
 
-class AircraftSub3Component(Component):
+class AircraftSub3Component(NestedComponent):
     parent_sub2_component = models.ForeignKey(AircraftSub2Component, on_delete=models.CASCADE)
 
+    parent_field = 'parent_sub2_component'
+    hierarchy_level = 3
+
     class Meta:
         verbose_name = _('Aircraft Sub3 Component')
         verbose_name_plural = _('Aircraft Sub3 Components')
 
 
+# Component models from the top of the hierarchy down
+COMPONENT_LEVELS = [AircraftMainComponent, AircraftSubComponent, AircraftSub2Component, AircraftSub3Component]
+
+
+class ComponentClosure(models.Model):
+    """
+    Ancestor/descendant index of the component hierarchy, with the aircraft at
+    the root: one row per component and each of its ancestors (depth = levels
+    apart), plus a depth 0 row for the component itself. Subtree filters,
+    counts and depth queries are a single indexed lookup on this table.
+    Kept current by component save and delete; the rebuild_component_closure
+    command rebuilds or verifies it.
+    """
+    ancestor_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    ancestor_id = models.PositiveIntegerField()
+    descendant_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    descendant_id = models.PositiveIntegerField()
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name = _('Component Closure')
+        verbose_name_plural = _('Component Closure')
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor_type', 'ancestor_id', 'descendant_type', 'descendant_id'],
+                                    name='unique_component_closure_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor_type', 'ancestor_id', 'descendant_type', 'depth']),
+            models.Index(fields=['descendant_type', 'descendant_id']),
+        ]
+
+    @staticmethod
+    def _ancestors_filter(ancestors):
+        """Lookups matching rows below `ancestors`: an instance or a queryset of one model"""
+        if isinstance(ancestors, models.Model):
+            return {'ancestor_type': ContentType.objects.get_for_model(ancestors), 'ancestor_id': ancestors.pk}
+        return {'ancestor_type': ContentType.objects.get_for_model(ancestors.model),
+                'ancestor_id__in': ancestors.values('pk')}
+
+    @classmethod
+    def descendant_ids(cls, ancestors, model, depth=None):
+        """Ids of the `model` components below `ancestors`, as a subquery"""
+        rows = cls.objects.filter(descendant_type=ContentType.objects.get_for_model(model),
+                                  **cls._ancestors_filter(ancestors))
+        if depth is not None:
+            rows = rows.filter(depth=depth)
+        return rows.values('descendant_id')
+
+    @classmethod
+    def subtree(cls, model, ancestors, depth=None):
+        """`model` components below `ancestors` (an aircraft, a component, or a queryset of either)"""
+        return model.objects.filter(pk__in=cls.descendant_ids(ancestors, model, depth))
+
+    @classmethod
+    def subtree_counts(cls, ancestors):
+        """Number of components per model below `ancestors`, in one query"""
+        rows = cls.objects.filter(depth__gt=0, **cls._ancestors_filter(ancestors)) \
+            .values('descendant_type').annotate(total=Count('descendant_id', distinct=True))
+        totals = {row['descendant_type']: row['total'] for row in rows}
+        content_types = ContentType.objects.get_for_models(*COMPONENT_LEVELS)
+        return {Model: totals.get(content_types[Model].pk, 0) for Model in COMPONENT_LEVELS}
+
+    @classmethod
+    def contains(cls, ancestor, type_field='content_type', id_field='object_id'):
+        """
+        Exists() filter for rows of a generic relation (ComponentMaintenance by
+        default) whose component is `ancestor` or below it
+        """
+        return Exists(cls.objects.filter(
+            descendant_type=OuterRef(type_field), descendant_id=OuterRef(id_field),
+            **cls._ancestors_filter(ancestor),
+        ))
+
+    @staticmethod
+    def _parent_of(component):
+        """(content type id, id) of the component's parent, the aircraft for main components"""
+        parent_model = Aircraft if component.hierarchy_level == 0 else COMPONENT_LEVELS[component.hierarchy_level - 1]
+        parent_id = getattr(component, f'{component.parent_field}_id')
+        return ContentType.objects.get_for_model(parent_model).pk, parent_id
+
+    @classmethod
+    def _ancestry(cls, node_type_id, node_id):
+        """(type id, id, depth) of `node` and everything above it"""
+        if node_id is None:
+            return []
+        if node_type_id == ContentType.objects.get_for_model(Aircraft).pk:
+            return [(node_type_id, node_id, 0)]
+        return list(cls.objects.filter(descendant_type_id=node_type_id, descendant_id=node_id)
+                    .values_list('ancestor_type_id', 'ancestor_id', 'depth'))
+
+    @classmethod
+    def attach(cls, component):
+        """Rows for a newly saved component: itself and one per ancestor of its parent"""
+        content_type_id = ContentType.objects.get_for_model(component).pk
+        rows = [cls(ancestor_type_id=content_type_id, ancestor_id=component.pk,
+                    descendant_type_id=content_type_id, descendant_id=component.pk, depth=0)]
+        rows.extend(
+            cls(ancestor_type_id=type_id, ancestor_id=ancestor_id,
+                descendant_type_id=content_type_id, descendant_id=component.pk, depth=depth + 1)
+            for type_id, ancestor_id, depth in cls._ancestry(*cls._parent_of(component))
+        )
+        cls.objects.bulk_create(rows, ignore_conflicts=True)
+
+    @classmethod
+    def move(cls, component):
+        """Re-link the subtree of a re-parented component to its new ancestors"""
+        content_type_id = ContentType.objects.get_for_model(component).pk
+        subtree = list(cls.objects.filter(ancestor_type_id=content_type_id, ancestor_id=component.pk)
+                       .values_list('descendant_type_id', 'descendant_id', 'depth'))
+        if not subtree:
+            cls.attach(component)
+            return
+
+        # Links from the old ancestors: rows deeper than the distance to this component
+        by_level = {}
+        for type_id, descendant_id, depth in subtree:
+            by_level.setdefault((type_id, depth), []).append(descendant_id)
+        above = Q()
+        for (type_id, depth), ids in by_level.items():
+            above |= Q(descendant_type_id=type_id, descendant_id__in=ids, depth__gt=depth)
+        cls.objects.filter(above).delete()
+
+        cls.objects.bulk_create([
+            cls(ancestor_type_id=ancestor_type_id, ancestor_id=ancestor_id,
+                descendant_type_id=type_id, descendant_id=descendant_id,
+                depth=ancestor_depth + 1 + depth)
+            for ancestor_type_id, ancestor_id, ancestor_depth in cls._ancestry(*cls._parent_of(component))
+            for type_id, descendant_id, depth in subtree
+        ], ignore_conflicts=True)
+
+    @classmethod
+    def expected_rows(cls):
+        """Every row the table should hold, computed from the component parent links"""
+        content_types = ContentType.objects.get_for_models(Aircraft, *COMPONENT_LEVELS)
+        rows = set()
+        above = {}  # (type id, id) -> [(ancestor type id, ancestor id, depth)] of the level above
+        parent_type_id = content_types[Aircraft].pk
+        for Model in COMPONENT_LEVELS:
+            type_id = content_types[Model].pk
+            level = {}
+            for pk, parent_id in Model.objects.values_list('pk', f'{Model.parent_field}_id').iterator():
+                parent_key = (parent_type_id, parent_id)
+                ancestry = [(type_id, pk, 0)]
+                if Model is AircraftMainComponent:
+                    ancestry.append((parent_type_id, parent_id, 1))
+                else:
+                    ancestry.extend((t, i, d + 1) for t, i, d in above.get(parent_key, []))
+                level[(type_id, pk)] = ancestry
+                rows.update((t, i, type_id, pk, d) for t, i, d in ancestry)
+            above, parent_type_id = level, type_id
+        return rows
+
+    @classmethod
+    def verify(cls):
+        """Rows missing from and extra to the table, compared with the component parent links"""
+        expected = cls.expected_rows()
+        stored = set(cls.objects.values_list(
+            'ancestor_type_id', 'ancestor_id', 'descendant_type_id', 'descendant_id', 'depth').iterator())
+        return {'missing': len(expected - stored), 'extra': len(stored - expected)}
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Replace the table's contents with rows computed from the parent links. Returns the row count."""
+        rows = cls.expected_rows()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(ancestor_type_id=at, ancestor_id=ai, descendant_type_id=dt, descendant_id=di, depth=depth)
+                for at, ai, dt, di, depth in rows
+            ], batch_size=batch_size)
+        return len(rows)
+
+
+def _closure_node_deleted(sender, instance, **kwargs):
+    content_type = ContentType.objects.get_for_model(sender)
+    ComponentClosure.objects.filter(
+        Q(ancestor_type=content_type, ancestor_id=instance.pk)
+        | Q(descendant_type=content_type, descendant_id=instance.pk)
+    ).delete()
+
+
+for _model in (Aircraft, *COMPONENT_LEVELS):
+    post_delete.connect(_closure_node_deleted, sender=_model, dispatch_uid=f'closure_{_model.__name__}_deleted')
+
+
+def attached_flight_components(aircraft):
+    """
+    Per component model, the components a flight of `aircraft` wears: attached
+    main components and the attached components below them
+    """
+    main_components = AircraftMainComponent.objects.filter(aircraft_attached=aircraft, maintenance_status='Attached')
+    components = {AircraftMainComponent: main_components}
+    for Model in COMPONENT_LEVELS[1:]:
+        components[Model] = ComponentClosure.subtree(Model, main_components).filter(maintenance_status='Attached')
+    return components
+
+
+def post_flight_usage(aircraft, hours, tech_log):
+    """
+    Record `tech_log`'s flight against every component `aircraft` wears: one
+    ledger entry per component taking `hours` off and adding one cycle,
+    inserted with bulk_create. Balances change when the entries are rolled up
+    (rollup_usage). Returns the number of entries recorded per model.
+    """
+    hours = Decimal(hours).quantize(Decimal('0.01'))
+    content_types = ContentType.objects.get_for_models(*COMPONENT_LEVELS)
+    entries = []
+    recorded = {}
+    for Model, queryset in attached_flight_components(aircraft).items():
+        pks = list(queryset.values_list('pk', flat=True))
+        recorded[Model] = len(pks)
+        entries.extend(
+            ComponentUsageEntry(
+                content_type=content_types[Model], object_id=pk,
+                hours_delta=-hours, cycles_delta=1,
+                source='Tech Log', flight_tech_log=tech_log,
+            )
+            for pk in pks
+        )
+    ComponentUsageEntry.objects.bulk_create(entries, batch_size=USAGE_BULK_BATCH_SIZE)
+    return recorded
+
+
+class MaintenanceBatch(models.Model):
+    """
+    Component maintenance records scheduled together under one batch id
+    (MAINT-<timestamp>-<suffix>). The record counts by status are kept on
+    the row by refresh_counts (maintenance.batches calls it after every
+    commit that changes a record of the batch), so batch lists need no
+    aggregate over ComponentMaintenance.
+    """
+    KIND_CHOICES = [
+        ('Batch', 'Batch'),
+        ('Single', 'Single'),
+        ('Auto', 'Auto'),
+    ]
+
+    reference = models.CharField(_('Batch ID'), max_length=50, unique=True)
+    kind = models.CharField(_('Kind'), max_length=10, choices=KIND_CHOICES, default='Batch')
+    total_records = models.PositiveIntegerField(default=0)
+    scheduled_records = models.PositiveIntegerField(default=0)
+    in_progress_records = models.PositiveIntegerField(default=0)
+    completed_records = models.PositiveIntegerField(default=0)
+    cancelled_records = models.PositiveIntegerField(default=0)
+    confirmed_records = models.PositiveIntegerField(default=0)
+    record_date = models.DateTimeField(default=timezone.now)
+    added_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True,
+                                 related_name='+')
+
+    class Meta:
+        verbose_name = _('Maintenance Batch')
+        verbose_name_plural = _('Maintenance Batches')
+        ordering = ['-reference']
+
+    def __str__(self):
+        return self.reference
+
+    def refresh_counts(self):
+        counts = self.records.aggregate(
+            total_records=Count('pk'),
+            scheduled_records=Count('pk', filter=Q(maintenance_status='Scheduled')),
+            in_progress_records=Count('pk', filter=Q(maintenance_status='In Progress')),
+            completed_records=Count('pk', filter=Q(maintenance_status='Completed')),
+            cancelled_records=Count('pk', filter=Q(maintenance_status='Cancelled')),
+            confirmed_records=Count('pk', filter=Q(main_type_schedule='Operational')),
+        )
+        type(self).objects.filter(pk=self.pk).update(**counts)
+        for field, value in counts.items():
+            setattr(self, field, value)
+
+
 class ComponentMaintenance(models.Model):
     main_type_schedule = models.CharField(_('Maintenance Type'), max_length=100, choices=MAINTENANCE_STATUS)
     
@@ -289,6 +706,12 @@ class ComponentMaintenance(models.Model):
     updated_date = models.DateTimeField(_('Updated Date'), blank=True, null=True)
     update_comments = models.CharField(_('Update Comments'), max_length=500, null=True, blank=True)
     updated_by = models.CharField(_('Updated By'), max_length=50, blank=True)
+    batch = models.ForeignKey(MaintenanceBatch, on_delete=models.SET_NULL, blank=True, null=True, editable=False,
+                              related_name='records', verbose_name=_('Batch'))
+    # Root aircraft and level of the component, set on creation and when the component moves
+    aircraft = models.ForeignKey(Aircraft, on_delete=models.SET_NULL, blank=True, null=True, editable=False,
+                                 db_index=False, related_name='+', verbose_name=_('Aircraft'))
+    hierarchy_level = models.PositiveSmallIntegerField(_('Hierarchy Level'), blank=True, null=True, editable=False)
 
     class Meta:
         verbose_name = _('Component Maintenance')
@@ -297,38 +720,74 @@ class ComponentMaintenance(models.Model):
         indexes = [
             models.Index(fields=['content_type', 'object_id']),
             models.Index(fields=['start_date']),
+            models.Index(fields=['aircraft', 'start_date']),
+            models.Index(fields=['hierarchy_level', 'start_date']),
         ]
 
+    def save(self, *args, **kwargs):
+        if self.hierarchy_level is None and self.content_type_id and self.object_id:
+            component = self.component_to_maintain
+            if component is not None:
+                self.aircraft_id = component.root_aircraft_id
+                self.hierarchy_level = component.hierarchy_level
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def follow_component(cls, component):
+        """Point the records of `component` and everything below it at its current aircraft"""
+        records = cls.objects.filter(ComponentClosure.contains(component)).exclude(
+            aircraft_id=component.root_aircraft_id)
+        pks = list(records.values_list('pk', flat=True))
+        if pks:
+            cls.objects.filter(pk__in=pks).update(aircraft_id=component.root_aircraft_id)
+            # update() skips post_save, so facets and whiteboard rows refresh from this instead
+            maintenance_updated.send(sender=cls, pks=pks)
+
     def confirm_maintenance(self, confirmed_by):
         """
-        Confirm maintenance completion and update component hours.
+        Confirm maintenance completion and update component hours, through
+        maintenance.confirmation. Raises ValidationError if it cannot be confirmed.
         """
-        component = self.component_to_maintain
-        
-        # Update component hours
-        component.maintenance_hours += self.maintenance_hours_added
-        component.updated_by = confirmed_by.username
-        component.updated_date = timezone.now()
-        
-        # Return component to operational if it was in maintenance
-        if component.component_status == 'Maintenance':
-            component.component_status = 'Attached'
-        if component.maintenance_status == 'Maintenance':
-            component.maintenance_status = 'Operational'
-        
-        component.save()
-        
-        # Mark this maintenance as completed
-        self.main_type_schedule = 'Operational'
-        self.updated_by = confirmed_by.username
-        self.updated_date = timezone.now()
-        self.save()
-        
-        return component
+        from .confirmation import CONFIRMED, confirm_maintenances
+
+        result = confirm_maintenances([self.pk], confirmed_by)[self.pk]
+        if result['status'] != CONFIRMED:
+            raise ValidationError(result['message'])
+        self.refresh_from_db(fields=['main_type_schedule', 'updated_by', 'updated_date'])
+        return result['component']
 
     def __str__(self):
         return f'{self.component_to_maintain} - {self.maintenance_type} ({self.start_date.date()})'
 
+    @classmethod
+    def resolve_components(cls, records):
+        """
+        Attach component_to_maintain (with its root aircraft) and content_type
+        to every record in one IN query per component model, instead of one
+        query per record when the generic relation is read. Use on lists that
+        render components or __str__. Returns the records as a list.
+        """
+        records = list(records)
+        ids_by_type = {}
+        for record in records:
+            ids_by_type.setdefault(record.content_type_id, set()).add(record.object_id)
+
+        components = {}
+        for content_type_id, ids in ids_by_type.items():
+            Model = ContentType.objects.get_for_id(content_type_id).model_class()
+            queryset = Model.objects.all()
+            if hasattr(Model, 'aircraft_field'):
+                queryset = queryset.select_related(Model.aircraft_field)
+            for pk, component in queryset.in_bulk(ids).items():
+                components[(content_type_id, pk)] = component
+
+        content_type_field = cls._meta.get_field('content_type')
+        component_field = cls._meta.get_field('component_to_maintain')
+        for record in records:
+            content_type_field.set_cached_value(record, ContentType.objects.get_for_id(record.content_type_id))
+            component_field.set_cached_value(record, components.get((record.content_type_id, record.object_id)))
+        return records
+
     # Helper properties to identify component type
     @property
     def component_type_name(self):
@@ -377,6 +836,8 @@ class ComponentMaintenance(models.Model):
     @property
     def component_hierarchy_level(self):
         """Returns numeric hierarchy level (0-3)"""
+        if self.hierarchy_level is not None:
+            return self.hierarchy_level
         model_name = self.content_type.model
         level_map = {
             'aircraftmaincomponent': 0,
@@ -445,3 +906,239 @@ class FlightTechLog(CommonTechLogInfo):
     landing = models.DateTimeField(_('Landing '), blank=False, null=False, default=timezone.now)
     departure_airport = models.CharField(_('Departure Airport'), max_length=50, blank=True)
     arrival_airport = models.CharField(_('Arrival Airport'), max_length=50, blank=True)
+
+
+class ComponentUsageEntry(models.Model):
+    """
+    Append-only record of a change to a component's hours and cycles.
+    Entries are inserted pending and applied to the component row by
+    rollup_usage; rolled_up_at marks the ones already counted in the balance.
+    """
+    SOURCE_CHOICES = [
+        ('Tech Log', 'Tech Log'),
+        ('Maintenance', 'Maintenance'),
+    ]
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    component = GenericForeignKey('content_type', 'object_id')
+
+    hours_delta = models.DecimalField(_('Hours'), max_digits=20, decimal_places=2, default=0)
+    cycles_delta = models.IntegerField(_('Cycles'), default=0)
+    source = models.CharField(_('Source'), max_length=20, choices=SOURCE_CHOICES)
+    flight_tech_log = models.ForeignKey(FlightTechLog, on_delete=models.SET_NULL, blank=True, null=True,
+                                        related_name='usage_entries')
+    maintenance = models.ForeignKey(ComponentMaintenance, on_delete=models.SET_NULL, blank=True, null=True,
+                                    related_name='usage_entries')
+    recorded_at = models.DateTimeField(_('Recorded At'), default=timezone.now)
+    rolled_up_at = models.DateTimeField(_('Rolled Up At'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('Component Usage Entry')
+        verbose_name_plural = _('Component Usage Entries')
+        ordering = ['recorded_at', 'pk']
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'recorded_at']),
+            models.Index(fields=['rolled_up_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.source} {self.hours_delta:+} h {self.cycles_delta:+} cycles ({self.recorded_at:%Y-%m-%d %H:%M})'
+
+    @classmethod
+    def for_component(cls, component):
+        return cls.objects.filter(content_type=ContentType.objects.get_for_model(component), object_id=component.pk)
+
+
+def record_applied_usage(component, hours, maintenance=None):
+    """
+    Ledger entry for `hours` already added to `component` in place, e.g. by a
+    maintenance confirmation. It is stored as rolled up so it is never applied twice.
+    """
+    return ComponentUsageEntry.objects.create(
+        component=component, hours_delta=Decimal(hours).quantize(Decimal('0.01')),
+        source='Maintenance', maintenance=maintenance, rolled_up_at=timezone.now(),
+    )
+
+
+def rollup_usage(batch_size=USAGE_ROLLUP_BATCH_SIZE, entries=None):
+    """
+    Apply pending ledger entries (of `entries`, by default all of them) to
+    component hours and cycles, one UPDATE per component level per batch, and
+    mark them rolled up in the same transaction. Concurrent runs skip each
+    other's locked entries where the database supports it. Returns the number
+    of entries applied.
+    """
+    if entries is None:
+        entries = ComponentUsageEntry.objects.all()
+    content_types = ContentType.objects.get_for_models(*COMPONENT_LEVELS)
+    applied = 0
+    while True:
+        with transaction.atomic():
+            pending = entries.filter(rolled_up_at__isnull=True).order_by('pk')
+            if transaction.get_connection().features.has_select_for_update_skip_locked:
+                pending = pending.select_for_update(skip_locked=True)
+            ids = list(pending.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return applied
+
+            batch = ComponentUsageEntry.objects.filter(pk__in=ids)
+            for Model, content_type in content_types.items():
+                typed = batch.filter(content_type=content_type)
+                pks = set(typed.values_list('object_id', flat=True))
+                if not pks:
+                    continue
+                totals = typed.filter(object_id=OuterRef('pk')).values('object_id').annotate(
+                    hours=Sum('hours_delta'), cycles=Sum('cycles_delta'))
+                Model.objects.filter(pk__in=pks).update(
+                    maintenance_hours=F('maintenance_hours') + Subquery(totals.values('hours')),
+                    item_cycle=Coalesce(F('item_cycle'), 0) + Subquery(totals.values('cycles')),
+                )
+                components_updated.send(sender=Model, pks=list(pks))
+            batch.update(rolled_up_at=timezone.now())
+        applied += len(ids)
+
+
+def _ledger_total(entries, field, condition):
+    totals = entries.filter(condition).values('object_id').annotate(total=Sum(field)).values('total')
+    return Coalesce(Subquery(totals), Value(0), output_field=entries.model._meta.get_field(field))
+
+
+def usage_balance(component, at=None):
+    """
+    (hours, cycles) of `component` at `at` (default: now, counting pending
+    entries), from its stored balance and its ledger in one query: pending
+    entries recorded by `at` are added, rolled up entries recorded after it
+    are taken back off
+    """
+    at = at or timezone.now()
+    entries = ComponentUsageEntry.for_component(component)
+    pending = Q(rolled_up_at__isnull=True, recorded_at__lte=at)
+    later = Q(rolled_up_at__isnull=False, recorded_at__gt=at)
+    return type(component).objects.filter(pk=component.pk).annotate(
+        hours_at=F('maintenance_hours')
+        + _ledger_total(entries, 'hours_delta', pending) - _ledger_total(entries, 'hours_delta', later),
+        cycles_at=Coalesce(F('item_cycle'), 0)
+        + _ledger_total(entries, 'cycles_delta', pending) - _ledger_total(entries, 'cycles_delta', later),
+    ).values_list('hours_at', 'cycles_at').get()
+
+
+class BackgroundJob(models.Model):
+    """
+    Database-backed queue entry for work run outside the request by the
+    run_jobs worker. Handlers are registered in maintenance.jobs.
+    """
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    ]
+
+    name = models.CharField(_('Job'), max_length=100)
+    payload = models.JSONField(_('Payload'), default=dict, blank=True)
+    status = models.CharField(_('Status'), max_length=20, choices=STATUS_CHOICES, default='Queued')
+    progress = models.PositiveSmallIntegerField(_('Progress'), default=0)
+    attempts = models.PositiveSmallIntegerField(_('Attempts'), default=0)
+    max_attempts = models.PositiveSmallIntegerField(_('Max. Attempts'), default=5)
+    run_after = models.DateTimeField(_('Run After'), default=timezone.now)
+    locked_at = models.DateTimeField(_('Locked At'), blank=True, null=True)
+    result = models.JSONField(_('Result'), blank=True, null=True)
+    error = models.TextField(_('Error'), blank=True)
+    return_url = models.CharField(_('Return URL'), max_length=255, blank=True)
+    # At most one singleton job of a name waits in the queue (enqueue(unique=True))
+    singleton = models.BooleanField(_('Singleton'), default=False, editable=False)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True,
+                                   related_name='background_jobs')
+    record_date = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(_('Started At'), blank=True, null=True)
+    finished_at = models.DateTimeField(_('Finished At'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('Background Job')
+        verbose_name_plural = _('Background Jobs')
+        ordering = ['-record_date']
+        constraints = [
+            models.UniqueConstraint(fields=['name'], condition=Q(singleton=True, status='Queued', attempts=0),
+                                    name='unique_waiting_singleton_job'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    @property
+    def is_finished(self):
+        return self.status in ('Completed', 'Failed')
+
+    def report_progress(self, done, total):
+        """
+        Store percent complete and renew the worker's lock on the job. While a
+        worker runs the job, its heartbeat writes the progress on a connection
+        of its own, so the status endpoint sees it before the handler's
+        transaction commits.
+        """
+        self.progress = min(100, int(done * 100 / total)) if total else 100
+        self.locked_at = timezone.now()
+        heartbeat = getattr(self, 'heartbeat', None)
+        if heartbeat is not None:
+            heartbeat.wake()
+        else:
+            BackgroundJob.objects.filter(pk=self.pk).update(progress=self.progress, locked_at=self.locked_at)
+
+
+class AircraftHealthSnapshot(models.Model):
+    """
+    Precomputed component counts of one aircraft for the detail page and the
+    fleet dashboard: per level, the attached components below its attached
+    main components, and how many are under the critical and warning hour
+    thresholds (whiteboard_config.MAINTENANCE_HOURS_*). Refreshed after every
+    commit that changes component hours, status or position, or a flight of
+    the aircraft (maintenance.health).
+    """
+    LEVELS = ('main', 'sub', 'sub2', 'sub3')
+
+    aircraft = models.OneToOneField(Aircraft, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='health_snapshot')
+    main_total = models.PositiveIntegerField(default=0)
+    main_critical = models.PositiveIntegerField(default=0)
+    main_warning = models.PositiveIntegerField(default=0)
+    sub_total = models.PositiveIntegerField(default=0)
+    sub_critical = models.PositiveIntegerField(default=0)
+    sub_warning = models.PositiveIntegerField(default=0)
+    sub2_total = models.PositiveIntegerField(default=0)
+    sub2_critical = models.PositiveIntegerField(default=0)
+    sub2_warning = models.PositiveIntegerField(default=0)
+    sub3_total = models.PositiveIntegerField(default=0)
+    sub3_critical = models.PositiveIntegerField(default=0)
+    sub3_warning = models.PositiveIntegerField(default=0)
+    completed_flights = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(_('Refreshed At'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Aircraft Health Snapshot')
+        verbose_name_plural = _('Aircraft Health Snapshots')
+
+    def __str__(self):
+        return f'{self.aircraft} health ({self.refreshed_at:%Y-%m-%d %H:%M})'
+
+    def _sum(self, kind):
+        return sum(getattr(self, f'{level}_{kind}') for level in self.LEVELS)
+
+    @property
+    def components_total(self):
+        return self._sum('total')
+
+    @property
+    def components_critical(self):
+        return self._sum('critical')
+
+    @property
+    def components_warning(self):
+        return self._sum('warning')
+
+    @property
+    def components_healthy(self):
+        return self.components_total - self.components_critical - self.components_warning
@@ -0,0 +1,10 @@
+"""
+Signals for component and maintenance record writes that bypass post_save (queryset.update, bulk_update)
+"""
+from django.dispatch import Signal
+
+# Sent with sender=<component model> and pks=<ids of the rows written>
+components_updated = Signal()
+
+# Sent with sender=ComponentMaintenance and pks=<ids of the maintenance records written>
+maintenance_updated = Signal()
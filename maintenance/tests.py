@@ -1,3 +1,448 @@
-from django.test import TestCase
+import math
+from datetime import timedelta
+from decimal import Decimal
+from itertools import product
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from flight_dispatch.models import Flight
+from .confirmation import CONFIRMED, FAILED, SKIPPED, confirm_maintenances
+from .facets import dashboard_counts
+from .forecast import FORECAST_HORIZON_DAYS, UTILIZATION_WINDOW_DAYS, due_dates, forecast, utilization
+from .health import health_buckets
+from . import jobs
+from .jobs import JOB_HANDLERS, LOCK_TIMEOUT_SECONDS, claim, enqueue, register, run
+from .models import (
+    COMPONENT_LEVELS, Aircraft, AircraftHealthSnapshot, AircraftMainComponent, AircraftSub2Component,
+    AircraftSub3Component, AircraftSubComponent, Airport, BackgroundJob, ComponentClosure, ComponentMaintenance,
+    ComponentUsageEntry, FlightTechLog, MaintenanceBatch, post_flight_usage, rollup_usage, usage_balance,
+)
+
+
+def make_aircraft(registration):
+    return Aircraft.objects.create(
+        abbreviation=registration, registration_number=registration, aircraft_callsign=registration,
+        aircraft_model='Dash 8', aircraft_type='Turboprop', aircraft_variable='Q400', aircraft_serial=registration,
+        manufacturer='De Havilland', year_of_man=2010, seating_capacity=70, cabin_crew_capacity=2,
+        flight_crew_capacity=2, takeoff_weight=1, taxi_weight=1, landing_weight=1, zerofuel_weight=1,
+        empty_weight=1, max_available_Payload=1, aircraft_components_number=1, aircraft_status='Operational',
+    )
+
+
+def make_component(Model, name, **parent):
+    return Model.objects.create(component_name=name, serial_number=name, part_number=name,
+                                maintenance_hours=Decimal('100'), item_original_hours=0, **parent)
+
+
+def make_flight(aircraft, added_by, **fields):
+    airport = dict(icao='HUEN', country_name='Uganda', country_iso_alpha3='UGA', country_iso_alpha2='UG',
+                   city_name='Entebbe', latitude=0, longitude=0, timezone='UTC', time_shift='0', pcn='',
+                   tower_hours='24', slug='airport')
+    origin, _ = Airport.objects.get_or_create(iata='EBB', defaults=dict(name='Entebbe', **airport))
+    destination, _ = Airport.objects.get_or_create(iata='NBO', defaults=dict(name='Nairobi', **airport))
+    now = timezone.now()
+    return Flight.objects.create(
+        flight_number='UR100', origin=origin, destination=destination, aircraft=aircraft, departure_time=now,
+        arrival_time=now, flight_leg_reference='x', added_by=added_by, **fields)
+
+
+class HierarchyTestCase(TestCase):
+    """Two aircraft, a main component on each and a sub and sub 2 component below the first"""
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.user = CustomUser.objects.create(username='engineer', email='engineer@example.com',
+                                                 staff_status='Active')
+            cls.aircraft = make_aircraft('5X-AAA')
+            cls.other_aircraft = make_aircraft('5X-BBB')
+            cls.main = make_component(AircraftMainComponent, 'Engine 1', aircraft_attached=cls.aircraft)
+            cls.other_main = make_component(AircraftMainComponent, 'Engine 2', aircraft_attached=cls.other_aircraft)
+            cls.sub = make_component(AircraftSubComponent, 'Gearbox', parent_component=cls.main)
+            cls.sub2 = make_component(AircraftSub2Component, 'Pump', parent_sub_component=cls.sub)
+
+    def schedule(self, component, hours=0):
+        now = timezone.now()
+        return ComponentMaintenance.objects.create(
+            content_type=ContentType.objects.get_for_model(component), object_id=component.pk,
+            main_type_schedule='Maintenance', maintenance_type='Class_A', remarks='Inspection',
+            start_date=now, end_date=now + timedelta(days=1), added_by=self.user,
+            maintenance_hours_added=Decimal(hours),
+        )
+
+
+class ComponentClosureTests(HierarchyTestCase):
+    def test_reparented_subtree_moves_to_the_new_ancestors(self):
+        self.sub.parent_component = self.other_main
+        self.sub.save()
+
+        self.assertEqual(ComponentClosure.verify(), {'missing': 0, 'extra': 0})
+        self.assertQuerySetEqual(ComponentClosure.subtree(AircraftSub2Component, self.other_aircraft), [self.sub2])
+        self.assertQuerySetEqual(ComponentClosure.subtree(AircraftSub2Component, self.main), [])
+        self.sub2.refresh_from_db()
+        self.assertEqual(self.sub2.aircraft_id, self.other_aircraft.pk)
+        self.assertEqual(self.sub2.path, f'{self.other_aircraft.pk}/{self.other_main.pk}/{self.sub.pk}/{self.sub2.pk}')
+
+    def test_main_component_moved_to_another_aircraft_takes_its_subtree(self):
+        self.main.aircraft_attached = self.other_aircraft
+        self.main.save()
+
+        self.assertEqual(ComponentClosure.verify(), {'missing': 0, 'extra': 0})
+        self.assertEqual(ComponentClosure.subtree_counts(self.aircraft)[AircraftSub2Component], 0)
+        self.assertEqual(ComponentClosure.subtree_counts(self.other_aircraft)[AircraftSub2Component], 1)
+
+
+class UsageLedgerTests(HierarchyTestCase):
+    def test_rolled_up_flight_usage_moves_into_the_stored_balance(self):
+        before_flight = timezone.now()
+        post_flight_usage(self.aircraft, '2.5', None)
+        self.assertEqual(usage_balance(self.sub2), (Decimal('97.50'), 1))
+
+        self.assertEqual(rollup_usage(), 3)
+        self.assertEqual(rollup_usage(), 0)
+
+        for component in (self.main, self.sub, self.sub2):
+            component.refresh_from_db()
+            self.assertEqual((component.maintenance_hours, component.item_cycle), (Decimal('97.50'), 1))
+            self.assertEqual(usage_balance(component), (Decimal('97.50'), 1))
+            self.assertEqual(usage_balance(component, at=before_flight), (Decimal('100.00'), 0))
+        self.other_main.refresh_from_db()
+        self.assertEqual(self.other_main.maintenance_hours, Decimal('100.00'))
+
+    def test_rollup_runs_batch_after_batch_until_nothing_is_pending(self):
+        post_flight_usage(self.aircraft, '1', None)
+        post_flight_usage(self.aircraft, '1', None)
+
+        self.assertEqual(rollup_usage(batch_size=2), 6)
+
+        self.assertFalse(ComponentUsageEntry.objects.filter(rolled_up_at__isnull=True).exists())
+        self.sub2.refresh_from_db()
+        self.assertEqual((self.sub2.maintenance_hours, self.sub2.item_cycle), (Decimal('98.00'), 2))
+
+    def test_rollup_of_given_entries_leaves_the_rest_pending(self):
+        post_flight_usage(self.aircraft, '1', None)
+        post_flight_usage(self.other_aircraft, '1', None)
+
+        rollup_usage(entries=ComponentUsageEntry.for_component(self.other_main))
+
+        self.other_main.refresh_from_db()
+        self.main.refresh_from_db()
+        self.assertEqual(self.other_main.maintenance_hours, Decimal('99.00'))
+        self.assertEqual(self.main.maintenance_hours, Decimal('100.00'))
+        self.assertEqual(ComponentUsageEntry.objects.filter(rolled_up_at__isnull=True).count(), 3)
+
+
+class FlightTechLogTests(HierarchyTestCase):
+    def test_posted_tech_log_flies_every_attached_level(self):
+        sub3 = make_component(AircraftSub3Component, 'Seal', parent_sub2_component=self.sub2)
+        in_maintenance = make_component(AircraftSubComponent, 'Starter', parent_component=self.main,
+                                        maintenance_status='Maintenance')
+        flight = make_flight(self.aircraft, self.user, flight_status='OnTrip')
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse('create_flighttechlog', args=[self.aircraft.registration_number]),
+            {'flight_leg': flight.pk, 'takeoff': '2025-03-01T08:00', 'landing': '2025-03-01T10:30'},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        run(claim(BackgroundJob.objects.get(name='rollup_usage').pk))
+        for component in (self.main, self.sub, self.sub2, sub3):
+            component.refresh_from_db()
+            self.assertEqual((component.maintenance_hours, component.item_cycle), (Decimal('97.50'), 1), component)
+        for component in (in_maintenance, self.other_main):
+            component.refresh_from_db()
+            self.assertEqual((component.maintenance_hours, component.item_cycle), (Decimal('100.00'), 0), component)
+        flight.refresh_from_db()
+        self.assertEqual((flight.flight_status, flight.tech_log), ('Completed', 'Completed'))
+
+
+class HealthSnapshotTests(HierarchyTestCase):
+    def assertSnapshotMatchesComponents(self, aircraft):
+        snapshot = AircraftHealthSnapshot.objects.get(aircraft=aircraft)
+        for level, Model in zip(AircraftHealthSnapshot.LEVELS, COMPONENT_LEVELS):
+            expected = Model.objects.filter(
+                **{Model.aircraft_field: aircraft}, maintenance_status='Attached').aggregate(**health_buckets())
+            self.assertEqual({kind: getattr(snapshot, f'{level}_{kind}') for kind in expected}, expected, level)
+
+    def test_bulk_updated_hours_refresh_the_snapshot_on_commit(self):
+        post_flight_usage(self.aircraft, '55', None)
+        with self.captureOnCommitCallbacks(execute=True):
+            rollup_usage()
+        self.assertSnapshotMatchesComponents(self.aircraft)
+        self.assertEqual(AircraftHealthSnapshot.objects.get(aircraft=self.aircraft).sub2_warning, 1)
+
+        post_flight_usage(self.aircraft, '40', None)
+        with self.captureOnCommitCallbacks(execute=True):
+            rollup_usage()
+        self.assertSnapshotMatchesComponents(self.aircraft)
+        self.assertEqual(AircraftHealthSnapshot.objects.get(aircraft=self.aircraft).sub2_critical, 1)
+        self.assertSnapshotMatchesComponents(self.other_aircraft)
+
+
+class ConfirmMaintenancesTests(HierarchyTestCase):
+    def test_report_covers_confirmed_skipped_and_missing_records(self):
+        first = self.schedule(self.sub2, hours=5)
+        second = self.schedule(self.sub2, hours=2)
+        done = self.schedule(self.sub, hours=7)
+        ComponentMaintenance.objects.filter(pk=done.pk).update(main_type_schedule='Operational')
+        AircraftSub2Component.objects.filter(pk=self.sub2.pk).update(component_status='Maintenance')
+        missing = done.pk + 100
+
+        report = confirm_maintenances([second.pk, missing, done.pk, first.pk], self.user, notes='Signed off')
+
+        self.assertEqual(list(report), [second.pk, missing, done.pk, first.pk])
+        self.assertEqual([result['status'] for result in report.values()], [CONFIRMED, FAILED, SKIPPED, CONFIRMED])
+        self.assertEqual(report[missing]['message'], 'Maintenance not found')
+        self.assertEqual((report[first.pk]['hours_before'], report[first.pk]['hours_after']), (100, 105))
+        self.assertEqual((report[second.pk]['hours_before'], report[second.pk]['hours_after']), (105, 107))
+
+        self.sub2.refresh_from_db()
+        self.assertEqual(self.sub2.maintenance_hours, Decimal('107.00'))
+        self.assertEqual(self.sub2.component_status, 'Attached')
+        self.sub.refresh_from_db()
+        self.assertEqual(self.sub.maintenance_hours, Decimal('100.00'))
+
+        first.refresh_from_db()
+        self.assertEqual(first.main_type_schedule, 'Operational')
+        self.assertIn('Signed off', first.remarks)
+        # The hours are stored rolled up, so a later rollup does not add them again
+        self.assertEqual(usage_balance(self.sub2), (Decimal('107.00'), 0))
+        self.assertEqual(rollup_usage(), 0)
+
+    def test_only_missing_records_changes_nothing(self):
+        report = confirm_maintenances([12345], self.user)
+
+        self.assertEqual(report, {12345: {'status': FAILED, 'message': 'Maintenance not found'}})
+        self.assertFalse(ComponentUsageEntry.objects.exists())
+
+
+class QuickScheduleTests(HierarchyTestCase):
+    def test_failed_record_leaves_no_batch_behind(self):
+        self.client.force_login(self.user)
+        url = reverse('quick_schedule_component', args=['aircraftsubcomponent', self.sub.pk])
+
+        # No start or end date: the record cannot be inserted
+        self.client.post(url, {'main_type_schedule': 'Maintenance', 'maintenance_type': 'Class_A', 'remarks': 'x'})
+
+        self.assertFalse(MaintenanceBatch.objects.exists())
+        self.assertFalse(ComponentMaintenance.objects.exists())
+
+
+class FollowComponentTests(HierarchyTestCase):
+    def test_moved_component_takes_its_maintenance_to_the_new_aircraft(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record = self.schedule(self.sub2)
+        self.assertEqual(dashboard_counts(self.other_aircraft.pk)['total_component_schedules'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sub.parent_component = self.other_main
+            self.sub.save()
+
+        record.refresh_from_db()
+        self.assertEqual(record.aircraft_id, self.other_aircraft.pk)
+        self.assertEqual(dashboard_counts(self.other_aircraft.pk)['total_component_schedules'], 1)
+        self.assertEqual(dashboard_counts(self.aircraft.pk)['total_component_schedules'], 0)
+
+
+def baseline_next_date(aircraft_id, calendar, calendar_months, hours, min_hours, cycles, max_cycles, now):
+    """The fixed estimates update_maintenance_dates made before usage-rate forecasting"""
+    dates = []
+    if calendar and calendar_months and 0 <= (calendar - now).days <= 90:
+        dates.append(calendar - timedelta(days=30))
+    if min_hours and hours <= min_hours + 50:
+        dates.append(now + timedelta(days=14))
+    if max_cycles and cycles and max_cycles - cycles <= 10:
+        dates.append(now + timedelta(days=7))
+    return min(dates, default=None)
+
+
+class ForecastTests(SimpleTestCase):
+    now = timezone.now()
+
+    def test_rates_project_remaining_hours_and_cycles(self):
+        rows = [
+            (1, None, None, Decimal('130'), Decimal('100'), 40, 100),
+            # 400 days of hours left is past the horizon
+            (1, None, None, Decimal('1300'), Decimal('100'), None, None),
+            (1, None, None, Decimal('90'), Decimal('100'), 120, 100),
+        ]
+        result = forecast(rows, {1: (3.0, 2.0)}, self.now)
+
+        self.assertEqual(result['hours'][0], 10)
+        self.assertEqual(result['cycles'][0], 30)
+        self.assertEqual(result['recommended'][0], 10)
+        self.assertGreater(1200 / 3, FORECAST_HORIZON_DAYS)
+        self.assertTrue(math.isnan(result['hours'][1]))
+        self.assertEqual((result['hours'][2], result['cycles'][2]), (0, 0))
+
+    def test_aircraft_without_history_keep_the_fixed_estimates(self):
+        rows = [
+            (1, None, None, Decimal('150'), Decimal('100'), 90, 100),
+            (2, None, None, Decimal('151'), Decimal('100'), 89, 100),
+        ]
+        result = forecast(rows, {3: (5.0, 5.0)}, self.now)
+
+        self.assertEqual((result['hours'][0], result['cycles'][0], result['recommended'][0]), (14, 7, 7))
+        self.assertTrue(math.isnan(result['hours'][1]) and math.isnan(result['cycles'][1]))
+
+    def test_calendar_items_due_within_notice_are_recommended_early(self):
+        rows = [(1, self.now + timedelta(days=days), months, 0, None, None, None)
+                for days, months in ((60, 12), (91, 12), (-2, 12), (60, None))]
+        calendar = forecast(rows, {}, self.now)['calendar']
+
+        self.assertAlmostEqual(calendar[0], 30)
+        self.assertTrue(all(math.isnan(days) for days in calendar[1:]))
+
+    def test_fixed_estimates_match_the_previous_command(self):
+        rows = list(product(
+            [1],
+            [None, self.now + timedelta(days=60), self.now + timedelta(days=120), self.now - timedelta(days=5)],
+            [None, 12],
+            [Decimal('120'), Decimal('160')],
+            [None, Decimal('0'), Decimal('100')],
+            [None, 0, 80, 95],
+            [None, 8, 100],
+        ))
+        recommended = due_dates(forecast(rows, {}, self.now)['recommended'], self.now)
+
+        for row, date in zip(rows, recommended):
+            expected = baseline_next_date(*row, self.now)
+            if expected is None or date is None:
+                self.assertEqual(date, expected, row)
+            else:
+                self.assertAlmostEqual(date.timestamp(), expected.timestamp(), places=3, msg=row)
+
+
+class UtilizationTests(HierarchyTestCase):
+    def tech_log(self, aircraft, days_ago, hours):
+        takeoff = self.now - timedelta(days=days_ago)
+        return FlightTechLog.objects.create(flight_leg=self.flight, aircraft=aircraft, added_by=self.user,
+                                            takeoff=takeoff, landing=takeoff + timedelta(hours=hours))
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.flight = make_flight(self.aircraft, self.user)
+
+    def test_rates_average_over_the_window_or_since_the_first_log(self):
+        self.tech_log(self.aircraft, 10, 6)
+        self.tech_log(self.aircraft, 2, 4)
+        self.tech_log(self.other_aircraft, UTILIZATION_WINDOW_DAYS + 5, 100)
+        self.tech_log(self.other_aircraft, 30, 9)
+
+        rates = utilization(self.now)
+
+        self.assertEqual(set(rates), {self.aircraft.pk, self.other_aircraft.pk})
+        self.assertAlmostEqual(rates[self.aircraft.pk][0], 10 / 10)
+        self.assertAlmostEqual(rates[self.aircraft.pk][1], 2 / 10)
+        self.assertAlmostEqual(rates[self.other_aircraft.pk][0], 9 / UTILIZATION_WINDOW_DAYS)
+        self.assertAlmostEqual(rates[self.other_aircraft.pk][1], 1 / UTILIZATION_WINDOW_DAYS)
+
+    def test_no_history_means_no_rates(self):
+        self.assertEqual(utilization(self.now), {})
+
+
+class EnqueueTests(TestCase):
+    def test_unique_job_is_queued_once(self):
+        first = enqueue('rollup_usage', unique=True)
+        second = enqueue('rollup_usage', unique=True)
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(BackgroundJob.objects.filter(name='rollup_usage').count(), 1)
+
+    def test_database_rejects_a_second_waiting_singleton(self):
+        enqueue('rollup_usage', unique=True)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BackgroundJob.objects.create(name='rollup_usage', singleton=True)
+
+    def test_unique_job_is_queued_again_once_claimed(self):
+        first = enqueue('rollup_usage', unique=True)
+        claim(first.pk)
+
+        self.assertNotEqual(enqueue('rollup_usage', unique=True).pk, first.pk)
+
+
+class JobPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create(username='owner', email='owner@example.com', staff_status='Active')
+        cls.job = enqueue('rollup_usage', user=cls.owner)
+        cls.status_url = reverse('background_job_status', args=[cls.job.pk])
+
+    def get_status(self, username, **fields):
+        user = CustomUser.objects.create(username=username, email=f'{username}@example.com', staff_status='Active',
+                                         **fields)
+        self.client.force_login(user)
+        return self.client.get(self.status_url)
+
+    def test_owner_sees_the_job(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.status_url).json()['id'], self.job.pk)
+        self.assertEqual(self.client.get(reverse('background_job_detail', args=[self.job.pk])).status_code, 200)
+
+    def test_other_users_get_not_found(self):
+        self.assertEqual(self.get_status('colleague').status_code, 404)
+        self.client.force_login(CustomUser.objects.get(username='colleague'))
+        self.assertEqual(self.client.get(reverse('background_job_detail', args=[self.job.pk])).status_code, 404)
+
+    def test_staff_see_every_job(self):
+        self.assertEqual(self.get_status('admin', is_staff=True).status_code, 200)
+
+
+class ClaimTests(TestCase):
+    def setUp(self):
+        self.job = enqueue('rollup_usage')
+        claim(self.job.pk)
+
+    def test_running_job_is_not_claimed_again(self):
+        self.assertIsNone(claim(self.job.pk))
+
+    def test_job_with_an_expired_lock_is_claimed_again(self):
+        expired = timezone.now() - timedelta(seconds=LOCK_TIMEOUT_SECONDS + 1)
+        BackgroundJob.objects.filter(pk=self.job.pk).update(locked_at=expired)
+
+        job = claim(self.job.pk)
+        self.assertEqual(job.attempts, 2)
+
+    def test_progress_renews_the_lock(self):
+        expired = timezone.now() - timedelta(seconds=LOCK_TIMEOUT_SECONDS + 1)
+        BackgroundJob.objects.filter(pk=self.job.pk).update(locked_at=expired)
+
+        self.job.report_progress(1, 2)
+        self.assertIsNone(claim(self.job.pk))
+
+
+class JobRunTests(HierarchyTestCase):
+    def test_programming_error_is_retried(self):
+        @register('broken')
+        def broken(job):
+            raise TypeError('broken() got an unexpected keyword argument')
+        self.addCleanup(JOB_HANDLERS.pop, 'broken')
+
+        with self.assertLogs('maintenance.jobs', 'WARNING'):
+            job = run(claim(enqueue('broken').pk))
+
+        self.assertEqual(job.status, 'Queued')
+        self.assertIn('TypeError', job.error)
+
+    @mock.patch.object(jobs, 'PROGRESS_EVERY', 2)
+    def test_batch_completion_reports_progress_as_it_goes(self):
+        batch = MaintenanceBatch.objects.create(reference='MAINT-20250301080000-ABCDEF')
+        for component in (self.main, self.other_main, self.sub, self.sub2, self.main):
+            ComponentMaintenance.objects.filter(pk=self.schedule(component).pk).update(batch=batch)
+        job = enqueue('batch_complete_maintenance', {
+            'batch_id': batch.reference, 'user_id': self.user.pk, 'actual_end_date': None,
+            'hours_added': 0, 'completion_remarks': 'Done',
+        })
+
+        with mock.patch.object(BackgroundJob, 'report_progress', autospec=True) as report_progress:
+            run(claim(job.pk))
+
+        self.assertEqual([call.args[1:] for call in report_progress.call_args_list], [(0, 5), (2, 5), (4, 5)])
@@ -45,8 +45,12 @@ from .views import (
     complete_component_maintenance,
     batch_complete_maintenance,
     search_components_ajax,
+    maintenance_batch_facets,
     confirm_component_maintenance,
     bulk_confirm_maintenances,
+    # Background jobs
+    background_job_detail,
+    background_job_status,
 )
 
 
@@ -117,10 +121,13 @@ urlpatterns = [
     path('airport/<int:pk>/edit/', AirportUpdateView.as_view(), name='airport_edit'),
     path('airport/detail/<int:pk>/', AirportDetailView.as_view(), name='airport_detail'),
     # Tree List
-    path('xxx/dd', views.component_tree_view, name='tree_view'),
+    path('aircraft/components/main/tree/<int:pk>/', views.component_tree_view, name='tree_view'),
+    path('api/tree/aircraft/<int:pk>/', views.aircraft_component_tree_api, name='aircraft_component_tree_api'),
+    path('api/tree/component/<int:pk>/', views.main_component_tree_api, name='main_component_tree_api'),
 
       # ==================== MAINTENANCE DASHBOARD ====================
     path('dashboard/', maintenance_dashboard, name='maintenance_dashboard'),
+    path('forecast/', views.fleet_forecast, name='fleet_forecast'),
     
     # ==================== AIRCRAFT MAINTENANCE SCHEDULING ====================
     path('aircraft/schedule/list/', AircraftMaintenanceListView.as_view(), name='aircraft_maintenance_list'),
@@ -151,8 +158,12 @@ urlpatterns = [
      path('component/maintenance/<int:pk>/complete/', complete_component_maintenance, name='complete_component_maintenance'),
      path('batch/<str:batch_id>/complete/', batch_complete_maintenance, name='batch_complete_maintenance'),
      path('ajax/search-components/', search_components_ajax, name='ajax_search_components'),
+     path('ajax/batch-facets/', maintenance_batch_facets, name='ajax_batch_facets'),
      # Confirmation actions
      path('component/maintenance/<int:pk>/confirm/', confirm_component_maintenance, name='confirm_component_maintenance'),
      path('component/maintenance/bulk-confirm/', bulk_confirm_maintenances, name='bulk_confirm_maintenances'),
+     # Background jobs
+     path('jobs/<int:pk>/', background_job_detail, name='background_job_detail'),
+     path('jobs/<int:pk>/status/', background_job_status, name='background_job_status'),
   
 ]
\ No newline at end of file
@@ -16,6 +16,7 @@ from django.views import View
 from django.views.generic import DetailView, UpdateView, TemplateView, ListView, CreateView
 from django_tables2 import RequestConfig
 from django_tables2 import SingleTableView
+from entebbe.http import json_response
 from flight_dispatch.models import Flight
 from .filters import AircraftFilter
 from .forms import AircraftMainComponentForm, AircraftSubComponentForm, FlightTechLogForm, AircraftFormUpdate, \
@@ -23,7 +24,15 @@ from .forms import AircraftMainComponentForm, AircraftSubComponentForm, FlightTe
     BulkComponentMaintenanceConfirmForm
 
 from .models import Aircraft, AircraftMainComponent, AircraftSubComponent, AircraftMaintenanceTechLog, FlightTechLog, \
-    AircraftSub3Component, AircraftSub2Component, ComponentMaintenance, AircraftMaintenance
+    AircraftSub3Component, AircraftSub2Component, ComponentMaintenance, AircraftMaintenance, COMPONENT_LEVELS, \
+    post_flight_usage, record_applied_usage, BackgroundJob, attached_flight_components, \
+    MaintenanceBatch
+from .component_tree import get_tree
+from .confirmation import CONFIRMED, confirm_maintenances
+from .facets import batch_ids as facet_batch_ids, dashboard_counts, dashboard_schedules, status_counts
+from .forecast import FORECAST_FIELDS, REPORT_DAYS, forecast_components, utilization
+from .health import fleet_snapshots, get_snapshot
+from .jobs import enqueue, error_summary, store_upload
 
 from .tables import AircraftTable, SubComponentTable, MainComponentTable, AircraftMaintenanceTechLogTable, \
     FlightTechLogTable, FlightTablePendingTechlog
@@ -69,28 +78,26 @@ class AircraftDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         aircraft = self.get_object()
-        main_components = aircraft.aircraftmaincomponent_set.all().filter(maintenance_status='Attached')
-        sub_components = AircraftSubComponent.objects.filter(parent_component__in=main_components,
-                                                             maintenance_status='Attached')
-        sub2_components = AircraftSub2Component.objects.filter(
-            parent_sub_component__parent_component__in=main_components, maintenance_status='Attached')
-        sub3_components = AircraftSub3Component.objects.filter(
-            parent_sub2_component__parent_sub_component__parent_component__in=main_components,
-            maintenance_status='Attached')
-
-        completed_flights = Flight.objects.filter(aircraft=aircraft, flight_status='Completed').count()
-        total_main_components = main_components.count()
-        total_sub_components = sub_components.count()
-        total_sub_2_components = sub2_components.count()
-        total_sub_3_components = sub3_components.count()
-        main_components_less_than_10 = main_components.filter(maintenance_hours__lt=10).count()
-        sub_components_less_than_10 = sub_components.filter(maintenance_hours__lt=10).count()
-        sub2_components_less_than_10 = sub2_components.filter(maintenance_hours__lt=10).count()
-        sub3_components_less_than_10 = sub3_components.filter(maintenance_hours__lt=10).count()
-        main_components_greater_than_or_equal_to_10 = main_components.filter(maintenance_hours__gte=10).count()
-        sub_components_greater_than_or_equal_to_10 = sub_components.filter(maintenance_hours__gte=10).count()
-        sub2_components_greater_than_or_equal_to_10 = sub2_components.filter(maintenance_hours__gte=10).count()
-        sub3_components_greater_than_or_equal_to_10 = sub3_components.filter(maintenance_hours__gte=10).count()
+        levels = attached_flight_components(aircraft)
+        main_components = levels[AircraftMainComponent]
+        sub_components = levels[AircraftSubComponent]
+
+        # Counts come from the precomputed snapshot; the <10 / >=10 split is
+        # at whiteboard_config.MAINTENANCE_HOURS_CRITICAL
+        health = get_snapshot(aircraft)
+        completed_flights = health.completed_flights
+        total_main_components = health.main_total
+        total_sub_components = health.sub_total
+        total_sub_2_components = health.sub2_total
+        total_sub_3_components = health.sub3_total
+        main_components_less_than_10 = health.main_critical
+        sub_components_less_than_10 = health.sub_critical
+        sub2_components_less_than_10 = health.sub2_critical
+        sub3_components_less_than_10 = health.sub3_critical
+        main_components_greater_than_or_equal_to_10 = health.main_total - health.main_critical
+        sub_components_greater_than_or_equal_to_10 = health.sub_total - health.sub_critical
+        sub2_components_greater_than_or_equal_to_10 = health.sub2_total - health.sub2_critical
+        sub3_components_greater_than_or_equal_to_10 = health.sub3_total - health.sub3_critical
         # Pagination
         page = self.request.GET.get('page')
         paginator = Paginator(main_components, 20)
@@ -101,6 +108,7 @@ class AircraftDetailView(LoginRequiredMixin, DetailView):
         except EmptyPage:
             main_components = paginator.page(paginator.num_pages)
 
+        context['health'] = health
         context['main_components'] = main_components
         context['sub_components'] = sub_components
         context['completed_flights'] = completed_flights
@@ -377,64 +385,24 @@ class FlightTechLogCreateView(LoginRequiredMixin, View):
             total_flight_time_hours = Decimal(total_flight_time.total_seconds()) / Decimal(3600)
             flight_tech_log.flight_time = total_flight_time
 
-            # Update maintenance hours for associated components
-            main_components = flight.aircraft.aircraftmaincomponent_set.filter(maintenance_status='Attached')
-            sub_components = AircraftSubComponent.objects.filter(
-                parent_component__in=main_components, maintenance_status='Attached')
-            sub2_components = AircraftSub2Component.objects.filter(
-                parent_sub_component__parent_component__in=main_components, maintenance_status='Attached')
-            sub3_components = AircraftSub3Component.objects.filter(
-                parent_sub2_component__parent_sub_component__parent_component__in=main_components,
-                maintenance_status='Attached')
-
-            for component in main_components:
-                component.maintenance_hours -= total_flight_time_hours
-                if component.item_cycle is not None:
-                    cycle_count = int(component.item_cycle)
-                    cycle_count += 1
-                    component.item_cycle = cycle_count
-                else:
-                    component.item_cycle = 1  # Set to 1 if it's somehow None
-                component.save()
-
-            for component in sub_components:
-                component.maintenance_hours -= total_flight_time_hours
-                if component.item_cycle is not None:
-                    cycle_count = int(component.item_cycle)
-                    cycle_count += 1
-                    component.item_cycle = cycle_count
-                else:
-                    component.item_cycle = 1
-                component.save()
-            for component in sub2_components:
-                component.maintenance_hours -= total_flight_time_hours
-                if component.item_cycle is not None:
-                    cycle_count = int(component.item_cycle)
-                    cycle_count += 1
-                    component.item_cycle = cycle_count
-                else:
-                    component.item_cycle = 1
-                component.save()
-            for component in sub3_components:
-                component.maintenance_hours -= total_flight_time_hours
-                if component.item_cycle is not None:
-                    cycle_count = int(component.item_cycle)
-                    cycle_count += 1
-                    component.item_cycle = cycle_count
-                else:
-                    component.item_cycle = 1
-                component.save()
-
-            # Update attached flight status
-            flight.flight_status = 'Completed'
-            flight.tech_log = 'Completed'
-            flight.updated_date = timezone.now()
-            flight.updated_by = request.user.username
-            flight_tech_log.added_by = request.user
-            flight_tech_log.aircraft = flight_tech_log.flight_leg.aircraft
-            flight_tech_log.save()
-            flight.save()
-            messages.success(request, 'Flight tech log Completed successfully.')
+            with transaction.atomic():
+                # Update attached flight status
+                flight.flight_status = 'Completed'
+                flight.tech_log = 'Completed'
+                flight.updated_date = timezone.now()
+                flight.updated_by = request.user.username
+                flight_tech_log.added_by = request.user
+                flight_tech_log.aircraft = flight_tech_log.flight_leg.aircraft
+                flight_tech_log.save()
+                flight.save()
+
+                # Hours and cycles go into the usage ledger; one queued job applies every pending entry
+                recorded = post_flight_usage(flight.aircraft, total_flight_time_hours, flight_tech_log)
+                enqueue('rollup_usage', user=request.user, unique=True)
+            messages.success(
+                request,
+                f'Flight tech log Completed successfully. Usage recorded for {sum(recorded.values())} components; '
+                f'their hours and cycles are updated in the background.')
             return redirect('aircraft_detail', registration_number=registration_number)
 
         return render(request, self.template_name, {'form': form})
@@ -660,23 +628,15 @@ def clone_component_generic(request, model_name, instance_id):
             serial_numbers = form.cleaned_data['serial_numbers'].replace(',', '\n').split('\n')
             serial_numbers = [sn.strip() for sn in serial_numbers if sn.strip()]  # Clean and filter empty values
 
-            try:
-                with transaction.atomic():
-                    for serial_number in serial_numbers:
-                        cloned_component = ModelClass.objects.get(pk=original_component.pk)
-                        cloned_component.pk = None  # Remove primary key to create a new instance
-                        cloned_component.serial_number = serial_number
-                        cloned_component.save()
-                messages.success(request, 'Components cloned successfully.')
-                return_path = request.session.get('return_path', reverse('list_aircraft'))
-                request.session.pop('return_path', None)
-                return HttpResponseRedirect(return_path)
-            except IntegrityError as e:
-                messages.error(request,
-                               'An error occurred while cloning the component. Please ensure the serial numbers are unique.')
-            except Exception as e:
-                # Log the error or handle it as appropriate
-                messages.error(request, 'An unexpected error occurred. Please try again.')
+            # Cloning runs in the background; the job page follows it and links back
+            return_path = request.session.pop('return_path', reverse('list_aircraft'))
+            job = enqueue('clone_component', {
+                'model_name': model_name,
+                'instance_id': original_component.pk,
+                'serial_numbers': serial_numbers,
+            }, user=request.user, return_url=return_path)
+            messages.info(request, f'Cloning {len(serial_numbers)} component(s) in the background.')
+            return redirect('background_job_detail', pk=job.pk)
     else:
         form = CloneComponentForm()
 
@@ -691,37 +651,25 @@ def bluky_import_aircraft_components(request, registration_number):
     return render(request, 'maintenance/clone/import_component.html')
 
 
-def get_component_tree(component, level=0):
-    # Base information for any component
-    component_info = {
-        'level': level,
-        'component_name': component.component_name,
-        'serial_number': component.serial_number,
-        'children': []
-    }
-
-    # Depending on the type, fetch the appropriate subcomponents
-    if isinstance(component, AircraftMainComponent):
-        sub_components = AircraftSubComponent.objects.filter(parent_component=component)
-    elif isinstance(component, AircraftSubComponent):
-        sub_components = AircraftSub2Component.objects.filter(parent_sub_component=component)
-    elif isinstance(component, AircraftSub2Component):
-        sub_components = AircraftSub3Component.objects.filter(parent_sub2_component=component)
-    else:
-        # No further nesting, so return the current component info
-        return component_info
+@login_required
+def component_tree_view(request, pk):
+    main_component = get_object_or_404(AircraftMainComponent, pk=pk)
+    tree = get_tree(main_component)
+    return render(request, 'maintenance/main_component/components_tree.html', {'tree': tree})
 
-    # Recursively fetch and append child components
-    for sub_component in sub_components:
-        component_info['children'].append(get_component_tree(sub_component, level=level + 1))
 
-    return component_info
+@login_required
+def aircraft_component_tree_api(request, pk):
+    """Whole component hierarchy of an aircraft as JSON"""
+    aircraft = get_object_or_404(Aircraft, pk=pk)
+    return json_response(request, get_tree(aircraft))
 
 
-def component_tree_view(request):
-    main_component = AircraftMainComponent.objects.get(pk=5)  # Adjust the pk accordingly
-    tree = get_component_tree(main_component)
-    return render(request, 'maintenance/main_component/components_tree.html', {'tree': tree})
+@login_required
+def main_component_tree_api(request, pk):
+    """A main component and everything below it as JSON"""
+    main_component = get_object_or_404(AircraftMainComponent, pk=pk)
+    return json_response(request, get_tree(main_component))
 
 
 # ===================================================================
@@ -774,21 +722,14 @@ class ComponentMaintenanceListView(LoginRequiredMixin, ListView):
 
         # Apply other filters
         if aircraft_id:
-            queryset = self._filter_by_aircraft(queryset, aircraft_id)
+            queryset = queryset.filter(aircraft_id=aircraft_id)
 
-        if component_level:
-            try:
-                ct = ContentType.objects.get(model=component_level)
-                queryset = queryset.filter(content_type=ct)
-            except ContentType.DoesNotExist:
-                pass
+        levels = {model_class._meta.model_name: model_class.hierarchy_level for model_class in COMPONENT_LEVELS}
+        if component_level in levels:
+            queryset = queryset.filter(hierarchy_level=levels[component_level])
 
         if batch_id:
-            queryset = queryset.filter(
-                Q(update_comments__icontains=f'Batch: {batch_id}') |
-                Q(update_comments__icontains=f'Single: {batch_id}') |
-                Q(update_comments__icontains=f'Auto: {batch_id}')
-            )
+            queryset = queryset.filter(batch__reference=batch_id)
 
         if maintenance_type:
             queryset = queryset.filter(maintenance_type=maintenance_type)
@@ -810,61 +751,38 @@ class ComponentMaintenanceListView(LoginRequiredMixin, ListView):
 
         return queryset.order_by('-start_date')
 
-    def _filter_by_aircraft(self, queryset, aircraft_id):
-        """Filter maintenance records by aircraft"""
-        filtered_ids = []
-
-        for maintenance in queryset:
-            component = maintenance.component_to_maintain
-            aircraft = None
-
-            if hasattr(component, 'aircraft_attached'):
-                aircraft = component.aircraft_attached
-            elif hasattr(component, 'parent_component'):
-                aircraft = component.parent_component.aircraft_attached
-            elif hasattr(component, 'parent_sub_component'):
-                aircraft = component.parent_sub_component.parent_component.aircraft_attached
-            elif hasattr(component, 'parent_sub2_component'):
-                aircraft = component.parent_sub2_component.parent_sub_component.parent_component.aircraft_attached
-
-            if aircraft and str(aircraft.id) == aircraft_id:
-                filtered_ids.append(maintenance.id)
-
-        return queryset.filter(id__in=filtered_ids)
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Resolve the page's components in one query per component level
+        schedules = ComponentMaintenance.resolve_components(context['maintenance_schedules'])
+        context['maintenance_schedules'] = context['object_list'] = schedules
+        if context.get('page_obj'):
+            context['page_obj'].object_list = schedules
+
         context['aircrafts'] = Aircraft.objects.all()
         context['status'] = self.request.GET.get('status', 'scheduled')
 
-        # FIXED: Accurate counts
-        now = timezone.now()
+        # Status counts and the first page of batch IDs come from the facets service
+        context.update(status_counts())
+        batch_ids, more_batch_ids = facet_batch_ids()
+        selected_batch_id = self.request.GET.get('batch_id')
+        if selected_batch_id and selected_batch_id not in batch_ids:
+            batch_ids.insert(0, selected_batch_id)
+        context['batch_ids'] = batch_ids
+        context['more_batch_ids'] = more_batch_ids
 
-        context['scheduled_count'] = ComponentMaintenance.objects.filter(
-            start_date__gt=now,
-            maintenance_status='Scheduled'
-        ).count()
-
-        context['expired_count'] = ComponentMaintenance.objects.filter(
-            end_date__lt=now,
-            maintenance_status='Scheduled'
-        ).count()
-
-        context['completed_count'] = ComponentMaintenance.objects.filter(
-            maintenance_status='Completed'
-        ).count()
-
-        # Get batch IDs for filter
-        batch_ids = set()
-        for m in ComponentMaintenance.objects.all():
-            if m.update_comments:
-                for prefix in ['Batch: MAINT-', 'Single: MAINT-', 'Auto: MAINT-']:
-                    if prefix in m.update_comments:
-                        batch_ids.add(m.update_comments.split(prefix)[1].split()[0])
+        return context
 
-        context['batch_ids'] = sorted(batch_ids, reverse=True)
 
-        return context
+@login_required
+def maintenance_batch_facets(request):
+    """One page of batch IDs for the maintenance list filter, searched by prefix"""
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    references, has_more = facet_batch_ids(request.GET.get('q', ''), page)
+    return json_response(request, {'results': references, 'page': page, 'has_more': has_more})
 
 
 @login_required
@@ -889,21 +807,8 @@ def search_components_ajax(request):
     if not model_class:
         return JsonResponse({'results': []})
 
-    # Build query based on component level
-    if component_level == 'aircraftmaincomponent':
-        queryset = model_class.objects.filter(aircraft_attached_id=aircraft_id)
-    elif component_level == 'aircraftsubcomponent':
-        queryset = model_class.objects.filter(
-            parent_component__aircraft_attached_id=aircraft_id
-        )
-    elif component_level == 'aircraftsub2component':
-        queryset = model_class.objects.filter(
-            parent_sub_component__parent_component__aircraft_attached_id=aircraft_id
-        )
-    else:  # aircraftsub3component
-        queryset = model_class.objects.filter(
-            parent_sub2_component__parent_sub_component__parent_component__aircraft_attached_id=aircraft_id
-        )
+    # Every level carries its root aircraft, so this is a single-column filter
+    queryset = model_class.objects.filter(**{f'{model_class.aircraft_field}_id': aircraft_id})
 
     # Only show attached components
     queryset = queryset.filter(component_status='Attached')
@@ -1019,6 +924,8 @@ class ComponentMaintenanceCreateView(LoginRequiredMixin, CreateView):
 
         try:
             with transaction.atomic():
+                batch = MaintenanceBatch.objects.create(
+                    reference=batch_id, kind='Batch' if is_batch else 'Single', added_by=self.request.user)
                 for component_id in selected_component_ids:
                     component = get_object_or_404(model_class, pk=component_id)
 
@@ -1034,7 +941,8 @@ class ComponentMaintenanceCreateView(LoginRequiredMixin, CreateView):
                         remarks='Pending completion sign-off',  # FIXED: Placeholder
                         added_by=self.request.user,
                         maintenance_status='Scheduled',  # FIXED: Explicit status
-                        update_comments=f'Batch: {batch_id}' if is_batch else f'Single: {batch_id}'
+                        update_comments=f'Batch: {batch_id}' if is_batch else f'Single: {batch_id}',
+                        batch=batch,
                     )
                     created_count += 1
 
@@ -1157,16 +1065,13 @@ class ComponentMaintenanceDetailView(LoginRequiredMixin, DetailView):
         context['now'] = timezone.now()
 
         # Check if part of batch
-        if maintenance.update_comments:
-            if 'Batch: MAINT-' in maintenance.update_comments:
-                batch_id = maintenance.update_comments.split('Batch: ')[1].split()[0]
-                context['is_batch'] = True
-                context['batch_id'] = batch_id
-                context['batch_records'] = ComponentMaintenance.objects.filter(
-                    update_comments__icontains=f'Batch: {batch_id}'
-                ).exclude(pk=maintenance.pk)
-            else:
-                context['is_batch'] = False
+        batch = maintenance.batch
+        if batch is not None and batch.kind == 'Batch':
+            context['is_batch'] = True
+            context['batch_id'] = batch.reference
+            context['batch_records'] = batch.records.exclude(pk=maintenance.pk)
+        elif maintenance.update_comments:
+            context['is_batch'] = False
 
         # Get aircraft
         if hasattr(component, 'aircraft_attached'):
@@ -1226,35 +1131,15 @@ def confirm_component_maintenance(request, pk):
     component = maintenance.component_to_maintain
 
     if request.method == 'POST':
-        # Update component maintenance hours
-        component.maintenance_hours += maintenance.maintenance_hours_added
-        component.updated_by = request.user.username
-        component.updated_date = timezone.now()
-
-        # If component was in maintenance status, return to operational
-        if component.component_status == 'Maintenance':
-            component.component_status = 'Attached'
-        if component.maintenance_status == 'Maintenance':
-            component.maintenance_status = 'Operational'
-
-        component.save()
-
-        # Update maintenance status
-        maintenance.main_type_schedule = 'Operational'
-        maintenance.updated_by = request.user.username
-        maintenance.updated_date = timezone.now()
-
-        # Add confirmation notes if provided
-        confirmation_notes = request.POST.get('confirmation_notes', '')
-        if confirmation_notes:
-            maintenance.remarks += f"\n\nConfirmation Notes ({timezone.now().strftime('%Y-%m-%d %H:%M')} by {request.user.username}): {confirmation_notes}"
-
-        maintenance.save()
-
-        messages.success(
-            request,
-            f'Maintenance confirmed! {component.component_name} hours updated: {component.maintenance_hours - maintenance.maintenance_hours_added} → {component.maintenance_hours} (+{maintenance.maintenance_hours_added} hours)'
-        )
+        result = confirm_maintenances([maintenance.pk], request.user,
+                                      notes=request.POST.get('confirmation_notes', ''))[maintenance.pk]
+        if result['status'] == CONFIRMED:
+            messages.success(
+                request,
+                f"Maintenance confirmed! {component.component_name} hours updated: {result['hours_before']} → {result['hours_after']} (+{maintenance.maintenance_hours_added} hours)"
+            )
+        else:
+            messages.error(request, f"Maintenance could not be confirmed: {result['message']}")
         return redirect('component_maintenance_list')
 
     return render(request, 'maintenance/schedule/maintenance_confirm.html', {
@@ -1275,53 +1160,13 @@ def bulk_confirm_maintenances(request):
             maintenance_ids = form.cleaned_data['maintenance_ids']
             confirmation_notes = form.cleaned_data.get('confirmation_notes', '')
 
-            confirmed_count = 0
-            failed_count = 0
-
-            for maintenance_id in maintenance_ids:
-                try:
-                    maintenance = ComponentMaintenance.objects.get(pk=maintenance_id)
-                    component = maintenance.component_to_maintain
-
-                    # Update component hours
-                    component.maintenance_hours += maintenance.maintenance_hours_added
-                    component.updated_by = request.user.username
-                    component.updated_date = timezone.now()
-
-                    # Update component status if in maintenance
-                    if component.component_status == 'Maintenance':
-                        component.component_status = 'Attached'
-                    if component.maintenance_status == 'Maintenance':
-                        component.maintenance_status = 'Operational'
-
-                    component.save()
-
-                    # Update maintenance status
-                    maintenance.main_type_schedule = 'Operational'
-                    maintenance.updated_by = request.user.username
-                    maintenance.updated_date = timezone.now()
-
-                    if confirmation_notes:
-                        maintenance.remarks += f"\n\nBulk Confirmation ({timezone.now().strftime('%Y-%m-%d %H:%M')} by {request.user.username}): {confirmation_notes}"
-
-                    maintenance.save()
-                    confirmed_count += 1
-
-                except ComponentMaintenance.DoesNotExist:
-                    failed_count += 1
-                    continue
-                except Exception as e:
-                    failed_count += 1
-                    messages.warning(request, f'Failed to confirm maintenance ID {maintenance_id}: {str(e)}')
-                    continue
-
-            if confirmed_count > 0:
-                messages.success(request, f'Successfully confirmed {confirmed_count} maintenance schedule(s).')
-
-            if failed_count > 0:
-                messages.warning(request, f'{failed_count} maintenance(s) could not be confirmed.')
-
-            return redirect('component_maintenance_list')
+            job = enqueue('bulk_confirm_maintenances', {
+                'maintenance_ids': maintenance_ids,
+                'user_id': request.user.pk,
+                'confirmation_notes': confirmation_notes,
+            }, user=request.user, return_url=reverse('component_maintenance_list'))
+            messages.info(request, f'Confirming {len(maintenance_ids)} maintenance schedule(s) in the background.')
+            return redirect('background_job_detail', pk=job.pk)
 
     return redirect('component_maintenance_list')
 
@@ -1488,6 +1333,7 @@ def complete_component_maintenance(request, pk):
                     component.updated_by = request.user.username
                     component.updated_date = timezone.now()
                     component.save()
+                    record_applied_usage(component, actual_hours_added, maintenance)
 
                 messages.success(request,
                                  f'✅ Maintenance completed for {component.component_name}. Added {actual_hours_added} hours.')
@@ -1504,9 +1350,7 @@ def complete_component_maintenance(request, pk):
 def batch_complete_maintenance(request, batch_id):
     """Complete all maintenance in a batch"""
     maintenance_records = ComponentMaintenance.objects.filter(
-        Q(update_comments__icontains=f'Batch: {batch_id}') |
-        Q(update_comments__icontains=f'Single: {batch_id}')
-    )
+        batch__reference=batch_id, batch__kind__in=['Batch', 'Single'])
 
     if not maintenance_records.exists():
         messages.error(request, f'No records found for batch {batch_id}')
@@ -1522,43 +1366,16 @@ def batch_complete_maintenance(request, batch_id):
             messages.error(request, 'Please provide completion date and remarks.')
             return redirect('batch_complete_maintenance', batch_id=batch_id)
 
-        try:
-            with transaction.atomic():
-                completed_count = 0
-                for maintenance in maintenance_records:
-                    component = maintenance.component_to_maintain
-
-                    if hasattr(maintenance, 'maintenance_status'):
-                        maintenance.maintenance_status = 'Completed'
-                        maintenance.actual_end_date = actual_end_date
-                        maintenance.actual_hours_added = hours_added
-                        maintenance.completion_date = timezone.now()
-                        maintenance.completed_by = request.user
-                        maintenance.completion_remarks = completion_remarks
-                        if completed_count == 0 and completion_report:
-                            maintenance.completion_report = completion_report
-                    else:
-                        maintenance.maintenance_hours_added = hours_added
-                        if not maintenance.update_comments:
-                            maintenance.update_comments = ''
-                        maintenance.update_comments += f'\nBatch Completed: {timezone.now().strftime("%Y-%m-%d")} by {request.user.username}'
-
-                    maintenance.save()
-
-                    if float(hours_added) > 0:
-                        component.maintenance_hours += Decimal(hours_added)
-                        component.updated_by = request.user.username
-                        component.updated_date = timezone.now()
-                        component.save()
-
-                    completed_count += 1
-
-                messages.success(request,
-                                 f'✅ Batch completed! {completed_count} components updated. Added {hours_added} hours to each.')
-                return redirect('batch_maintenance_view', batch_id=batch_id)
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
-            return redirect('batch_complete_maintenance', batch_id=batch_id)
+        job = enqueue('batch_complete_maintenance', {
+            'batch_id': batch_id,
+            'user_id': request.user.pk,
+            'actual_end_date': actual_end_date,
+            'hours_added': hours_added,
+            'completion_remarks': completion_remarks,
+            'completion_report': store_upload(completion_report) if completion_report else None,
+        }, user=request.user, return_url=reverse('batch_maintenance_view', args=[batch_id]))
+        messages.info(request, f'Completing batch {batch_id} in the background.')
+        return redirect('background_job_detail', pk=job.pk)
 
     context = {
         'batch_id': batch_id,
@@ -1588,18 +1405,16 @@ def get_components_by_aircraft_and_type(request):
         return JsonResponse({'success': False, 'error': 'Aircraft not found'})
 
     try:
-        if component_type == 'aircraftmaincomponent':
-            components_qs = AircraftMainComponent.objects.filter(aircraft_attached=aircraft)
-        elif component_type == 'aircraftsubcomponent':
-            components_qs = AircraftSubComponent.objects.filter(parent_component__aircraft_attached=aircraft)
-        elif component_type == 'aircraftsub2component':
-            components_qs = AircraftSub2Component.objects.filter(
-                parent_sub_component__parent_component__aircraft_attached=aircraft)
-        elif component_type == 'aircraftsub3component':
-            components_qs = AircraftSub3Component.objects.filter(
-                parent_sub2_component__parent_sub_component__parent_component__aircraft_attached=aircraft)
-        else:
+        model_map = {
+            'aircraftmaincomponent': AircraftMainComponent,
+            'aircraftsubcomponent': AircraftSubComponent,
+            'aircraftsub2component': AircraftSub2Component,
+            'aircraftsub3component': AircraftSub3Component,
+        }
+        model_class = model_map.get(component_type)
+        if not model_class:
             return JsonResponse({'success': False, 'error': 'Invalid type'})
+        components_qs = model_class.objects.filter(**{model_class.aircraft_field: aircraft})
 
         components_data = []
         for comp in components_qs:
@@ -1628,18 +1443,18 @@ def get_components_by_aircraft_and_type(request):
 @login_required
 def batch_maintenance_view(request, batch_id):
     """View all maintenance records in a batch"""
-    maintenance_records = ComponentMaintenance.objects.filter(
-        Q(update_comments__icontains=f'Batch: {batch_id}') |
-        Q(update_comments__icontains=f'Single: {batch_id}') |
-        Q(update_comments__icontains=f'Auto: {batch_id}')
-    ).order_by('content_type__model', 'object_id')
+    batch = MaintenanceBatch.objects.filter(reference=batch_id).first()
+    maintenance_records = ComponentMaintenance.objects.filter(batch=batch).order_by('content_type__model', 'object_id')
 
-    if not maintenance_records.exists():
+    # Resolve every record's component in one query per component level
+    records = ComponentMaintenance.resolve_components(maintenance_records) if batch else []
+
+    if not records:
         messages.error(request, f'No records found for batch {batch_id}')
         return redirect('component_maintenance_list')
 
     grouped_records = {}
-    for record in maintenance_records:
+    for record in records:
         type_name = record.component_type_name
         if type_name not in grouped_records:
             grouped_records[type_name] = []
@@ -1647,10 +1462,11 @@ def batch_maintenance_view(request, batch_id):
 
     context = {
         'batch_id': batch_id,
-        'maintenance_records': maintenance_records,
+        'batch': batch,
+        'maintenance_records': records,
         'grouped_records': grouped_records,
-        'total_records': maintenance_records.count(),
-        'first_record': maintenance_records.first(),
+        'total_records': len(records),
+        'first_record': records[0],
     }
     return render(request, 'maintenance/schedule/batch_maintenance_detail.html', context)
 
@@ -1677,19 +1493,22 @@ def quick_schedule_component_maintenance(request, model_name, component_id):
         maintenance_id = generate_batch_id()
 
         try:
-            maintenance = ComponentMaintenance.objects.create(
-                content_type=content_type,
-                object_id=component_id,
-                main_type_schedule=request.POST.get('main_type_schedule'),
-                maintenance_type=request.POST.get('maintenance_type'),
-                maintenance_hours=component.maintenance_hours,
-                maintenance_hours_added=0,
-                start_date=request.POST.get('start_date'),
-                end_date=request.POST.get('end_date'),
-                remarks=request.POST.get('remarks'),
-                added_by=request.user,
-                update_comments=f'Single: {maintenance_id}'
-            )
+            with transaction.atomic():
+                batch = MaintenanceBatch.objects.create(reference=maintenance_id, kind='Single', added_by=request.user)
+                maintenance = ComponentMaintenance.objects.create(
+                    content_type=content_type,
+                    object_id=component_id,
+                    main_type_schedule=request.POST.get('main_type_schedule'),
+                    maintenance_type=request.POST.get('maintenance_type'),
+                    maintenance_hours=component.maintenance_hours,
+                    maintenance_hours_added=0,
+                    start_date=request.POST.get('start_date'),
+                    end_date=request.POST.get('end_date'),
+                    remarks=request.POST.get('remarks'),
+                    added_by=request.user,
+                    update_comments=f'Single: {maintenance_id}',
+                    batch=batch,
+                )
             messages.success(request, f'✓ Maintenance scheduled. ID: {maintenance_id}')
             return redirect('component_maintenance_detail', pk=maintenance.pk)
         except Exception as e:
@@ -1719,20 +1538,22 @@ def auto_schedule_component_maintenance(request, model_name, component_id):
     if component.min_maintenance_hours and component.maintenance_hours <= component.min_maintenance_hours:
         content_type = ContentType.objects.get_for_model(model_class)
         maintenance_id = generate_batch_id()
-
-        maintenance = ComponentMaintenance.objects.create(
-            content_type=content_type,
-            object_id=component_id,
-            main_type_schedule='Maintenance',
-            maintenance_type='Class_A',
-            maintenance_hours=component.maintenance_hours,
-            maintenance_hours_added=0,
-            start_date=timezone.now(),
-            end_date=timezone.now() + timezone.timedelta(days=7),
-            remarks=f'🤖 Auto-scheduled at {component.maintenance_hours} hours',
-            added_by=request.user,
-            update_comments=f'Auto: {maintenance_id}'
-        )
+        with transaction.atomic():
+            batch = MaintenanceBatch.objects.create(reference=maintenance_id, kind='Auto', added_by=request.user)
+            maintenance = ComponentMaintenance.objects.create(
+                content_type=content_type,
+                object_id=component_id,
+                main_type_schedule='Maintenance',
+                maintenance_type='Class_A',
+                maintenance_hours=component.maintenance_hours,
+                maintenance_hours_added=0,
+                start_date=timezone.now(),
+                end_date=timezone.now() + timezone.timedelta(days=7),
+                remarks=f'🤖 Auto-scheduled at {component.maintenance_hours} hours',
+                added_by=request.user,
+                update_comments=f'Auto: {maintenance_id}',
+                batch=batch,
+            )
 
         return JsonResponse({'success': True, 'message': f'Auto-scheduled', 'maintenance_id': maintenance.id})
 
@@ -1746,44 +1567,90 @@ def maintenance_dashboard(request):
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
 
-    aircraft_schedules = AircraftMaintenance.objects.all()
-    component_schedules = ComponentMaintenance.objects.all()
-
     if aircraft_id:
-        aircraft_schedules = aircraft_schedules.filter(aircraft_to_maintain_id=aircraft_id)
-        aircraft = get_object_or_404(Aircraft, pk=aircraft_id)
-        main_components = AircraftMainComponent.objects.filter(aircraft_attached=aircraft)
-        sub_components = AircraftSubComponent.objects.filter(parent_component__in=main_components)
-        sub2_components = AircraftSub2Component.objects.filter(parent_sub_component__in=sub_components)
-        sub3_components = AircraftSub3Component.objects.filter(parent_sub2_component__in=sub2_components)
-
-        q_objects = Q()
-        for comp in main_components:
-            q_objects |= Q(content_type__model='aircraftmaincomponent', object_id=comp.id)
-        for comp in sub_components:
-            q_objects |= Q(content_type__model='aircraftsubcomponent', object_id=comp.id)
-        for comp in sub2_components:
-            q_objects |= Q(content_type__model='aircraftsub2component', object_id=comp.id)
-        for comp in sub3_components:
-            q_objects |= Q(content_type__model='aircraftsub3component', object_id=comp.id)
-        component_schedules = component_schedules.filter(q_objects)
-
-    if date_from:
-        aircraft_schedules = aircraft_schedules.filter(start_date__gte=date_from)
-        component_schedules = component_schedules.filter(start_date__gte=date_from)
-    if date_to:
-        aircraft_schedules = aircraft_schedules.filter(start_date__lte=date_to)
-        component_schedules = component_schedules.filter(start_date__lte=date_to)
+        aircraft_id = get_object_or_404(Aircraft, pk=aircraft_id).pk
+    aircraft_schedules, component_schedules = dashboard_schedules(aircraft_id, date_from, date_to)
 
     context = {
         'aircraft_schedules': aircraft_schedules.order_by('-start_date')[:10],
         'component_schedules': component_schedules.order_by('-start_date')[:10],
-        'total_aircraft_schedules': aircraft_schedules.count(),
-        'total_component_schedules': component_schedules.count(),
-        'manual_aircraft': aircraft_schedules.filter(main_type_schedule='Operational').count(),
-        'automated_aircraft': aircraft_schedules.filter(main_type_schedule='Maintenance').count(),
-        'manual_component': component_schedules.filter(main_type_schedule='Operational').count(),
-        'automated_component': component_schedules.filter(main_type_schedule='Maintenance').count(),
+        **dashboard_counts(aircraft_id, date_from, date_to),
         'aircrafts': Aircraft.objects.all(),
+        'fleet_health': fleet_snapshots(),
     }
     return render(request, 'maintenance/schedule/maintenance_dashboard.html', context)
+
+
+@login_required
+def fleet_forecast(request):
+    """Utilization per aircraft and the components forecast to fall due within `days`"""
+    try:
+        days = int(request.GET.get('days', REPORT_DAYS))
+    except ValueError:
+        days = REPORT_DAYS
+    now = timezone.now()
+    rates = utilization(now)
+    aircraft = Aircraft.objects.in_bulk()
+    cutoff = now + timezone.timedelta(days=days)
+
+    due_components = []
+    for Model in COMPONENT_LEVELS:
+        components = Model.objects.filter(component_status='Attached', maintenance_status='Operational').only(
+            'component_name', 'serial_number', Model.aircraft_field, *FORECAST_FIELDS)
+        for component, dates in forecast_components(components, rates, now):
+            if dates['recommended'] and dates['recommended'] <= cutoff:
+                due_components.append({
+                    'component': component,
+                    'level': Model._meta.verbose_name,
+                    'aircraft': aircraft.get(getattr(component, f'{Model.aircraft_field}_id')),
+                    **dates,
+                })
+    due_components.sort(key=lambda row: row['recommended'])
+
+    utilization_rows = [
+        {'aircraft': craft, 'hours_per_day': rates.get(pk, (0, 0))[0], 'cycles_per_day': rates.get(pk, (0, 0))[1]}
+        for pk, craft in sorted(aircraft.items(), key=lambda item: item[1].abbreviation)
+    ]
+    context = {
+        'days': days,
+        'utilization': utilization_rows,
+        'due_components': due_components,
+    }
+    return render(request, 'maintenance/schedule/fleet_forecast.html', context)
+
+
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+def _job_status(job):
+    return {
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'attempts': job.attempts,
+        'finished': job.is_finished,
+        'result': job.result,
+        'error': error_summary(job) if job.status == 'Failed' else '',
+        'return_url': job.return_url,
+    }
+
+
+def _visible_jobs(user):
+    """Jobs `user` may follow: their own, or every job for staff"""
+    jobs = BackgroundJob.objects.all()
+    return jobs if user.is_staff else jobs.filter(created_by=user)
+
+
+@login_required
+def background_job_detail(request, pk):
+    """Progress page for a queued action; polls background_job_status until the job finishes"""
+    job = get_object_or_404(_visible_jobs(request.user), pk=pk)
+    return render(request, 'maintenance/jobs/background_job_detail.html', {'job': job, 'status': _job_status(job)})
+
+
+@login_required
+def background_job_status(request, pk):
+    job = get_object_or_404(_visible_jobs(request.user), pk=pk)
+    return JsonResponse(_job_status(job))